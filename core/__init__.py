@@ -1,23 +1,41 @@
-from .chat_client import ChatClient
-from .remote_client import RemoteClient
-from .screen_capture import ScreenRecorder
-from .camera_capture import CameraRecorder
-from .network_server import RemoteAccessServer
-from .chat_server import ChatServer
-from .database import DatabaseManager
-from .audio_capture import AudioCapture, AudioRecorder
-from .video_processor import VideoProcessor
-
-
-__all__ = [
-    'ChatClient',
-    'RemoteClient',
-    'ScreenRecorder',
-    'CameraRecorder',
-    'RemoteAccessServer',
-    'ChatServer',
-    'DatabaseManager',
-    'AudioCapture',
-    'AudioRecorder',
-    'VideoProcessor'
-]
+import importlib
+
+
+_EXPORTS = {
+    'ChatClient': 'chat_client',
+    'RemoteClient': 'remote_client',
+    'ScreenRecorder': 'screen_capture',
+    'CameraRecorder': 'camera_capture',
+    'RemoteAccessServer': 'network_server',
+    'ChatServer': 'chat_server',
+    'DatabaseManager': 'database',
+    'AudioCapture': 'audio_capture',
+    'AudioRecorder': 'audio_capture',
+    'VideoProcessor': 'video_processor',
+    'DecodePool': 'decode_pool',
+    'TileEncoder': 'tile_codec',
+    'TileDecoder': 'tile_codec',
+    'H264Encoder': 'video_stream',
+    'H264Decoder': 'video_stream',
+    'ScreenSource': 'sources',
+    'SyntheticScreenSource': 'sources',
+    'SyntheticCamera': 'sources',
+    'SyntheticAudioStream': 'sources'
+}
+
+
+def __getattr__(name):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    value = getattr(importlib.import_module(f'.{module}', __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + list(_EXPORTS))
+
+
+__all__ = list(_EXPORTS)
@@ -146,6 +146,7 @@ class AudioCapture:
         self.thread = None
         self.sample_rate = 44100
         self.channels = 2
+        self.stream_factory = sd.InputStream
 
     def get_available_devices(self):
         try:
@@ -201,7 +202,7 @@ class AudioCapture:
                 if self.recording:
                     self.audio_data.append(indata.copy())
 
-            with sd.InputStream(
+            with self.stream_factory(
                 device=device_index,
                 channels=self.channels,
                 samplerate=self.sample_rate,
@@ -16,6 +16,7 @@ class CameraRecorder:
         self.thread = None
 
         self.available_cameras = []
+        self.camera_factory = cv2.VideoCapture
 
         self.audio_recorder = AudioCapture()
         self.audio_enabled = False
@@ -28,7 +29,7 @@ class CameraRecorder:
         self.available_cameras = []
 
         for i in range(5):
-            cap = cv2.VideoCapture(i)
+            cap = self.camera_factory(i)
 
             if cap.isOpened():
                 ret, frame = cap.read()
@@ -46,7 +47,7 @@ class CameraRecorder:
 
     def start_recording(self, camera_index, save_path, quality='high', audio_enabled=False, audio_device=0, merge_enabled=True):
         try:
-            self.cap = cv2.VideoCapture(camera_index)
+            self.cap = self.camera_factory(camera_index)
 
             if not self.cap.isOpened():
                 return False
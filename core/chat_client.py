@@ -1,16 +1,24 @@
 import socket
 import threading
-import json
+from collections import deque
 from datetime import datetime
 from PyQt6.QtCore import QObject, pyqtSignal
 
+from .transport import JSON_MESSAGE, MessageReader, decode_json, send_json, tune_socket
+
 
 class ChatClient(QObject):
     message_received = pyqtSignal(str, str)
+    room_message_received = pyqtSignal(str, str, str, str)
+    rooms_updated = pyqtSignal(list)
+    history_received = pyqtSignal(list)
     user_list_updated = pyqtSignal(list)
+    user_event_received = pyqtSignal(str, str, str)
     connection_status_changed = pyqtSignal(bool)
     error_occurred = pyqtSignal(str)
 
+    SEEN_IDS_SIZE = 2000
+
     def __init__(self):
         super().__init__()
         self.connected = False
@@ -20,15 +28,39 @@ class ChatClient(QObject):
         self.server_port = 8081
         self.thread = None
 
+        self.server_epoch = None
+        self.last_seen_id = 0
+        self.seen_ids = set()
+        self.seen_order = deque()
+        self.users = []
+        self.rooms = {'general'}
+
     def connect_to_server(self, host, port, username="Клиент"):
         try:
+            self.username = username
+
+            if (host, port) != (self.server_host, self.server_port):
+                self.server_epoch = None
+                self._reset_seen()
+                self.rooms = {'general'}
+
             self.server_host = host
             self.server_port = port
-            self.username = username
 
-            self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            self.socket = tune_socket(
+                socket.socket(socket.AF_INET, socket.SOCK_STREAM))
             self.socket.connect((host, port))
 
+            hello_data = {
+                'type': 'hello',
+                'username': username,
+                'last_seen_id': self.last_seen_id,
+                'server_epoch': self.server_epoch,
+                'rooms': sorted(self.rooms - {'general'}),
+                'timestamp': datetime.now().isoformat()
+            }
+            self._send(hello_data)
+
             self.connected = True
             self.thread = threading.Thread(target=self._listen_for_messages)
             self.thread.daemon = True
@@ -45,6 +77,10 @@ class ChatClient(QObject):
         self.connected = False
 
         if self.socket:
+            try:
+                self.socket.shutdown(socket.SHUT_RDWR)
+            except:
+                pass
             try:
                 self.socket.close()
             except:
@@ -54,40 +90,115 @@ class ChatClient(QObject):
         if self.thread:
             self.thread.join(timeout=2.0)
 
+        self.users = []
         self.connection_status_changed.emit(False)
 
     def _listen_for_messages(self):
+        reader = MessageReader(self.socket)
         while self.connected:
             try:
-                data = self.socket.recv(1024).decode('utf-8')
-                if not data:
+                received = reader.read_message()
+                if received is None:
                     break
 
-                message_data = json.loads(data)
-
-                if message_data.get('type') == 'message':
-                    username = message_data.get('username', '')
-                    message = message_data.get('message', '')
-                    self.message_received.emit(username, message)
-
-                elif message_data.get('type') == 'system':
-                    username = message_data.get('username', 'Система')
-                    message = message_data.get('message', '')
-                    self.message_received.emit(username, message)
+                data_type, payload = received
+                if data_type != JSON_MESSAGE:
+                    continue
+                message_data = decode_json(payload)
+                if message_data is not None:
+                    self._handle_message(message_data)
 
-                elif message_data.get('type') == 'user_list':
-                    users = message_data.get('users', [])
-                    self.user_list_updated.emit(users)
-
-            except json.JSONDecodeError:
-                continue
             except Exception as e:
                 if self.connected:
                     self.error_occurred.emit(
                         f"Ошибка получения сообщения: {e}")
                 break
 
-    def send_message(self, message):
+    def _handle_message(self, message_data):
+        if message_data.get('type') == 'message':
+            if not self._mark_seen(message_data.get('id', 0)):
+                return
+
+            username = message_data.get('username', '')
+            message = message_data.get('message', '')
+            room = message_data.get('room') or ''
+            recipient = message_data.get('recipient') or ''
+            if recipient or (room and room != 'general'):
+                self.room_message_received.emit(
+                    username, message, room, recipient)
+            else:
+                self.message_received.emit(username, message)
+
+        elif message_data.get('type') == 'room_joined':
+            self.rooms.add(message_data.get('room', ''))
+            self.rooms_updated.emit(sorted(self.rooms))
+
+        elif message_data.get('type') == 'room_left':
+            self.rooms.discard(message_data.get('room', ''))
+            self.rooms_updated.emit(sorted(self.rooms))
+
+        elif message_data.get('type') == 'system':
+            if 'server_epoch' in message_data:
+                if message_data['server_epoch'] != self.server_epoch:
+                    self._reset_seen()
+                self.server_epoch = message_data['server_epoch']
+            username = message_data.get('username', 'Система')
+            message = message_data.get('message', '')
+            self.message_received.emit(username, message)
+
+        elif message_data.get('type') == 'history':
+            messages = [message for message in message_data.get('messages', [])
+                        if self._mark_seen(message.get('id', 0))]
+            if messages:
+                self.history_received.emit(messages)
+
+        elif message_data.get('type') == 'error':
+            if message_data.get('command') == 'rename' and message_data.get('username'):
+                self.username = message_data['username']
+            self.error_occurred.emit(message_data.get('message', ''))
+
+        elif message_data.get('type') == 'user_list':
+            self.users = list(message_data.get('users', []))
+            self.user_list_updated.emit(list(self.users))
+
+        elif message_data.get('type') == 'user_event':
+            event = message_data.get('event', '')
+            username = message_data.get('username', '')
+            old_username = message_data.get('old_username') or ''
+
+            if event == 'join' and username not in self.users:
+                self.users.append(username)
+            elif event == 'leave' and username in self.users:
+                self.users.remove(username)
+            elif event == 'rename' and old_username in self.users:
+                self.users[self.users.index(old_username)] = username
+            else:
+                return
+
+            self.user_event_received.emit(event, username, old_username)
+
+    def _mark_seen(self, message_id):
+        if not message_id:
+            return True
+        if message_id in self.seen_ids:
+            return False
+
+        self.seen_ids.add(message_id)
+        self.seen_order.append(message_id)
+        if len(self.seen_order) > self.SEEN_IDS_SIZE:
+            self.seen_ids.discard(self.seen_order.popleft())
+        self.last_seen_id = max(self.last_seen_id, message_id)
+        return True
+
+    def _reset_seen(self):
+        self.last_seen_id = 0
+        self.seen_ids.clear()
+        self.seen_order.clear()
+
+    def _send(self, data):
+        send_json(self.socket, data)
+
+    def send_message(self, message, room=None, recipient=None):
         if self.connected and self.socket:
             try:
                 message_data = {
@@ -96,13 +207,37 @@ class ChatClient(QObject):
                     'username': self.username,
                     'timestamp': datetime.now().isoformat()
                 }
-                self.socket.send(json.dumps(message_data).encode('utf-8'))
+                if recipient:
+                    message_data['to'] = recipient
+                elif room:
+                    message_data['room'] = room
+                self._send(message_data)
                 return True
             except Exception as e:
                 self.error_occurred.emit(f"Ошибка отправки сообщения: {e}")
                 return False
         return False
 
+    def join_room(self, room):
+        return self._send_room_command('join_room', room)
+
+    def leave_room(self, room):
+        return self._send_room_command('leave_room', room)
+
+    def _send_room_command(self, command, room):
+        if self.connected and self.socket and room:
+            try:
+                self._send({
+                    'type': command,
+                    'room': room,
+                    'timestamp': datetime.now().isoformat()
+                })
+                return True
+            except Exception as e:
+                self.error_occurred.emit(f"Ошибка смены комнаты: {e}")
+                return False
+        return False
+
     def change_username(self, new_username):
         if self.connected and self.socket:
             try:
@@ -111,7 +246,7 @@ class ChatClient(QObject):
                     'username': new_username,
                     'timestamp': datetime.now().isoformat()
                 }
-                self.socket.send(json.dumps(rename_data).encode('utf-8'))
+                self._send(rename_data)
                 self.username = new_username
                 return True
             except Exception as e:
@@ -124,5 +259,7 @@ class ChatClient(QObject):
             "connected": self.connected,
             "host": self.server_host,
             "port": self.server_port,
-            "username": self.username
+            "username": self.username,
+            "last_seen_id": self.last_seen_id,
+            "rooms": sorted(self.rooms)
         }
@@ -1,15 +1,26 @@
 import socket
 import threading
 import json
+import queue
+import uuid
+from collections import deque
 from datetime import datetime
 from PyQt6.QtCore import QObject, pyqtSignal
 
+from .transport import JSON_MESSAGE, MessageReader, decode_json, send_message, tune_socket
+
 
 class ChatServer(QObject):
     message_received = pyqtSignal(str, str)
+    room_message_received = pyqtSignal(str, str, str, str)
     user_list_updated = pyqtSignal(list)
     connection_status_changed = pyqtSignal(bool)
 
+    HISTORY_RING_SIZE = 500
+    HELLO_TIMEOUT = 2.0
+    OUTBOX_SIZE = 1000
+    DEFAULT_ROOM = 'general'
+
     def __init__(self):
         super().__init__()
         self.running = False
@@ -18,9 +29,23 @@ class ChatServer(QObject):
         self.thread = None
         self.port = 8081
 
+        self.lock = threading.RLock()
+        self.roster_lock = threading.Lock()
+        self.server_epoch = None
+        self.last_message_id = 0
+        self.recent_messages = deque(maxlen=self.HISTORY_RING_SIZE)
+
+        self.connections = {}
+        self.rooms = {}
+
     def start_server(self, port=8081):
         try:
             self.port = port
+            self.server_epoch = uuid.uuid4().hex
+            self.last_message_id = 0
+            self.recent_messages.clear()
+            self.connections.clear()
+            self.rooms.clear()
             self.server_socket = socket.socket(
                 socket.AF_INET, socket.SOCK_STREAM)
             self.server_socket.setsockopt(
@@ -53,12 +78,21 @@ class ChatServer(QObject):
             }
             self._broadcast(json.dumps(shutdown_msg))
 
-        for client_socket in list(self.clients.keys()):
+        for info in list(self.clients.values()):
+            self._close_outbox(info)
+        for client_socket, info in list(self.clients.items()):
+            info['writer'].join(timeout=1.0)
+            try:
+                client_socket.shutdown(socket.SHUT_RDWR)
+            except:
+                pass
             try:
                 client_socket.close()
             except:
                 pass
         self.clients.clear()
+        self.connections.clear()
+        self.rooms.clear()
 
         if self.server_socket:
             self.server_socket.close()
@@ -74,6 +108,7 @@ class ChatServer(QObject):
         while self.running:
             try:
                 client_socket, addr = self.server_socket.accept()
+                tune_socket(client_socket)
                 print(f"Новое подключение к чату: {addr}")
 
                 temp_username = f"User_{addr[0].replace('.', '_')}_{len(self.clients) + 1}"
@@ -93,22 +128,78 @@ class ChatServer(QObject):
                 break
 
     def _handle_client(self, client_socket, username, addr):
+        reader = MessageReader(client_socket, 16384)
         try:
-            self.clients[client_socket] = {
-                'username': username,
-                'address': addr,
-                'join_time': datetime.now()
-            }
+            client_socket.settimeout(self.HELLO_TIMEOUT)
+            try:
+                pending = self._receive_messages(reader)
+            except socket.timeout:
+                pending = []
+            client_socket.settimeout(None)
 
-            welcome_msg = {
-                'type': 'system',
-                'message': f'Добро пожаловать в чат! Ваше имя: {username}',
-                'username': 'Система',
-                'timestamp': datetime.now().isoformat()
-            }
-            client_socket.send(json.dumps(welcome_msg).encode('utf-8'))
+            if pending is None:
+                client_socket.close()
+                return
+
+            hello = {}
+            requested_name = ''
+            if pending and pending[0].get('type') == 'hello':
+                hello = pending.pop(0)
+                requested_name = str(hello.get('username') or '').strip()
+                if requested_name:
+                    username = requested_name
+
+            with self.roster_lock:
+                with self.lock:
+                    taken = bool(requested_name) and username in self.connections
+                    base_name, suffix = username, 1
+                    while not taken and username in self.connections:
+                        suffix += 1
+                        username = f'{base_name}_{suffix}'
+
+                if taken:
+                    self._send(client_socket, json.dumps(
+                        self._error_message('username_taken',
+                                            f'Имя {username} уже занято',
+                                            command='hello')))
+                    client_socket.close()
+                    return
+
+                info = {
+                    'username': username,
+                    'address': addr,
+                    'join_time': datetime.now(),
+                    'rooms': set(),
+                    'outbox': queue.Queue(self.OUTBOX_SIZE)
+                }
+                info['writer'] = threading.Thread(
+                    target=self._write_client,
+                    args=(client_socket, info['outbox']))
+                info['writer'].daemon = True
+                info['writer'].start()
+
+                with self.lock:
+                    self.clients[client_socket] = info
+                    self._index_client(client_socket, username)
+                    for room in [self.DEFAULT_ROOM] + list(hello.get('rooms') or []):
+                        self._join_room(client_socket, str(room))
+
+                    welcome_msg = {
+                        'type': 'system',
+                        'message': f'Добро пожаловать в чат! Ваше имя: {username}',
+                        'username': 'Система',
+                        'timestamp': datetime.now().isoformat(),
+                        'server_epoch': self.server_epoch,
+                        'last_message_id': self.last_message_id
+                    }
+                    self._send(client_socket, json.dumps(welcome_msg))
+                    history_msg = self._history_message(info, hello)
+                    if history_msg:
+                        self._send(client_socket, json.dumps(history_msg))
 
-            self._broadcast_user_list()
+                self._send_user_list(client_socket)
+                self._broadcast_user_event(
+                    'join', username, exclude=client_socket)
 
             join_msg = {
                 'type': 'system',
@@ -122,44 +213,14 @@ class ChatServer(QObject):
 
             while self.running:
                 try:
-                    data = client_socket.recv(1024).decode('utf-8')
-                    if not data:
+                    for message_data in pending:
+                        username = self._process_client_message(
+                            client_socket, username, message_data)
+
+                    pending = self._receive_messages(reader)
+                    if pending is None:
                         break
 
-                    message_data = json.loads(data)
-
-                    if message_data.get('type') == 'message':
-                        message = message_data.get('message', '').strip()
-                        if message:
-                            broadcast_msg = {
-                                'type': 'message',
-                                'username': username,
-                                'message': message,
-                                'timestamp': datetime.now().isoformat()
-                            }
-                            self._broadcast(json.dumps(broadcast_msg))
-                            self.message_received.emit(username, message)
-
-                    elif message_data.get('type') == 'rename':
-                        new_username = message_data.get('username', '').strip()
-                        if new_username and new_username != username:
-                            old_username = username
-                            username = new_username
-                            self.clients[client_socket]['username'] = username
-                            self._broadcast_user_list()
-
-                            rename_msg = {
-                                'type': 'system',
-                                'message': f'{old_username} сменил имя на {username}',
-                                'username': 'Система',
-                                'timestamp': datetime.now().isoformat()
-                            }
-                            self._broadcast(json.dumps(rename_msg))
-                            self.message_received.emit(
-                                'Система', f'{old_username} сменил имя на {username}')
-
-                except json.JSONDecodeError:
-                    continue
                 except Exception as e:
                     print(f"Ошибка обработки сообщения от {username}: {e}")
                     break
@@ -167,61 +228,306 @@ class ChatServer(QObject):
         except Exception as e:
             print(f"Ошибка обработки клиента чата {username}: {e}")
         finally:
-            if client_socket in self.clients:
-                disconnected_user = self.clients[client_socket]['username']
-                del self.clients[client_socket]
-                client_socket.close()
-
-                if self.running:
-                    leave_msg = {
-                        'type': 'system',
-                        'message': f'{disconnected_user} покинул чат',
-                        'username': 'Система',
-                        'timestamp': datetime.now().isoformat()
-                    }
-                    self._broadcast(json.dumps(leave_msg))
-                    self.message_received.emit(
-                        'Система', f'{disconnected_user} покинул чат')
-                    self._broadcast_user_list()
+            with self.roster_lock:
+                info = self.clients.get(client_socket)
+                if info is not None:
+                    self._unindex_client(client_socket)
+                    del self.clients[client_socket]
+                    self._close_outbox(info)
+                    try:
+                        client_socket.shutdown(socket.SHUT_RDWR)
+                    except:
+                        pass
+                    client_socket.close()
+                    if self.running:
+                        self._broadcast_user_event('leave', info['username'])
+
+            if info is not None and self.running:
+                leave_msg = {
+                    'type': 'system',
+                    'message': f'{info["username"]} покинул чат',
+                    'username': 'Система',
+                    'timestamp': datetime.now().isoformat()
+                }
+                self._broadcast(json.dumps(leave_msg))
+                self.message_received.emit(
+                    'Система', f'{info["username"]} покинул чат')
+
+    def _process_client_message(self, client_socket, username, message_data):
+        if message_data.get('type') == 'message':
+            message = message_data.get('message', '').strip()
+            recipient = str(message_data.get('to') or '').strip() or None
+            room = None
+            if not recipient:
+                room = str(message_data.get('room') or self.DEFAULT_ROOM)
+                if room not in self.clients[client_socket]['rooms']:
+                    return username
+
+            if message:
+                self._notify(self._record_message(
+                    username, message, room, recipient))
+
+        elif message_data.get('type') == 'join_room':
+            room = str(message_data.get('room') or '').strip()
+            if room:
+                self._join_room(client_socket, room)
+                self._send(client_socket, json.dumps({
+                    'type': 'room_joined',
+                    'room': room,
+                    'members': self.get_room_members(room),
+                    'timestamp': datetime.now().isoformat()
+                }))
+
+        elif message_data.get('type') == 'leave_room':
+            room = str(message_data.get('room') or '').strip()
+            if room and room != self.DEFAULT_ROOM:
+                self._leave_room(client_socket, room)
+                self._send(client_socket, json.dumps({
+                    'type': 'room_left',
+                    'room': room,
+                    'timestamp': datetime.now().isoformat()
+                }))
+
+        elif message_data.get('type') == 'rename':
+            new_username = message_data.get('username', '').strip()
+            if new_username and new_username != username:
+                with self.roster_lock:
+                    with self.lock:
+                        taken = new_username in self.connections
+                    if taken:
+                        self._send(client_socket, json.dumps(
+                            self._error_message('username_taken',
+                                                f'Имя {new_username} уже занято',
+                                                command='rename',
+                                                username=username)))
+                        return username
+
+                    old_username = username
+                    username = new_username
+                    self.clients[client_socket]['username'] = username
+                    self._unindex_username(client_socket, old_username)
+                    self._index_client(client_socket, username)
+                    self._broadcast_user_event(
+                        'rename', username, old_username=old_username)
+
+                rename_msg = {
+                    'type': 'system',
+                    'message': f'{old_username} сменил имя на {username}',
+                    'username': 'Система',
+                    'timestamp': datetime.now().isoformat()
+                }
+                self._broadcast(json.dumps(rename_msg))
+                self.message_received.emit(
+                    'Система', f'{old_username} сменил имя на {username}')
+
+        return username
+
+    def _receive_messages(self, reader):
+        received = reader.read_message()
+        if received is None:
+            return None
+
+        data_type, payload = received
+        message = decode_json(payload) if data_type == JSON_MESSAGE else None
+        return [message] if message is not None else []
+
+    def _index_client(self, client_socket, username):
+        with self.lock:
+            self.connections.setdefault(username, set()).add(client_socket)
+
+    def _unindex_username(self, client_socket, username):
+        with self.lock:
+            sockets = self.connections.get(username)
+            if sockets is not None:
+                sockets.discard(client_socket)
+                if not sockets:
+                    del self.connections[username]
+
+    def _unindex_client(self, client_socket):
+        info = self.clients.get(client_socket)
+        if not info:
+            return
+
+        self._unindex_username(client_socket, info['username'])
+        for room in list(info['rooms']):
+            self._leave_room(client_socket, room)
+
+    def _join_room(self, client_socket, room):
+        with self.lock:
+            self.rooms.setdefault(room, set()).add(client_socket)
+            self.clients[client_socket]['rooms'].add(room)
+
+    def _leave_room(self, client_socket, room):
+        with self.lock:
+            members = self.rooms.get(room)
+            if members is not None:
+                members.discard(client_socket)
+                if not members:
+                    del self.rooms[room]
+            self.clients[client_socket]['rooms'].discard(room)
+
+    def _audience(self, record):
+        with self.lock:
+            if record.get('recipient'):
+                return (set(self.connections.get(record['recipient'], ())) |
+                        set(self.connections.get(record['username'], ())))
+            return set(self.rooms.get(record['room'], ()))
+
+    def _can_see(self, info, record):
+        if record.get('recipient'):
+            return info['username'] in (record['recipient'], record['username'])
+        return record['room'] in info['rooms']
+
+    def _notify(self, record):
+        if record.get('recipient') or record['room'] != self.DEFAULT_ROOM:
+            self.room_message_received.emit(
+                record['username'], record['message'],
+                record['room'] or '', record['recipient'] or '')
+        else:
+            self.message_received.emit(record['username'], record['message'])
+
+    def _record_message(self, username, message, room=None, recipient=None):
+        with self.lock:
+            self.last_message_id += 1
+            record = {
+                'type': 'message',
+                'id': self.last_message_id,
+                'username': username,
+                'message': message,
+                'room': room,
+                'recipient': recipient,
+                'timestamp': datetime.now().isoformat()
+            }
+            self.recent_messages.append(record)
+            self._send_to(self._audience(record), json.dumps(record))
+            return record
+
+    def _history_message(self, info, hello):
+        last_seen_id = hello.get('last_seen_id')
+        if hello.get('server_epoch') != self.server_epoch:
+            last_seen_id = 0
+
+        with self.lock:
+            if not self.recent_messages:
+                return None
+            oldest_id = self.recent_messages[0]['id']
+            missed = [record for record in self.recent_messages
+                      if record['id'] > (last_seen_id or 0) and
+                      self._can_see(info, record)]
+
+        if not missed:
+            return None
 
-    def _broadcast(self, message):
-        disconnected_clients = []
+        return {
+            'type': 'history',
+            'messages': missed,
+            'server_epoch': self.server_epoch,
+            'truncated': (last_seen_id or 0) < oldest_id - 1,
+            'timestamp': datetime.now().isoformat()
+        }
 
-        for client_socket in self.clients.keys():
+    def _error_message(self, code, message, **fields):
+        error_msg = {
+            'type': 'error',
+            'code': code,
+            'message': message,
+            'timestamp': datetime.now().isoformat()
+        }
+        error_msg.update(fields)
+        return error_msg
+
+    def _send(self, client_socket, message):
+        if isinstance(message, str):
+            message = message.encode('utf-8')
+        info = self.clients.get(client_socket)
+        if info is None:
+            send_message(client_socket, JSON_MESSAGE, message)
+            return
+        info['outbox'].put_nowait(message)
+
+    def _write_client(self, client_socket, outbox):
+        while True:
+            message = outbox.get()
+            if message is None:
+                break
             try:
-                client_socket.send(message.encode('utf-8'))
+                send_message(client_socket, JSON_MESSAGE, message)
             except:
-                disconnected_clients.append(client_socket)
+                try:
+                    client_socket.shutdown(socket.SHUT_RDWR)
+                except:
+                    pass
+                break
 
-        for client_socket in disconnected_clients:
-            if client_socket in self.clients:
-                del self.clients[client_socket]
+    def _close_outbox(self, info):
+        outbox = info['outbox']
+        while True:
+            try:
+                outbox.put_nowait(None)
+                return
+            except queue.Full:
+                try:
+                    outbox.get_nowait()
+                except queue.Empty:
+                    pass
 
-    def _broadcast_user_list(self):
-        user_list = [info['username'] for info in self.clients.values()]
+    def _broadcast(self, message, exclude=None):
+        self._send_to([client_socket for client_socket in list(self.clients)
+                       if client_socket is not exclude], message)
+
+    def _send_to(self, client_sockets, message):
+        message = message.encode('utf-8')
+        for client_socket in client_sockets:
+            try:
+                self._send(client_socket, message)
+            except:
+                try:
+                    client_socket.shutdown(socket.SHUT_RDWR)
+                except:
+                    pass
+
+    def _send_user_list(self, client_socket):
+        user_list = [info['username'] for info in list(self.clients.values())]
         user_list_msg = {
             'type': 'user_list',
             'users': user_list,
             'timestamp': datetime.now().isoformat()
         }
-        self._broadcast(json.dumps(user_list_msg))
-        self.user_list_updated.emit(user_list)
-
-    def send_message(self, username, message):
-        if self.running and self.clients:
-            server_msg = {
-                'type': 'message',
-                'username': username,
-                'message': message,
-                'timestamp': datetime.now().isoformat()
-            }
-            self._broadcast(json.dumps(server_msg))
-            self.message_received.emit(username, message)
+        self._send(client_socket, json.dumps(user_list_msg))
+
+    def _broadcast_user_event(self, event, username, old_username=None,
+                              exclude=None):
+        user_event_msg = {
+            'type': 'user_event',
+            'event': event,
+            'username': username,
+            'old_username': old_username,
+            'timestamp': datetime.now().isoformat()
+        }
+        self._broadcast(json.dumps(user_event_msg), exclude=exclude)
+        self.user_list_updated.emit(
+            [info['username'] for info in list(self.clients.values())])
+
+    def send_message(self, username, message, room=None, recipient=None):
+        if self.running:
+            if not recipient:
+                room = room or self.DEFAULT_ROOM
+            record = self._record_message(username, message, room, recipient)
+            if self.clients:
+                self._notify(record)
+
+    def get_room_members(self, room):
+        with self.lock:
+            members = list(self.rooms.get(room, ()))
+        return [self.clients[client_socket]['username']
+                for client_socket in members if client_socket in self.clients]
 
     def get_server_status(self):
         return {
             "running": self.running,
             "port": self.port,
             "users_connected": len(self.clients),
-            "users": [info['username'] for info in self.clients.values()]
+            "users": [info['username'] for info in self.clients.values()],
+            "last_message_id": self.last_message_id,
+            "rooms": {room: len(members) for room, members in list(self.rooms.items())}
         }
@@ -0,0 +1,172 @@
+import io
+import struct
+import sys
+
+
+CURSOR_HEADER = struct.Struct('>hhBB')
+SHAPE_HEADER = struct.Struct('>BB')
+FLAG_VISIBLE = 1
+FLAG_SHAPE = 2
+
+CURSOR_SHAPES = ('arrow', 'ibeam', 'hand', 'wait', 'cross', 'size')
+
+WINDOWS_CURSORS = {
+    32512: 'arrow',
+    32513: 'ibeam',
+    32514: 'wait',
+    32515: 'cross',
+    32642: 'size',
+    32643: 'size',
+    32644: 'size',
+    32645: 'size',
+    32646: 'size',
+    32649: 'hand',
+    32650: 'wait'
+}
+
+_windows_handles = None
+_sprites = {}
+
+
+def windows_cursor():
+    global _windows_handles
+    import ctypes
+    from ctypes import wintypes
+
+    class CURSORINFO(ctypes.Structure):
+        _fields_ = [('cbSize', wintypes.DWORD),
+                    ('flags', wintypes.DWORD),
+                    ('hCursor', wintypes.HANDLE),
+                    ('ptScreenPos', wintypes.POINT)]
+
+    user32 = ctypes.windll.user32
+    if _windows_handles is None:
+        user32.LoadCursorW.restype = wintypes.HANDLE
+        _windows_handles = {}
+        for ident, shape in WINDOWS_CURSORS.items():
+            handle = user32.LoadCursorW(None, ctypes.c_void_p(ident))
+            if handle:
+                _windows_handles[handle] = shape
+
+    info = CURSORINFO()
+    info.cbSize = ctypes.sizeof(CURSORINFO)
+    if not user32.GetCursorInfo(ctypes.byref(info)) or not info.flags & 1:
+        return None
+
+    return (info.ptScreenPos.x, info.ptScreenPos.y,
+            _windows_handles.get(info.hCursor, 'arrow'))
+
+
+def qt_cursor():
+    try:
+        from PyQt6.QtGui import QCursor, QGuiApplication
+
+        if QGuiApplication.instance() is None:
+            return None
+        pos = QCursor.pos()
+        return pos.x(), pos.y(), 'arrow'
+    except:
+        return None
+
+
+def system_cursor():
+    if sys.platform == 'win32':
+        try:
+            return windows_cursor()
+        except:
+            return None
+    return qt_cursor()
+
+
+def shape_id(shape):
+    return CURSOR_SHAPES.index(shape) if shape in CURSOR_SHAPES else 0
+
+
+def _draw_sprite(shape):
+    from PIL import Image, ImageDraw
+
+    black, white = (0, 0, 0, 255), (255, 255, 255, 255)
+
+    if shape == 'ibeam':
+        image = Image.new('RGBA', (9, 19))
+        draw = ImageDraw.Draw(image)
+        for color, width in ((white, 3), (black, 1)):
+            draw.line([(4, 1), (4, 17)], fill=color, width=width)
+            draw.line([(1, 1), (7, 1)], fill=color, width=width)
+            draw.line([(1, 17), (7, 17)], fill=color, width=width)
+        return 4, 9, image
+
+    if shape == 'cross':
+        image = Image.new('RGBA', (19, 19))
+        draw = ImageDraw.Draw(image)
+        for color, width in ((white, 3), (black, 1)):
+            draw.line([(9, 0), (9, 18)], fill=color, width=width)
+            draw.line([(0, 9), (18, 9)], fill=color, width=width)
+        return 9, 9, image
+
+    if shape == 'size':
+        image = Image.new('RGBA', (21, 21))
+        draw = ImageDraw.Draw(image)
+        for color, width in ((white, 3), (black, 1)):
+            draw.line([(10, 1), (10, 19)], fill=color, width=width)
+            draw.line([(1, 10), (19, 10)], fill=color, width=width)
+        for points in (((10, 0), (6, 4), (14, 4)), ((10, 20), (6, 16), (14, 16)),
+                       ((0, 10), (4, 6), (4, 14)), ((20, 10), (16, 6), (16, 14))):
+            draw.polygon(points, fill=black, outline=white)
+        return 10, 10, image
+
+    if shape == 'wait':
+        image = Image.new('RGBA', (18, 18))
+        draw = ImageDraw.Draw(image)
+        draw.ellipse([1, 1, 16, 16], outline=white, width=4)
+        draw.arc([1, 1, 16, 16], 0, 270, fill=(40, 120, 220, 255), width=4)
+        return 9, 9, image
+
+    if shape == 'hand':
+        image = Image.new('RGBA', (17, 21))
+        draw = ImageDraw.Draw(image)
+        draw.polygon([(5, 0), (8, 0), (8, 8), (15, 9), (15, 16), (12, 20),
+                      (5, 20), (1, 14), (1, 10), (5, 12)],
+                     fill=white, outline=black)
+        return 6, 0, image
+
+    image = Image.new('RGBA', (13, 21))
+    draw = ImageDraw.Draw(image)
+    draw.polygon([(0, 0), (0, 17), (4, 13), (7, 20), (10, 19), (7, 12),
+                  (12, 12)], fill=white, outline=black)
+    return 0, 0, image
+
+
+def cursor_sprite(shape):
+    sprite = _sprites.get(shape)
+    if sprite is None:
+        hot_x, hot_y, image = _draw_sprite(shape)
+        png = io.BytesIO()
+        image.save(png, format='PNG')
+        sprite = _sprites[shape] = SHAPE_HEADER.pack(hot_x, hot_y) + png.getvalue()
+    return sprite
+
+
+def pack_cursor(x, y, visible, shape, sprite=None):
+    flags = (FLAG_VISIBLE if visible else 0) | (FLAG_SHAPE if sprite else 0)
+    x = max(-32768, min(32767, x))
+    y = max(-32768, min(32767, y))
+    return CURSOR_HEADER.pack(x, y, flags, shape) + (sprite or b'')
+
+
+def unpack_cursor(data):
+    x, y, flags, shape = CURSOR_HEADER.unpack_from(data)
+    cursor = {
+        'x': x,
+        'y': y,
+        'visible': bool(flags & FLAG_VISIBLE),
+        'shape': shape,
+        'hotspot': None,
+        'sprite': None
+    }
+
+    if flags & FLAG_SHAPE:
+        offset = CURSOR_HEADER.size
+        cursor['hotspot'] = SHAPE_HEADER.unpack_from(data, offset)
+        cursor['sprite'] = data[offset + SHAPE_HEADER.size:]
+    return cursor
@@ -1,14 +1,23 @@
 import sqlite3
 import json
 import os
+import threading
 from datetime import datetime
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 
 
 class DatabaseManager:
+    FTS_TABLES = {
+        'chat_messages': ('chat_messages_fts', ('username', 'message')),
+        'system_logs': ('system_logs_fts', ('module', 'message')),
+    }
+
     def __init__(self, db_path: str = "database/securestream.db"):
         self.db_path = db_path
+        self.fts_enabled = False
+        self.backfill_thread = None
         self._init_database()
+        self.start_search_backfill()
 
     def _init_database(self):
         os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
@@ -51,10 +60,19 @@ class DatabaseManager:
                 timestamp DATETIME NOT NULL,
                 ip_address TEXT,
                 session_id INTEGER,
+                room TEXT,
+                recipient TEXT,
                 FOREIGN KEY (session_id) REFERENCES recording_sessions (id)
             )
         ''')
 
+        cursor.execute('PRAGMA table_info(chat_messages)')
+        chat_columns = {row[1] for row in cursor.fetchall()}
+        for column in ('room', 'recipient'):
+            if column not in chat_columns:
+                cursor.execute(
+                    f'ALTER TABLE chat_messages ADD COLUMN {column} TEXT')
+
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS system_logs (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -109,12 +127,277 @@ class DatabaseManager:
             )
         ''')
 
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_recording_sessions_start_time
+            ON recording_sessions (start_time, id)
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_recording_sessions_type_start_time
+            ON recording_sessions (session_type, start_time, id)
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_screenshots_timestamp
+            ON screenshots (timestamp, id)
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_chat_messages_timestamp
+            ON chat_messages (timestamp, id)
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_chat_messages_room_timestamp
+            ON chat_messages (room, timestamp, id)
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_chat_messages_recipient_timestamp
+            ON chat_messages (recipient, timestamp, id)
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_system_logs_timestamp
+            ON system_logs (timestamp, id)
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_media_metadata_created_at
+            ON media_metadata (created_at, id)
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_media_metadata_type_created_at
+            ON media_metadata (file_type, created_at, id)
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_audio_metadata_created_at
+            ON audio_metadata (created_at, id)
+        ''')
+
+        self.fts_enabled = self._init_search_index(cursor)
+
         conn.commit()
         conn.close()
 
+    def _init_search_index(self, cursor) -> bool:
+        try:
+            for table, (fts_table, columns) in self.FTS_TABLES.items():
+                cursor.execute(
+                    "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+                    (fts_table,))
+                created = not cursor.fetchone()
+
+                column_list = ', '.join(columns)
+                new_values = ', '.join(f'new.{c}' for c in columns)
+                old_values = ', '.join(f'old.{c}' for c in columns)
+                indexed = f'''
+                    NOT EXISTS (
+                        SELECT 1 FROM app_settings
+                        WHERE category = 'fts_backfill' AND key = '{table}'
+                          AND old.id > json_extract(value, '$.last_id')
+                          AND old.id <= json_extract(value, '$.max_id')
+                    )
+                '''
+
+                if created:
+                    cursor.execute(f'''
+                        CREATE VIRTUAL TABLE {fts_table} USING fts5(
+                            {column_list},
+                            content='{table}',
+                            content_rowid='id',
+                            tokenize='unicode61 remove_diacritics 2'
+                        )
+                    ''')
+
+                for suffix in ('ai', 'ad', 'au'):
+                    cursor.execute(f'DROP TRIGGER IF EXISTS {fts_table}_{suffix}')
+
+                cursor.execute(f'''
+                    CREATE TRIGGER {fts_table}_ai AFTER INSERT ON {table} BEGIN
+                        INSERT INTO {fts_table} (rowid, {column_list})
+                        VALUES (new.id, {new_values});
+                    END
+                ''')
+                cursor.execute(f'''
+                    CREATE TRIGGER {fts_table}_ad AFTER DELETE ON {table}
+                    WHEN {indexed} BEGIN
+                        INSERT INTO {fts_table} ({fts_table}, rowid, {column_list})
+                        VALUES ('delete', old.id, {old_values});
+                    END
+                ''')
+                cursor.execute(f'''
+                    CREATE TRIGGER {fts_table}_au AFTER UPDATE ON {table}
+                    WHEN {indexed} BEGIN
+                        INSERT INTO {fts_table} ({fts_table}, rowid, {column_list})
+                        VALUES ('delete', old.id, {old_values});
+                        INSERT INTO {fts_table} (rowid, {column_list})
+                        VALUES (new.id, {new_values});
+                    END
+                ''')
+
+                if not created:
+                    continue
+
+                cursor.execute(f'SELECT COALESCE(MAX(id), 0) FROM {table}')
+                max_id = cursor.fetchone()[0]
+                if max_id:
+                    cursor.execute('''
+                        INSERT OR REPLACE INTO app_settings
+                        (category, key, value, description, last_modified)
+                        VALUES (?, ?, ?, ?, ?)
+                    ''', ('fts_backfill', table,
+                          json.dumps({'last_id': 0, 'max_id': max_id}),
+                          'Прогресс индексации полнотекстового поиска',
+                          datetime.now()))
+
+            return True
+
+        except sqlite3.OperationalError as e:
+            print(f"Полнотекстовый поиск недоступен (FTS5): {e}")
+            return False
+
+    def start_search_backfill(self):
+        if not self.fts_enabled:
+            return
+
+        if self.backfill_thread and self.backfill_thread.is_alive():
+            return
+
+        self.backfill_thread = threading.Thread(
+            target=self._run_search_backfill, daemon=True)
+        self.backfill_thread.start()
+
+    def _run_search_backfill(self):
+        try:
+            self.backfill_search_index()
+        except sqlite3.Error as e:
+            print(f"Индексация поиска прервана, продолжится при следующем запуске: {e}")
+
+    def backfill_search_index(self, chunk_size: int = 5000):
+        if not self.fts_enabled:
+            return
+
+        for table, (fts_table, columns) in self.FTS_TABLES.items():
+            column_list = ', '.join(columns)
+
+            while True:
+                conn = self._get_connection()
+                cursor = conn.cursor()
+
+                cursor.execute('BEGIN IMMEDIATE')
+                cursor.execute('''
+                    SELECT value FROM app_settings
+                    WHERE category = 'fts_backfill' AND key = ?
+                ''', (table,))
+                result = cursor.fetchone()
+                if not result:
+                    conn.close()
+                    break
+
+                state = json.loads(result[0])
+                last_id = state['last_id']
+                upper_id = min(last_id + chunk_size, state['max_id'])
+
+                cursor.execute(f'''
+                    INSERT INTO {fts_table} (rowid, {column_list})
+                    SELECT id, {column_list} FROM {table}
+                    WHERE id > ? AND id <= ?
+                ''', (last_id, upper_id))
+
+                if upper_id >= state['max_id']:
+                    cursor.execute('''
+                        DELETE FROM app_settings
+                        WHERE category = 'fts_backfill' AND key = ?
+                    ''', (table,))
+                else:
+                    state['last_id'] = upper_id
+                    cursor.execute('''
+                        UPDATE app_settings SET value = ?, last_modified = ?
+                        WHERE category = 'fts_backfill' AND key = ?
+                    ''', (json.dumps(state), datetime.now(), table))
+
+                conn.commit()
+                conn.close()
+
+    @staticmethod
+    def _fts_query(text: str) -> str:
+        terms = [term.replace('"', '""') for term in text.split()]
+        return ' '.join(f'"{term}"' for term in terms)
+
+    def _search(self, cursor, table: str, time_column: str, text: str,
+                filters: Dict = None, since=None, until=None,
+                limit: int = 50) -> List[tuple]:
+        fts_table, columns = self.FTS_TABLES[table]
+
+        if self.fts_enabled:
+            query = f'''
+                SELECT t.*, snippet({fts_table}, -1, '<b>', '</b>', '…', 12),
+                       {fts_table}.rank
+                FROM {fts_table}
+                JOIN {table} t ON t.id = {fts_table}.rowid
+                WHERE {fts_table} MATCH ?
+            '''
+            params = [self._fts_query(text)]
+        else:
+            conditions = ' OR '.join(f't.{c} LIKE ?' for c in columns)
+            query = f'''
+                SELECT t.*, t.message, 0 FROM {table} t
+                WHERE ({conditions})
+            '''
+            params = [f'%{text}%'] * len(columns)
+
+        for column, value in (filters or {}).items():
+            if value is not None:
+                query += f' AND t.{column} = ?'
+                params.append(value)
+
+        if since is not None:
+            query += f' AND t.{time_column} >= ?'
+            params.append(since)
+
+        if until is not None:
+            query += f' AND t.{time_column} < ?'
+            params.append(until)
+
+        if self.fts_enabled:
+            query += f' ORDER BY {fts_table}.rank LIMIT ?'
+        else:
+            query += f' ORDER BY t.{time_column} DESC LIMIT ?'
+        params.append(limit)
+
+        cursor.execute(query, params)
+        return cursor.fetchall()
+
     def _get_connection(self):
         return sqlite3.connect(self.db_path)
 
+    def _fetch_page(self, cursor, table: str, time_column: str,
+                    filters: Dict = None, before: Optional[Tuple] = None,
+                    since=None, until=None, limit: int = 100) -> List[tuple]:
+        query = f'SELECT * FROM {table} WHERE 1=1'
+        params = []
+
+        for column, value in (filters or {}).items():
+            if value is not None:
+                query += f' AND {column} = ?'
+                params.append(value)
+
+        if since is not None:
+            query += f' AND {time_column} >= ?'
+            params.append(since)
+
+        if until is not None:
+            query += f' AND {time_column} < ?'
+            params.append(until)
+
+        if before is not None:
+            query += f' AND ({time_column}, id) < (?, ?)'
+            params.extend(before)
+
+        query += f' ORDER BY {time_column} DESC, id DESC LIMIT ?'
+        params.append(limit)
+
+        cursor.execute(query, params)
+        return cursor.fetchall()
+
+    @staticmethod
+    def page_cursor(row: Dict, time_key: str = 'timestamp') -> Tuple:
+        return (row[time_key], row['id'])
+
     def start_recording_session(self, session_type: str, settings: Dict) -> int:
         conn = self._get_connection()
         cursor = conn.cursor()
@@ -150,18 +433,19 @@ class DatabaseManager:
         self._log_system_event(
             'INFO', 'database', f'Stopped recording session: {session_id}')
 
-    def get_recording_sessions(self, limit: int = 100) -> List[Dict]:
+    def get_recording_sessions(self, limit: int = 100,
+                               before: Optional[Tuple] = None,
+                               since=None, until=None,
+                               session_type: str = None) -> List[Dict]:
         conn = self._get_connection()
         cursor = conn.cursor()
 
-        cursor.execute('''
-            SELECT * FROM recording_sessions 
-            ORDER BY start_time DESC 
-            LIMIT ?
-        ''', (limit,))
+        rows = self._fetch_page(cursor, 'recording_sessions', 'start_time',
+                                {'session_type': session_type},
+                                before, since, until, limit)
 
         sessions = []
-        for row in cursor.fetchall():
+        for row in rows:
             sessions.append({
                 'id': row[0],
                 'session_type': row[1],
@@ -194,18 +478,19 @@ class DatabaseManager:
         self._log_system_event(
             'INFO', 'database', f'Saved screenshot metadata: {file_path}')
 
-    def get_screenshots(self, limit: int = 50) -> List[Dict]:
+    def get_screenshots(self, limit: int = 50,
+                        before: Optional[Tuple] = None,
+                        since=None, until=None,
+                        quality: str = None) -> List[Dict]:
         conn = self._get_connection()
         cursor = conn.cursor()
 
-        cursor.execute('''
-            SELECT * FROM screenshots 
-            ORDER BY timestamp DESC 
-            LIMIT ?
-        ''', (limit,))
+        rows = self._fetch_page(cursor, 'screenshots', 'timestamp',
+                                {'quality': quality},
+                                before, since, until, limit)
 
         screenshots = []
-        for row in cursor.fetchall():
+        for row in rows:
             screenshots.append({
                 'id': row[0],
                 'timestamp': row[1],
@@ -221,31 +506,55 @@ class DatabaseManager:
 
     def save_chat_message(self, username: str, message: str,
                           message_type: str = 'text', ip_address: str = None,
-                          session_id: int = None):
+                          session_id: int = None, room: str = None,
+                          recipient: str = None):
         conn = self._get_connection()
         cursor = conn.cursor()
 
         cursor.execute('''
             INSERT INTO chat_messages 
-            (username, message, message_type, timestamp, ip_address, session_id)
-            VALUES (?, ?, ?, ?, ?, ?)
-        ''', (username, message, message_type, datetime.now(), ip_address, session_id))
+            (username, message, message_type, timestamp, ip_address, session_id,
+             room, recipient)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (username, message, message_type, datetime.now(), ip_address,
+              session_id, room, recipient))
 
         conn.commit()
         conn.close()
 
-    def get_chat_history(self, limit: int = 200) -> List[Dict]:
+    def save_chat_messages(self, messages: List[Dict]):
         conn = self._get_connection()
         cursor = conn.cursor()
 
-        cursor.execute('''
-            SELECT * FROM chat_messages 
-            ORDER BY timestamp DESC 
-            LIMIT ?
-        ''', (limit,))
+        cursor.executemany('''
+            INSERT INTO chat_messages 
+            (username, message, message_type, timestamp, ip_address, session_id,
+             room, recipient)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', [(m['username'], m['message'], m.get('message_type', 'text'),
+               m.get('timestamp') or datetime.now(), m.get('ip_address'),
+               m.get('session_id'), m.get('room'), m.get('recipient'))
+              for m in messages])
+
+        conn.commit()
+        conn.close()
+
+    def get_chat_history(self, limit: int = 200,
+                         before: Optional[Tuple] = None,
+                         since=None, until=None,
+                         message_type: str = None, room: str = None,
+                         recipient: str = None) -> List[Dict]:
+        conn = self._get_connection()
+        cursor = conn.cursor()
+
+        rows = self._fetch_page(cursor, 'chat_messages', 'timestamp',
+                                {'message_type': message_type,
+                                 'room': room,
+                                 'recipient': recipient},
+                                before, since, until, limit)
 
         messages = []
-        for row in cursor.fetchall():
+        for row in rows:
             messages.append({
                 'id': row[0],
                 'username': row[1],
@@ -253,11 +562,13 @@ class DatabaseManager:
                 'message_type': row[3],
                 'timestamp': row[4],
                 'ip_address': row[5],
-                'session_id': row[6]
+                'session_id': row[6],
+                'room': row[7],
+                'recipient': row[8]
             })
 
         conn.close()
-        return list(reversed(messages))
+        return messages
 
     def get_chat_messages_after_id(self, last_id: int) -> List[Dict]:
         conn = self._get_connection()
@@ -278,7 +589,42 @@ class DatabaseManager:
                 'message_type': row[3],
                 'timestamp': row[4],
                 'ip_address': row[5],
-                'session_id': row[6]
+                'session_id': row[6],
+                'room': row[7],
+                'recipient': row[8]
+            })
+
+        conn.close()
+        return messages
+
+    def search_chat_messages(self, text: str, limit: int = 50,
+                             since=None, until=None,
+                             message_type: str = None,
+                             room: str = None) -> List[Dict]:
+        if not text.strip():
+            return []
+
+        conn = self._get_connection()
+        cursor = conn.cursor()
+
+        rows = self._search(cursor, 'chat_messages', 'timestamp', text,
+                            {'message_type': message_type, 'room': room},
+                            since, until, limit)
+
+        messages = []
+        for row in rows:
+            messages.append({
+                'id': row[0],
+                'username': row[1],
+                'message': row[2],
+                'message_type': row[3],
+                'timestamp': row[4],
+                'ip_address': row[5],
+                'session_id': row[6],
+                'room': row[7],
+                'recipient': row[8],
+                'snippet': row[9],
+                'rank': row[10]
             })
 
         conn.close()
@@ -347,35 +693,55 @@ class DatabaseManager:
         conn.close()
 
     def get_system_logs(self, level: str = None, module: str = None,
-                        limit: int = 100) -> List[Dict]:
+                        limit: int = 100, before: Optional[Tuple] = None,
+                        since=None, until=None) -> List[Dict]:
         conn = self._get_connection()
         cursor = conn.cursor()
 
-        query = 'SELECT * FROM system_logs WHERE 1=1'
-        params = []
+        rows = self._fetch_page(cursor, 'system_logs', 'timestamp',
+                                {'log_level': level or None,
+                                 'module': module or None},
+                                before, since, until, limit)
 
-        if level:
-            query += ' AND log_level = ?'
-            params.append(level)
+        logs = []
+        for row in rows:
+            logs.append({
+                'id': row[0],
+                'level': row[1],
+                'module': row[2],
+                'message': row[3],
+                'timestamp': row[4],
+                'additional_data': json.loads(row[5]) if row[5] else {}
+            })
 
-        if module:
-            query += ' AND module = ?'
-            params.append(module)
+        conn.close()
+        return logs
 
-        query += ' ORDER BY timestamp DESC LIMIT ?'
-        params.append(limit)
+    def search_system_logs(self, text: str, limit: int = 50,
+                           since=None, until=None, level: str = None,
+                           module: str = None) -> List[Dict]:
+        if not text.strip():
+            return []
 
-        cursor.execute(query, params)
+        conn = self._get_connection()
+        cursor = conn.cursor()
+
+        rows = self._search(cursor, 'system_logs', 'timestamp', text,
+                            {'log_level': level or None,
+                             'module': module or None},
+                            since, until, limit)
 
         logs = []
-        for row in cursor.fetchall():
+        for row in rows:
             logs.append({
                 'id': row[0],
                 'level': row[1],
                 'module': row[2],
                 'message': row[3],
                 'timestamp': row[4],
-                'additional_data': json.loads(row[5]) if row[5] else {}
+                'additional_data': json.loads(row[5]) if row[5] else {},
+                'snippet': row[6],
+                'rank': row[7]
             })
 
         conn.close()
@@ -399,24 +765,18 @@ class DatabaseManager:
         conn.commit()
         conn.close()
 
-    def get_media_files(self, file_type: str = None, limit: int = 100) -> List[Dict]:
+    def get_media_files(self, file_type: str = None, limit: int = 100,
+                        before: Optional[Tuple] = None,
+                        since=None, until=None) -> List[Dict]:
         conn = self._get_connection()
         cursor = conn.cursor()
 
-        query = 'SELECT * FROM media_metadata WHERE 1=1'
-        params = []
-
-        if file_type:
-            query += ' AND file_type = ?'
-            params.append(file_type)
-
-        query += ' ORDER BY created_at DESC LIMIT ?'
-        params.append(limit)
-
-        cursor.execute(query, params)
+        rows = self._fetch_page(cursor, 'media_metadata', 'created_at',
+                                {'file_type': file_type or None},
+                                before, since, until, limit)
 
         media_files = []
-        for row in cursor.fetchall():
+        for row in rows:
             media_files.append({
                 'id': row[0],
                 'file_path': row[1],
@@ -504,24 +864,20 @@ class DatabaseManager:
         self._log_system_event(
             'INFO', 'database', f'Saved audio metadata: {file_path}')
 
-    def get_audio_files(self, session_id: int = None, limit: int = 100) -> List[Dict]:
+    def get_audio_files(self, session_id: int = None, limit: int = 100,
+                        before: Optional[Tuple] = None,
+                        since=None, until=None,
+                        format: str = None) -> List[Dict]:
         conn = self._get_connection()
         cursor = conn.cursor()
 
-        query = 'SELECT * FROM audio_metadata WHERE 1=1'
-        params = []
-
-        if session_id:
-            query += ' AND session_id = ?'
-            params.append(session_id)
-
-        query += ' ORDER BY created_at DESC LIMIT ?'
-        params.append(limit)
-
-        cursor.execute(query, params)
+        rows = self._fetch_page(cursor, 'audio_metadata', 'created_at',
+                                {'session_id': session_id or None,
+                                 'format': format},
+                                before, since, until, limit)
 
         audio_files = []
-        for row in cursor.fetchall():
+        for row in rows:
             audio_files.append({
                 'id': row[0],
                 'file_path': row[1],
@@ -0,0 +1,115 @@
+import os
+import threading
+from collections import OrderedDict
+
+
+class DecodePool:
+    def __init__(self, workers=None, max_pending=32):
+        if workers is None:
+            workers = max(1, min(4, (os.cpu_count() or 2) - 1))
+
+        self.workers = workers
+        self.max_pending = max_pending
+        self.condition = threading.Condition()
+        self.pending = OrderedDict()
+        self.busy = set()
+        self.waiting = set()
+        self.running = True
+
+        self.submitted = 0
+        self.decoded = 0
+        self.dropped = 0
+
+        self.threads = []
+        for _ in range(workers):
+            thread = threading.Thread(target=self._worker)
+            thread.daemon = True
+            thread.start()
+            self.threads.append(thread)
+
+    def submit(self, client, frame_data, frame_type=0, keyframe=True, timing=None):
+        overflow = False
+        with self.condition:
+            self.submitted += 1
+            jobs = self.pending.get(client)
+            if keyframe:
+                self.waiting.discard(client)
+                if jobs:
+                    self.dropped += len(jobs)
+                    jobs = None
+            elif client in self.waiting:
+                self.dropped += 1
+                return
+            elif jobs and len(jobs) >= self.max_pending:
+                self.dropped += len(jobs) + 1
+                del self.pending[client]
+                self.waiting.add(client)
+                overflow = True
+
+            if not overflow:
+                if jobs is None:
+                    jobs = self.pending[client] = []
+                jobs.append((frame_data, frame_type, timing))
+                self.condition.notify()
+
+        if overflow:
+            client._request_keyframe(frame_type)
+
+    def discard(self, client):
+        with self.condition:
+            self.waiting.discard(client)
+            jobs = self.pending.pop(client, None)
+            if jobs:
+                self.dropped += len(jobs)
+
+    def _next_job(self):
+        for client in self.pending:
+            if client not in self.busy:
+                return client, self.pending.pop(client)
+        return None
+
+    def _worker(self):
+        while True:
+            with self.condition:
+                job = self._next_job()
+                while self.running and job is None:
+                    self.condition.wait()
+                    job = self._next_job()
+
+                if not self.running:
+                    return
+
+                client, jobs = job
+                self.busy.add(client)
+
+            for frame_data, frame_type, timing in jobs:
+                try:
+                    client._decode_frame(frame_data, frame_type, timing)
+                except Exception as e:
+                    print(f"Ошибка декодирования кадра в пуле: {e}")
+
+            with self.condition:
+                self.busy.discard(client)
+                self.decoded += len(jobs)
+                self.condition.notify_all()
+
+    def shutdown(self):
+        with self.condition:
+            self.running = False
+            self.pending.clear()
+            self.waiting.clear()
+            self.condition.notify_all()
+
+        for thread in self.threads:
+            thread.join(timeout=1.0)
+
+    def get_stats(self):
+        with self.condition:
+            return {
+                'workers': self.workers,
+                'pending': sum(len(jobs) for jobs in self.pending.values()),
+                'submitted': self.submitted,
+                'decoded': self.decoded,
+                'dropped': self.dropped,
+                'waiting': len(self.waiting)
+            }
@@ -0,0 +1,70 @@
+import struct
+from collections import deque
+
+
+FRAME_INFO_TYPE = 7
+FRAME_INFO = struct.Struct('>LLLLLLL')
+
+STAGES = ('capture', 'encode', 'send', 'network', 'receive', 'decode', 'paint')
+
+
+def to_us(seconds):
+    return max(0, min(0xFFFFFFFF, int(seconds * 1000000)))
+
+
+def pack_frame_info(seq, captured_us, capture_s, encode_s, send_s=0.0,
+                    rtt_s=0.0, glass_s=0.0):
+    return FRAME_INFO.pack(seq & 0xFFFFFFFF, captured_us & 0xFFFFFFFF,
+                           to_us(capture_s), to_us(encode_s), to_us(send_s),
+                           to_us(rtt_s), to_us(glass_s))
+
+
+def unpack_frame_info(data):
+    seq, captured_us, capture_us, encode_us, send_us, rtt_us, glass_us = \
+        FRAME_INFO.unpack_from(data)
+    return {
+        'seq': seq,
+        'captured_us': captured_us,
+        'capture_s': capture_us / 1000000,
+        'encode_s': encode_us / 1000000,
+        'send_s': send_us / 1000000,
+        'rtt_s': rtt_us / 1000000,
+        'glass_s': glass_us / 1000000
+    }
+
+
+class LatencyTracker:
+    def __init__(self, window=120):
+        self.samples = {name: deque(maxlen=window)
+                        for name in STAGES + ('rtt', 'glass')}
+        self.frames = 0
+
+    def add(self, timing):
+        self.frames += 1
+        for name in STAGES:
+            key = name + '_s'
+            if name == 'network':
+                self.samples[name].append(timing.get('rtt_s', 0.0) / 2)
+            elif key in timing:
+                self.samples[name].append(timing[key])
+
+        if timing.get('rtt_s'):
+            self.samples['rtt'].append(timing['rtt_s'])
+        if timing.get('glass_s'):
+            self.samples['glass'].append(timing['glass_s'])
+
+    def reset(self):
+        self.frames = 0
+        for samples in self.samples.values():
+            samples.clear()
+
+    def get_stats(self):
+        stats = {'frames': self.frames}
+        for name, samples in self.samples.items():
+            values = sorted(samples)
+            stats[name + '_ms'] = sum(values) * 1000 / len(values) if values else 0.0
+            if name in ('rtt', 'glass'):
+                stats[name + '_p99_ms'] = (
+                    values[int(len(values) * 0.99)] * 1000 if values else 0.0)
+        stats['total_ms'] = sum(stats[name + '_ms'] for name in STAGES)
+        return stats
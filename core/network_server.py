@@ -2,14 +2,36 @@ import socket
 import threading
 import time
 import io
-import struct
 import json
+from collections import OrderedDict, deque
+
+import numpy as np
 
-from PIL import ImageGrab
 from .audio_capture import AudioCapture
+from .cursor import cursor_sprite, pack_cursor, shape_id
+from .frame_timing import FRAME_INFO_TYPE, pack_frame_info
+from .remote_input import (InputInjector, command_event, unpack_event, INPUT_ACK,
+                           INPUT_MESSAGE, MOUSE_MOVE, MOUSE_DOWN, MOUSE_UP,
+                           MOUSE_WHEEL)
+from .sources import ScreenSource
+from .stream_mux import (StreamMultiplexer, PRIORITY_CONTROL, PRIORITY_REALTIME,
+                         PRIORITY_VIDEO)
+from .stream_recorder import StreamRecorder
+from .tile_codec import TileEncoder, TileCache, TileRefiner, TILE_CODEC_NAMES
+from .transport import MessageReader, JSON_MESSAGE, decode_json, tune_socket
+from .video_processor import VideoProcessor
+from .video_stream import H264Stream
 
 
 class RemoteAccessServer:
+    RENDITIONS = {'full': 1, 'half': 2, 'quarter': 4}
+    CODECS = {'jpeg': 0, 'tiles': 2, 'h264': 3}
+    CHANNELS = {0: 'video', 1: 'audio', 2: 'video', 3: 'video', 4: 'cursor',
+                5: 'input', FRAME_INFO_TYPE: 'timing', 255: 'control'}
+    LATENCY_STAGES = ('capture', 'encode', 'send', 'rtt', 'receive', 'decode',
+                      'paint', 'glass')
+    MAX_TILE_CACHE = 65536
+
     def __init__(self):
         self.running = False
 
@@ -24,7 +46,39 @@ class RemoteAccessServer:
         self.audio_enabled = False
         self.audio_device = 0
 
-    def start_server(self, port=8080, audio_enabled=False, audio_device=0):
+        self.screen_source = ScreenSource()
+        self.jpeg_quality = 70
+        self.motion_quality = 40
+        self.refine_delay = 1.0
+        self.frame_interval = 0.1
+        self.cursor_interval = 1.0 / 30
+        self.audio_interval = 0.005
+        self.chunk_size = 16384
+        self.tile_encoder = TileEncoder(jpeg_quality=self.jpeg_quality)
+        self.h264_available = VideoProcessor().is_available()
+        self.video_streams = {}
+
+        self.frame_lock = threading.Lock()
+        self.current_frame = None
+        self.frame_seq = 0
+
+        self.input_enabled = False
+        self.input_backend = None
+        self.input_injector = None
+
+        self.cursor_lock = threading.Lock()
+        self.current_cursor = None
+        self.cursor_polled_at = 0.0
+
+        self.stats_lock = threading.Lock()
+        self.stream_stats = self._empty_stream_stats()
+
+        self.session_recorder = StreamRecorder('remote_session')
+        self.recording_rendition = 'full'
+        self.recording_audio = {'audio_index': 0}
+
+    def start_server(self, port=8080, audio_enabled=False, audio_device=0,
+                     input_enabled=False):
         try:
             self.port = port
             self.audio_enabled = audio_enabled
@@ -41,6 +95,11 @@ class RemoteAccessServer:
             self.server_socket.settimeout(1.0)
 
             self.running = True
+            self.current_frame = None
+            self.reset_stream_stats()
+
+            self.input_injector = InputInjector(self.input_backend)
+            self.set_input_enabled(input_enabled)
 
             if self.audio_enabled:
                 self.audio_recorder.start_recording(device_index=audio_device)
@@ -58,19 +117,27 @@ class RemoteAccessServer:
 
     def stop_server(self):
         self.running = False
+        self.stop_session_recording()
 
         if self.audio_enabled:
             self.audio_recorder.stop_recording()
 
         for client_socket, addr in self.clients:
             try:
-                client_socket.close()
+                client_socket.shutdown(socket.SHUT_RDWR)
 
             except:
                 pass
 
         self.clients.clear()
 
+        self.set_input_enabled(False)
+
+        with self.frame_lock:
+            for stream in self.video_streams.values():
+                stream.close()
+            self.video_streams.clear()
+
         if self.server_socket:
             self.server_socket.close()
 
@@ -83,6 +150,7 @@ class RemoteAccessServer:
         while self.running:
             try:
                 client_socket, addr = self.server_socket.accept()
+                tune_socket(client_socket)
 
                 print(f'Подключен клиент: {addr}')
 
@@ -106,75 +174,73 @@ class RemoteAccessServer:
                 break
 
     def _handle_client(self, client_socket, addr):
+        mux = StreamMultiplexer(
+            client_socket, self.chunk_size, self._record_send_stats,
+            lambda e: self._send_failed(addr, e))
         try:
             welcome_msg = {
                 'type': 'system',
                 'message': 'Вы присоединились к SecureStream Remote Access',
+                'renditions': self.RENDITIONS,
+                'codecs': self._available_codecs(),
                 'timestamp': time.time()
             }
 
             welcome_json = json.dumps(welcome_msg).encode('utf-8')
-            data_type = struct.pack('>B', 255)
-            client_socket.sendall(data_type)
+            mux.start()
+            mux.send(JSON_MESSAGE, welcome_json, PRIORITY_CONTROL)
+
+            state = {
+                'mux': mux,
+                'rendition': None,
+                'codec': 'jpeg',
+                'tile_base': None,
+                'tile_cache': None,
+                'cache_reset': False,
+                'refiner': TileRefiner(self.refine_delay) if self.refine_delay > 0 else None,
+                'video_cursor': None,
+                'video_rendition': None,
+                'cursor_sent': None,
+                'cursor_shapes': set(),
+                'cursor_enabled': True,
+                'viewport': None,
+                'interval': None,
+                'streaming': True,
+                'last_seq': 0,
+                'commands': deque(),
+                'audio_index': len(self.audio_recorder.audio_data),
+                'frame_timings': OrderedDict(),
+                'timing_lock': threading.Lock(),
+                'latency': {},
+                'wakeup': threading.Event(),
+                'closed': False
+            }
 
-            welcome_size = struct.pack('>L', len(welcome_json))
-            client_socket.sendall(welcome_size)
-            client_socket.sendall(welcome_json)
+            reader = threading.Thread(
+                target=self._read_client, args=(client_socket, state))
+            reader.daemon = True
+            reader.start()
+
+            realtime = threading.Thread(
+                target=self._stream_realtime, args=(client_socket, addr, state))
+            realtime.daemon = True
+            realtime.start()
 
             while self.running:
                 try:
-                    img = ImageGrab.grab()
-                    if img.mode in ('RGBA', 'LA', 'P'):
-                        if img.mode == 'P':
-                            img = img.convert('RGBA')
-                        rgb_img = img.convert('RGB')
-                        img = rgb_img
-                    elif img.mode != 'RGB':
-                        img = img.convert('RGB')
-
-                    img_bytes = io.BytesIO()
-
-                    img.save(img_bytes, format='JPEG', quality=70)
-                    img_data = img_bytes.getvalue()
-                    print(
-                        f"Server: Захвачен экран, размер: {len(img_data)} байт")
-
-                    data_type = struct.pack('>B', 0)
-                    client_socket.sendall(data_type)
-
-                    size_data = struct.pack('>L', len(img_data))
-                    client_socket.sendall(size_data)
-                    print(
-                        f"Server: Отправлен размер данных: {len(img_data)} байт")
-
-                    client_socket.sendall(img_data)
-                    print(
-                        f"Server: Отправлены данные изображения: {len(img_data)} байт")
-
-                    if self.audio_enabled:
-                        audio_data = self._get_audio_data()
-                        if audio_data:
-                            audio_type = struct.pack('>B', 1)
-                            client_socket.sendall(audio_type)
-
-                            audio_size = struct.pack('>L', len(audio_data))
-                            client_socket.sendall(audio_size)
-                            client_socket.sendall(audio_data)
-                            print(
-                                f"Server: Отправлены аудио данные: {len(audio_data)} байт")
-
-                    client_socket.settimeout(1.0)
-
-                    try:
-                        data = client_socket.recv(1, socket.MSG_PEEK)
+                    if not state['streaming']:
+                        if not self._read_commands(client_socket, state):
+                            break
+                        self._wait_next_frame(state, self.frame_interval)
+                        continue
 
-                    except socket.timeout:
-                        pass
+                    self._send_frame(client_socket, addr, state)
 
-                    except:
+                    if not self._read_commands(client_socket, state):
                         break
 
-                    time.sleep(0.1)
+                    self._wait_next_frame(
+                        state, state['interval'] or self.frame_interval)
 
                 except Exception as e:
                     print(f'Ошибка при отправке данных клиенту {addr}: {e}')
@@ -184,32 +250,616 @@ class RemoteAccessServer:
             print(f'Ошибка обработки клиента {addr}: {e}')
 
         finally:
+            mux.close()
             if (client_socket, addr) in self.clients:
                 self.clients.remove((client_socket, addr))
 
+            try:
+                client_socket.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
             client_socket.close()
 
             print(f'Клиент отключен: {addr}')
 
-    def _get_audio_data(self):
+    def _send_failed(self, addr, error):
+        if self.running:
+            print(f'Ошибка при отправке данных клиенту {addr}: {error}')
+
+    def _send_frame(self, client_socket, addr, state):
+        rendition = self._client_rendition(state)
+        codec = state['codec']
+        frame, img_data = self._get_frame(
+            rendition, state['last_seq'], codec,
+            self._tile_base(state, rendition), state)
+        seq, captured_at = frame['seq'], frame['captured_at']
+        state['last_seq'] = seq
+        if codec == 'tiles':
+            state['tile_base'] = (rendition, frame)
+        if img_data is None:
+            return
+
+        print(
+            f"Server: Захвачен экран, размер: {len(img_data)} байт")
+
+        timing = {
+            'captured_at': captured_at,
+            'capture_s': frame['capture_s'],
+            'encode_s': state.pop('encode_s', 0.0)
+        }
+        with state['timing_lock']:
+            state['frame_timings'][seq] = timing
+            while len(state['frame_timings']) > 64:
+                state['frame_timings'].popitem(last=False)
+            latency = state['latency']
+
+        info = pack_frame_info(
+            seq, int(captured_at * 1000000), timing['capture_s'],
+            timing['encode_s'], latency.get('send_s', 0.0),
+            latency.get('rtt_s', 0.0), latency.get('glass_s', 0.0))
+        state['mux'].send(FRAME_INFO_TYPE, info, PRIORITY_VIDEO)
+        state['mux'].send(
+            self.CODECS[codec], img_data, PRIORITY_VIDEO,
+            lambda send_s: self._frame_sent(timing, send_s))
+        print(
+            f"Server: Отправлены данные изображения: {len(img_data)} байт")
+
+        self._record_frame_stats(rendition, codec, len(img_data))
+
+    def _wait_next_frame(self, state, delay):
+        deadline = time.perf_counter() + delay
+        mux = state['mux']
+        while not state['closed'] and not mux.closed:
+            state['wakeup'].clear()
+            now = time.perf_counter()
+            if now < deadline:
+                state['wakeup'].wait(deadline - now)
+            elif mux.pending(PRIORITY_VIDEO):
+                mux.wait_idle(PRIORITY_VIDEO, self.frame_interval)
+            else:
+                return
+
+    def _stream_realtime(self, client_socket, addr, state):
+        try:
+            while self.running and not state['closed'] and not state['mux'].closed:
+                if state['streaming']:
+                    if state['cursor_enabled']:
+                        self._send_cursor(client_socket, state)
+                    if self.audio_enabled:
+                        self._send_audio(state, addr)
+                else:
+                    state['audio_index'] = len(self.audio_recorder.audio_data)
+                time.sleep(self.audio_interval if self.audio_enabled
+                           else self.cursor_interval)
+        except Exception as e:
+            print(f'Ошибка отправки звука и курсора клиенту {addr}: {e}')
+
+    def _send_audio(self, state, addr):
+        audio_data = self._get_audio_data(state)
+        if not audio_data:
+            return
+
+        state['mux'].send(1, audio_data, PRIORITY_REALTIME)
+
+    def _get_cursor(self):
+        with self.cursor_lock:
+            now = time.perf_counter()
+            if now - self.cursor_polled_at >= self.cursor_interval:
+                try:
+                    self.current_cursor = self.screen_source.cursor()
+                except:
+                    self.current_cursor = None
+                self.cursor_polled_at = now
+            return self.current_cursor
+
+    def _send_cursor(self, client_socket, state):
+        cursor = self._get_cursor()
+        if cursor is None:
+            update = (0, 0, False, 0)
+        else:
+            x, y, shape = cursor
+            divisor = self.RENDITIONS.get(self._client_rendition(state), 1)
+            update = (x // divisor, y // divisor, True, shape_id(shape))
+
+        if update == state['cursor_sent']:
+            return
+
+        sprite = None
+        if update[2] and update[3] not in state['cursor_shapes']:
+            sprite = cursor_sprite(cursor[2])
+            state['cursor_shapes'].add(update[3])
+
+        data = pack_cursor(*update, sprite)
+        state['mux'].send(4, data, PRIORITY_REALTIME)
+        state['cursor_sent'] = update
+
+        with self.stats_lock:
+            self.stream_stats['cursor_updates'] += 1
+
+    def start_session_recording(self, save_path='recordings/remote'):
+        with self.frame_lock:
+            self.recording_audio['audio_index'] = len(
+                getattr(self.audio_recorder, 'audio_data', ()))
+            return self.session_recorder.start_recording(
+                save_path, self.audio_recorder.sample_rate,
+                self.audio_recorder.channels)
+
+    def stop_session_recording(self, on_saved=None):
+        return self.session_recorder.stop_recording(on_saved)
+
+    def _record_session_frame(self, frame):
+        if not self.session_recorder.recording:
+            return
+
+        img_data = self._encode_cached(frame, self.recording_rendition)[0]
+        self.session_recorder.write_frame(img_data, frame['captured_at'])
+
+        audio_data = self._get_audio_data(self.recording_audio)
+        if audio_data:
+            self.session_recorder.write_audio(audio_data)
+
+    def _grab_screen(self):
+        return self.screen_source.grab()
+
+    def _read_client(self, client_socket, state):
+        reader = MessageReader(client_socket)
+        try:
+            while self.running and not state['closed']:
+                try:
+                    message = reader.read_message()
+                except socket.timeout:
+                    continue
+                if message is None:
+                    break
+
+                data_type, payload = message
+                if data_type == INPUT_MESSAGE:
+                    if self.input_enabled:
+                        self._queue_input(unpack_event(payload), state)
+                    continue
+
+                command = decode_json(payload) if data_type == JSON_MESSAGE else None
+                if command is None:
+                    continue
+                if command.get('command') == 'frame_ack':
+                    self._frame_acked(command.get('data') or {}, state)
+                    continue
+
+                events = command_event(command)
+                if events is None:
+                    state['commands'].append(command)
+                    state['wakeup'].set()
+                    continue
+                if self.input_enabled:
+                    for event in events:
+                        self._queue_input(event, state)
+        except:
+            pass
+        finally:
+            state['closed'] = True
+            state['wakeup'].set()
+
+    def set_input_enabled(self, enabled):
+        self.input_enabled = bool(enabled)
+        if not self.input_injector:
+            return
+
+        if self.input_enabled:
+            self.input_injector.start()
+        else:
+            self.input_injector.stop()
+
+    def _queue_input(self, event, state):
+        if event['kind'] in (MOUSE_MOVE, MOUSE_DOWN, MOUSE_UP, MOUSE_WHEEL):
+            divisor = self.RENDITIONS.get(self._client_rendition(state), 1)
+            event['x'] *= divisor
+            event['y'] *= divisor
+
+        self.input_injector.submit(
+            event, lambda event, queue_s, inject_s: self._input_done(
+                state, event, queue_s, inject_s))
+
+    def _input_done(self, state, event, queue_s, inject_s):
+        if not event['time_us']:
+            return
+        state['mux'].send(5, INPUT_ACK.pack(
+            event['time_us'], int(queue_s * 1000000), int(inject_s * 1000000)),
+            PRIORITY_CONTROL)
+
+    def _frame_sent(self, timing, send_s):
+        timing['send_s'] = send_s
+        timing['sent_at'] = time.perf_counter()
+
+    def _frame_acked(self, data, state):
+        now = time.perf_counter()
+        try:
+            seq = int(data['seq'])
+            captured_us = int(data['captured_us'])
+            hold_s = int(data['hold_us']) / 1000000
+        except (KeyError, TypeError, ValueError):
+            return
+
+        with state['timing_lock']:
+            timing = state['frame_timings'].pop(seq, None)
+        if timing is None or 'sent_at' not in timing:
+            return
+
+        rtt_s = max(0.0, now - timing['sent_at'] - hold_s)
+        elapsed_us = (int(now * 1000000) - captured_us) & 0xFFFFFFFF
+        timing['rtt_s'] = rtt_s
+        timing['glass_s'] = max(0.0, elapsed_us / 1000000 - rtt_s / 2)
+        for name in ('receive', 'decode', 'paint'):
+            try:
+                timing[name + '_s'] = int(data.get(name + '_us', 0)) / 1000000
+            except (TypeError, ValueError):
+                timing[name + '_s'] = 0.0
+
+        with state['timing_lock']:
+            state['latency'] = timing
+        self._record_latency_stats(timing)
+
+    def _read_commands(self, client_socket, state):
+        while state['commands']:
+            self._handle_command(state['commands'].popleft(), state)
+        return not state['closed'] and not state['mux'].closed
+
+    def _handle_command(self, command, state):
+        name = command.get('command')
+        data = command.get('data') or {}
+
+        if name == 'set_viewport':
+            try:
+                state['viewport'] = (int(data['width']), int(data['height']))
+            except (KeyError, TypeError, ValueError):
+                state['viewport'] = None
+
+        elif name == 'start_stream':
+            state['streaming'] = True
+            try:
+                fps = float(data['fps'])
+                state['interval'] = 1.0 / fps if fps > 0 else None
+            except (KeyError, TypeError, ValueError):
+                pass
+
+        elif name == 'stop_stream':
+            state['streaming'] = False
+
+        elif name == 'set_codec':
+            codec = data.get('codec')
+            state['codec'] = codec if codec in self._available_codecs() else 'jpeg'
+            state['tile_base'] = None
+            state['video_cursor'] = None
+
+        elif name == 'request_keyframe':
+            self._reset_tile_stream(state)
+            state['video_cursor'] = None
+
+        elif name == 'set_tile_cache':
+            try:
+                tiles = min(int(data['tiles']), self.MAX_TILE_CACHE)
+            except (KeyError, TypeError, ValueError):
+                tiles = 0
+            state['tile_cache'] = TileCache(tiles) if tiles > 0 else None
+            self._reset_tile_stream(state)
+
+        elif name == 'set_cursor':
+            state['cursor_enabled'] = bool(data.get('enabled', True))
+            state['cursor_sent'] = None
+
+        elif name == 'set_rendition':
+            rendition = data.get('rendition')
+            state['rendition'] = rendition if rendition in self.RENDITIONS else None
+
+    def _client_rendition(self, state):
+        if state['rendition']:
+            return state['rendition']
+
+        frame = self.current_frame
+        if not state['viewport'] or frame is None:
+            return 'full'
+
+        view_width, view_height = state['viewport']
+        width, height = frame['image'].size
+        for name, divisor in sorted(self.RENDITIONS.items(),
+                                    key=lambda item: -item[1]):
+            if width // divisor >= view_width and height // divisor >= view_height:
+                return name
+        return 'full'
+
+    def _available_codecs(self):
+        return [codec for codec in self.CODECS
+                if codec != 'h264' or self.h264_available]
+
+    def _reset_tile_stream(self, state):
+        state['tile_base'] = None
+        if state['tile_cache'] is not None:
+            state['tile_cache'].clear()
+        if state['refiner'] is not None:
+            state['refiner'].reset()
+        state['cache_reset'] = True
+
+    def _tile_base(self, state, rendition):
+        if state['codec'] != 'tiles' or not state['tile_base']:
+            return None
+
+        base_rendition, base_frame = state['tile_base']
+        return base_frame if base_rendition == rendition else None
+
+    def _get_frame(self, rendition, last_seq, codec='jpeg', base_frame=None,
+                   state=None):
+        with self.frame_lock:
+            frame = self.current_frame
+            now = time.perf_counter()
+
+            if (frame is None or frame['seq'] <= last_seq
+                    or now - frame['captured_at'] >= self.frame_interval):
+                img = self._grab_screen()
+                if img.mode != 'RGB':
+                    if img.mode == 'P':
+                        img = img.convert('RGBA')
+                    img = img.convert('RGB')
+
+                self.frame_seq += 1
+                frame = {
+                    'seq': self.frame_seq,
+                    'captured_at': now,
+                    'capture_s': time.perf_counter() - now,
+                    'image': img,
+                    'arrays': {},
+                    'encoded': {},
+                    'encode_s': {}
+                }
+                self.current_frame = frame
+                self._record_capture_stats(frame['capture_s'])
+                self._record_session_frame(frame)
+
+            if codec == 'h264':
+                self._prepare_video(rendition, state)
+
+            img_data, encode_s = self._encode_cached(
+                frame, rendition, codec, base_frame)
+            if state is not None:
+                state['encode_s'] = encode_s
+
+            if codec == 'tiles':
+                img_data = self._assemble_tiles(img_data, state)
+            elif codec == 'h264':
+                img_data = self._assemble_video(rendition, state)
+
+            return frame, img_data
+
+    def _encode_cached(self, frame, rendition, codec='jpeg', base_frame=None):
+        key = (rendition, codec, base_frame['seq'] if base_frame else None)
+
+        img_data = frame['encoded'].get(key)
+        if img_data is None:
+            encode_start = time.perf_counter()
+            img_data = self._encode_rendition(
+                frame, rendition, codec, base_frame)
+            frame['encoded'][key] = img_data
+            frame['encode_s'][key] = time.perf_counter() - encode_start
+            self._record_encode_stats(rendition, frame['encode_s'][key])
+
+        return img_data, frame['encode_s'].get(key, 0.0)
+
+    def _video_stream(self, rendition):
+        stream = self.video_streams.get(rendition)
+        if stream is None:
+            stream = H264Stream(max(1, round(1.0 / self.frame_interval)))
+            self.video_streams[rendition] = stream
+        return stream
+
+    def _prepare_video(self, rendition, state):
+        if state['video_cursor'] is not None and state['video_rendition'] == rendition:
+            return
+
+        state['video_cursor'] = self._video_stream(rendition).keyframe_number()
+        state['video_rendition'] = rendition
+
+    def _assemble_video(self, rendition, state):
+        img_data, state['video_cursor'] = self._video_stream(
+            rendition).packets_since(state['video_cursor'])
+        return img_data
+
+    def _assemble_tiles(self, plan, state):
+        cache = state['tile_cache'] if state else None
+        refiner = state['refiner'] if state else None
+        reset_cache = bool(state and state['cache_reset'])
+        img_data, info = self.tile_encoder.assemble(
+            plan, cache, reset_cache, refiner, time.perf_counter())
+        if state:
+            state['cache_reset'] = False
+
+        with self.stats_lock:
+            self.stream_stats['tile_cache_hits'] += info['cache_hits']
+            self.stream_stats['refined_tiles'] += info['refined']
+        return img_data
+
+    def _rendition_image(self, frame, rendition):
+        img = frame['image']
+        divisor = self.RENDITIONS.get(rendition, 1)
+        if divisor > 1:
+            img = img.reduce(divisor)
+        return img
+
+    def _rendition_array(self, frame, rendition):
+        array = frame['arrays'].get(rendition)
+        if array is None:
+            array = np.asarray(self._rendition_image(frame, rendition))
+            frame['arrays'][rendition] = array
+        return array
+
+    def _encode_rendition(self, frame, rendition, codec='jpeg', base_frame=None):
+        if codec == 'tiles':
+            base = None
+            if base_frame is not None:
+                base = self._rendition_array(base_frame, rendition)
+
+            self.tile_encoder.jpeg_quality = (
+                self.motion_quality if self.refine_delay > 0 else self.jpeg_quality)
+            plan = self.tile_encoder.plan(
+                self._rendition_array(frame, rendition), base)
+            self._record_tile_stats(plan)
+            return plan
+
+        if codec == 'h264':
+            stream = self._video_stream(rendition)
+            number = stream.encode(self._rendition_array(frame, rendition))
+            if number is None:
+                return -1
+            with self.stats_lock:
+                self.stream_stats['video_keyframes'] += int(stream.packets[-1][1])
+            return number
+
+        img = self._rendition_image(frame, rendition)
+
+        img_bytes = io.BytesIO()
+        img.save(img_bytes, format='JPEG', quality=self.jpeg_quality)
+        return img_bytes.getvalue()
+
+    def _empty_stream_stats(self):
+        return {
+            'frames': 0,
+            'bytes': 0,
+            'send_s': 0.0,
+            'captures': 0,
+            'capture_s': 0.0,
+            'encodes': 0,
+            'encode_s': 0.0,
+            'rendition_frames': {},
+            'rendition_encodes': {},
+            'codec_frames': {},
+            'tile_codecs': {},
+            'tile_keyframes': 0,
+            'copy_rects': 0,
+            'tile_cache_hits': 0,
+            'refined_tiles': 0,
+            'video_keyframes': 0,
+            'cursor_updates': 0,
+            'channels': {},
+            'latency_frames': 0,
+            'latency_s': {name: 0.0 for name in self.LATENCY_STAGES},
+            'max_glass_s': 0.0
+        }
+
+    def reset_stream_stats(self):
+        with self.stats_lock:
+            self.stream_stats = self._empty_stream_stats()
+
+    def _record_capture_stats(self, capture_s):
+        with self.stats_lock:
+            self.stream_stats['captures'] += 1
+            self.stream_stats['capture_s'] += capture_s
+
+    def _record_encode_stats(self, rendition, encode_s):
+        with self.stats_lock:
+            encodes = self.stream_stats['rendition_encodes']
+            encodes[rendition] = encodes.get(rendition, 0) + 1
+            self.stream_stats['encodes'] += 1
+            self.stream_stats['encode_s'] += encode_s
+
+    def _record_tile_stats(self, info):
+        with self.stats_lock:
+            counts = self.stream_stats['tile_codecs']
+            for code, name in TILE_CODEC_NAMES.items():
+                counts[name] = counts.get(name, 0) + int((info['codecs'] == code).sum())
+            self.stream_stats['tile_keyframes'] += int(info['keyframe'])
+            self.stream_stats['copy_rects'] += len(info['copies'])
+
+    def _record_frame_stats(self, rendition, codec, size):
+        with self.stats_lock:
+            frames = self.stream_stats['rendition_frames']
+            frames[rendition] = frames.get(rendition, 0) + 1
+            codecs = self.stream_stats['codec_frames']
+            codecs[codec] = codecs.get(codec, 0) + 1
+            self.stream_stats['frames'] += 1
+            self.stream_stats['bytes'] += size
+
+    def _record_send_stats(self, data_type, size, send_s):
+        name = self.CHANNELS.get(data_type, 'control')
+        with self.stats_lock:
+            channel = self.stream_stats['channels'].setdefault(
+                name, {'messages': 0, 'bytes': 0, 'send_s': 0.0, 'max_send_s': 0.0})
+            channel['messages'] += 1
+            channel['bytes'] += size
+            channel['send_s'] += send_s
+            channel['max_send_s'] = max(channel['max_send_s'], send_s)
+            if name == 'video':
+                self.stream_stats['send_s'] += send_s
+
+    def _record_latency_stats(self, timing):
+        with self.stats_lock:
+            self.stream_stats['latency_frames'] += 1
+            for name in self.LATENCY_STAGES:
+                self.stream_stats['latency_s'][name] += timing.get(name + '_s', 0.0)
+            self.stream_stats['max_glass_s'] = max(
+                self.stream_stats['max_glass_s'], timing['glass_s'])
+
+    def get_stream_stats(self):
+        with self.stats_lock:
+            stats = dict(self.stream_stats)
+            stats['rendition_frames'] = dict(stats['rendition_frames'])
+            stats['rendition_encodes'] = dict(stats['rendition_encodes'])
+            stats['codec_frames'] = dict(stats['codec_frames'])
+            stats['tile_codecs'] = dict(stats['tile_codecs'])
+            channels = {name: dict(channel)
+                        for name, channel in stats['channels'].items()}
+            stats['latency_s'] = dict(stats['latency_s'])
+
+        latency = {name + '_ms': value * 1000 / (stats['latency_frames'] or 1)
+                   for name, value in stats['latency_s'].items()}
+        latency['network_ms'] = latency['rtt_ms'] / 2
+        latency['max_glass_ms'] = stats['max_glass_s'] * 1000
+        latency['frames'] = stats['latency_frames']
+
+        frames = stats['frames'] or 1
+        return {
+            'frames': stats['frames'],
+            'bytes': stats['bytes'],
+            'captures': stats['captures'],
+            'encodes': stats['encodes'],
+            'rendition_frames': stats['rendition_frames'],
+            'rendition_encodes': stats['rendition_encodes'],
+            'codec_frames': stats['codec_frames'],
+            'tile_codecs': stats['tile_codecs'],
+            'tile_keyframes': stats['tile_keyframes'],
+            'copy_rects': stats['copy_rects'],
+            'tile_cache_hits': stats['tile_cache_hits'],
+            'refined_tiles': stats['refined_tiles'],
+            'video_keyframes': stats['video_keyframes'],
+            'cursor_updates': stats['cursor_updates'],
+            'input': self.input_injector.get_stats() if self.input_injector else {},
+            'channels': {
+                name: {
+                    'messages': channel['messages'],
+                    'bytes': channel['bytes'],
+                    'avg_send_ms': channel['send_s'] * 1000 / channel['messages'],
+                    'max_send_ms': channel['max_send_s'] * 1000
+                }
+                for name, channel in channels.items()
+            },
+            'latency': latency,
+            'avg_frame_bytes': stats['bytes'] / frames,
+            'avg_capture_ms': stats['capture_s'] * 1000 / (stats['captures'] or 1),
+            'avg_encode_ms': stats['encode_s'] * 1000 / (stats['encodes'] or 1),
+            'avg_send_ms': stats['send_s'] * 1000 / frames
+        }
+
+    def _get_audio_data(self, state):
         try:
             if self.audio_enabled and hasattr(self.audio_recorder, 'audio_data'):
-                if self.audio_recorder.audio_data:
-                    import numpy as np
-                    audio_chunk = self.audio_recorder.audio_data[-1] if self.audio_recorder.audio_data else None
-                    if audio_chunk is not None:
-                        if not isinstance(audio_chunk, np.ndarray):
-                            return None
-                        if audio_chunk.dtype != np.int16:
-                            if audio_chunk.dtype == np.float32:
-                                audio_chunk = (
-                                    audio_chunk * 32767).astype(np.int16)
-                            elif audio_chunk.dtype == np.float64:
-                                audio_chunk = (
-                                    audio_chunk * 32767).astype(np.int16)
-                            else:
-                                audio_chunk = audio_chunk.astype(np.int16)
-                        return audio_chunk.tobytes()
+                chunks = self.audio_recorder.audio_data
+                if len(chunks) < state['audio_index']:
+                    state['audio_index'] = 0
+                if len(chunks) > state['audio_index']:
+                    audio_chunk = np.concatenate(chunks[state['audio_index']:])
+                    state['audio_index'] = len(chunks)
+                    if audio_chunk.dtype != np.int16:
+                        if audio_chunk.dtype in (np.float32, np.float64):
+                            audio_chunk = (audio_chunk * 32767).astype(np.int16)
+                        else:
+                            audio_chunk = audio_chunk.astype(np.int16)
+                    return audio_chunk.tobytes()
             return None
         except Exception as e:
             print(f"Ошибка получения аудио данных: {e}")
@@ -229,7 +879,9 @@ class RemoteAccessServer:
             'running': self.running,
             'port': self.port,
             'clients_connected': len(self.clients),
-            'audio_enabled': self.audio_enabled
+            'audio_enabled': self.audio_enabled,
+            'input_enabled': self.input_enabled,
+            'session_recording': self.session_recorder.get_recording_status()
         }
 
         if self.audio_enabled:
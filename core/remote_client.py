@@ -4,17 +4,67 @@ import json
 import cv2
 import numpy as np
 import time
+from collections import deque
 from PyQt6.QtCore import QObject, pyqtSignal, QTimer
 from PyQt6.QtGui import QImage, QPixmap
 from PyQt6.QtWidgets import QLabel
 
+from .stream_recorder import StreamRecorder
+from .cursor import unpack_cursor
+from .frame_timing import FRAME_INFO_TYPE, LatencyTracker, unpack_frame_info
+from .remote_input import (pack_event, INPUT_ACK, INPUT_MESSAGE, BUTTONS, MOUSE_MOVE,
+                           MOUSE_DOWN, MOUSE_UP, MOUSE_WHEEL, KEY_DOWN, KEY_UP)
+from .sources import monotonic_us
+from .stream_mux import ChunkAssembler, CHUNK_TYPE
+from .tile_codec import TileDecoder, FLAG_CACHE_RESET, FLAG_KEYFRAME, frame_flags
+from .transport import (MessageReader, JSON_MESSAGE, send_json, send_message,
+                        tune_socket)
+from .video_stream import H264Decoder, is_keyframe as is_video_keyframe
+
+
+JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7,
+                    0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+REDUCED_DECODE_FLAGS = (
+    (8, cv2.IMREAD_REDUCED_COLOR_8),
+    (4, cv2.IMREAD_REDUCED_COLOR_4),
+    (2, cv2.IMREAD_REDUCED_COLOR_2)
+)
+
+
+def jpeg_size(data):
+    i = 2
+    while i + 9 < len(data):
+        if data[i] != 0xFF:
+            i += 1
+            continue
+
+        marker = data[i + 1]
+        if marker == 0xFF:
+            i += 1
+            continue
+        if marker in (0x01, 0xD8) or 0xD0 <= marker <= 0xD7:
+            i += 2
+            continue
+
+        if marker in JPEG_SOF_MARKERS:
+            height = int.from_bytes(data[i + 5:i + 7], 'big')
+            width = int.from_bytes(data[i + 7:i + 9], 'big')
+            return width, height
+
+        i += 2 + int.from_bytes(data[i + 2:i + 4], 'big')
+
+    return None
+
 
 class RemoteClient(QObject):
     connection_status_changed = pyqtSignal(bool)
     screen_frame_received = pyqtSignal(QPixmap)
+    cursor_changed = pyqtSignal(object)
     audio_data_received = pyqtSignal(bytes)
     error_occurred = pyqtSignal(str)
     server_info_received = pyqtSignal(dict)
+    session_recording_saved = pyqtSignal(dict)
 
     def __init__(self):
         super().__init__()
@@ -26,14 +76,58 @@ class RemoteClient(QObject):
         self.frame_timer = QTimer()
         self.frame_timer.timeout.connect(self._request_frame)
         self.current_frame = None
+        self.session_recorder = StreamRecorder('remote_client_session')
+        self.viewport = None
+        self.decode_pool = None
+        self.reduced_decode = True
+        self.frame_size = None
+        self.codec = 'tiles'
+        self.tile_cache_mb = 64
+        self.tile_decoder = TileDecoder(self._tile_cache_tiles())
+        self.video_decoder = H264Decoder(self._show_video_frame)
+        self.video_keyframe_requested = False
+        self.tile_keyframe_requested = False
+        self.chunks = ChunkAssembler()
+        self.frame_info = None
+        self.video_timings = deque(maxlen=32)
+        self.paint_timings = deque(maxlen=64)
+        self.latency = LatencyTracker()
+        self.cursor_overlay = True
+        self.cursor = None
+        self.cursor_sprites = {}
+
+        self.send_lock = threading.Lock()
+        self.move_interval = 1.0 / 60
+        self.move_timer = QTimer()
+        self.move_timer.setSingleShot(True)
+        self.move_timer.timeout.connect(self._flush_mouse_move)
+        self.pending_move = None
+        self.input_events = 0
+        self.moves_coalesced = 0
+        self.input_acks = 0
+        self.input_latency_ms = deque(maxlen=512)
+        self.input_server_ms = deque(maxlen=512)
 
     def connect_to_server(self, host, port):
         try:
             self.server_host = host
             self.server_port = port
 
-            self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            self.socket = tune_socket(
+                socket.socket(socket.AF_INET, socket.SOCK_STREAM))
             self.socket.connect((host, port))
+            self.tile_decoder.reset(self._tile_cache_tiles())
+            self.video_decoder.reset()
+            self.video_keyframe_requested = False
+            self.tile_keyframe_requested = False
+            self.chunks.reset()
+            self.frame_info = None
+            self.video_timings.clear()
+            self.paint_timings.clear()
+            self.latency.reset()
+            self.cursor = None
+            self.cursor_sprites = {}
+            self.cursor_changed.emit(None)
 
             self.connected = True
             self.thread = threading.Thread(target=self._listen_for_data)
@@ -41,6 +135,12 @@ class RemoteClient(QObject):
             self.thread.start()
 
             self._send_command("get_info")
+            self._send_command("set_codec", {"codec": self._stream_codec()})
+            self._send_command("set_tile_cache", {"tiles": self._tile_cache_tiles()})
+            self._send_command("set_cursor", {"enabled": self.cursor_overlay})
+            if self.viewport:
+                self._send_command("set_viewport", {
+                    "width": self.viewport[0], "height": self.viewport[1]})
 
             self.connection_status_changed.emit(True)
             return True
@@ -52,7 +152,12 @@ class RemoteClient(QObject):
     def disconnect_from_server(self):
         try:
             self.connected = False
+            self.stop_session_recording()
+            if self.decode_pool:
+                self.decode_pool.discard(self)
             self.frame_timer.stop()
+            self.move_timer.stop()
+            self.pending_move = None
 
             if self.socket:
                 try:
@@ -67,6 +172,7 @@ class RemoteClient(QObject):
 
             if self.thread:
                 self.thread.join(timeout=2.0)
+            self.video_decoder.reset()
 
             self.connection_status_changed.emit(False)
             return True
@@ -92,10 +198,67 @@ class RemoteClient(QObject):
                     "data": data or {},
                     "timestamp": time.time()
                 }
-                self.socket.send(json.dumps(message).encode('utf-8'))
+                with self.send_lock:
+                    send_json(self.socket, message)
             except Exception as e:
                 self.error_occurred.emit(f"Ошибка отправки команды: {e}")
 
+    def _send_input(self, kind, x=0, y=0, button=0, code=0):
+        if not self.connected or not self.socket:
+            return
+
+        try:
+            data = pack_event(kind, x, y, button, code, monotonic_us())
+            with self.send_lock:
+                send_message(self.socket, INPUT_MESSAGE, data)
+            self.input_events += 1
+        except Exception as e:
+            self.error_occurred.emit(f"Ошибка отправки ввода: {e}")
+
+    def set_viewport(self, width, height):
+        if width <= 0 or height <= 0 or self.viewport == (width, height):
+            return
+
+        self.viewport = (width, height)
+        self._send_command("set_viewport", {"width": width, "height": height})
+
+    def set_rendition(self, rendition=None):
+        self._send_command("set_rendition", {"rendition": rendition})
+
+    def set_codec(self, codec):
+        self.codec = codec
+        self._send_command("set_codec", {"codec": self._stream_codec()})
+
+    def set_tile_cache(self, megabytes):
+        self.tile_cache_mb = max(0, megabytes)
+        self.tile_decoder.reset(self._tile_cache_tiles())
+        self._send_command("set_tile_cache", {"tiles": self._tile_cache_tiles()})
+
+    def _tile_cache_tiles(self):
+        return int(self.tile_cache_mb * 1024 * 1024) // (64 * 64 * 3)
+
+    def _stream_codec(self):
+        if self.session_recorder.recording:
+            return 'jpeg'
+        if self.codec == 'h264' and not self.video_decoder.is_available():
+            return 'tiles'
+        return self.codec
+
+    def start_session_recording(self, save_path='recordings/remote_client',
+                                sample_rate=44100, channels=2):
+        started = self.session_recorder.start_recording(
+            save_path, sample_rate, channels)
+        if started:
+            self._send_command("set_codec", {"codec": self._stream_codec()})
+        return started
+
+    def stop_session_recording(self):
+        result = self.session_recorder.stop_recording(
+            self.session_recording_saved.emit)
+        if result:
+            self._send_command("set_codec", {"codec": self._stream_codec()})
+        return result
+
     def _request_frame(self):
         if self.connected:
             self._send_command("get_frame")
@@ -103,48 +266,18 @@ class RemoteClient(QObject):
     def _listen_for_data(self):
         print("RemoteClient: Начинаем прослушивание данных от сервера")
 
+        reader = MessageReader(self.socket)
         while self.connected:
             try:
-                data_type = self.socket.recv(1)
-                if not data_type:
+                message = reader.read_message()
+                if message is None:
                     print("RemoteClient: Нет данных от сервера")
                     break
 
-                data_type = int.from_bytes(data_type, byteorder='big')
-
-                size_data = self.socket.recv(4)
-                if not size_data:
-                    print("RemoteClient: Нет размера данных")
-                    break
-
-                data_size = int.from_bytes(size_data, byteorder='big')
+                data_type, received_data = message
                 print(
-                    f"RemoteClient: Получен размер данных: {data_size} байт, тип: {data_type}")
-
-                received_data = b''
-                while len(received_data) < data_size:
-                    chunk = self.socket.recv(
-                        min(data_size - len(received_data), 4096))
-                    if not chunk:
-                        break
-                    received_data += chunk
-
-                if len(received_data) == data_size:
-                    print(
-                        f"RemoteClient: Получены данные: {len(received_data)} байт")
-
-                    if data_type == 255:
-                        print("RemoteClient: Обрабатываем приветственное сообщение")
-                        self._process_received_data(received_data)
-                    elif data_type == 0:
-                        print("RemoteClient: Обрабатываем кадр экрана")
-                        self._decode_frame(received_data)
-                    elif data_type == 1:
-                        print("RemoteClient: Обрабатываем аудио данные")
-                        self.audio_data_received.emit(received_data)
-                else:
-                    print(
-                        f"RemoteClient: Неполные данные: {len(received_data)}/{data_size}")
+                    f"RemoteClient: Получены данные: {len(received_data)} байт, тип: {data_type}")
+                self._handle_message(data_type, received_data)
 
             except Exception as e:
                 if self.connected:
@@ -152,6 +285,37 @@ class RemoteClient(QObject):
                     self.error_occurred.emit(f"Ошибка получения данных: {e}")
                 break
 
+    def _handle_message(self, data_type, received_data):
+        if data_type == CHUNK_TYPE:
+            message = self.chunks.feed(received_data)
+            if message:
+                self._handle_message(*message)
+        elif data_type == JSON_MESSAGE:
+            print("RemoteClient: Обрабатываем приветственное сообщение")
+            self._process_received_data(received_data)
+        elif data_type == FRAME_INFO_TYPE:
+            self.frame_info = unpack_frame_info(received_data)
+            self.frame_info['received_at'] = time.perf_counter()
+        elif data_type in (0, 2, 3):
+            print("RemoteClient: Обрабатываем кадр экрана")
+            timing = self._frame_received()
+            if data_type == 0:
+                self.session_recorder.write_frame(received_data)
+            if self.decode_pool:
+                self.decode_pool.submit(
+                    self, received_data, data_type,
+                    self._supersedes_pending(received_data, data_type), timing)
+            else:
+                self._decode_frame(received_data, data_type, timing)
+        elif data_type == 4:
+            self._update_cursor(received_data)
+        elif data_type == 5:
+            self._handle_input_ack(received_data)
+        elif data_type == 1:
+            print("RemoteClient: Обрабатываем аудио данные")
+            self.session_recorder.write_audio(received_data)
+            self.audio_data_received.emit(received_data)
+
     def _process_received_data(self, data):
         try:
             try:
@@ -167,25 +331,86 @@ class RemoteClient(QObject):
         except Exception as e:
             self.error_occurred.emit(f"Ошибка обработки данных: {e}")
 
-    def _decode_frame(self, frame_data):
+    def _supersedes_pending(self, frame_data, frame_type):
+        if frame_type == 2:
+            flags = frame_flags(frame_data)
+            if not self.tile_decoder.cache.capacity:
+                return bool(flags & FLAG_KEYFRAME)
+            return bool(flags & FLAG_KEYFRAME and flags & FLAG_CACHE_RESET)
+        if frame_type == 3:
+            return is_video_keyframe(frame_data)
+        return True
+
+    def _frame_received(self):
+        timing, self.frame_info = self.frame_info, None
+        if timing is None:
+            return None
+
+        timing['complete_at'] = time.perf_counter()
+        timing['receive_s'] = timing['complete_at'] - timing['received_at']
+        return timing
+
+    def _decode_video(self, frame_data, timing=None):
+        if is_video_keyframe(frame_data):
+            self.video_keyframe_requested = False
+
+        if timing is not None:
+            timing['decode_at'] = time.perf_counter()
+            self.video_timings.append(timing)
+
+        if self.video_decoder.decode(frame_data):
+            self.frame_size = self.video_decoder.size
+        else:
+            self._request_keyframe(3)
+
+    def _decode_tiles(self, frame_data):
+        if frame_flags(frame_data) & (FLAG_KEYFRAME | FLAG_CACHE_RESET):
+            self.tile_keyframe_requested = False
+
+        frame_rgb = self.tile_decoder.decode(frame_data)
+        if frame_rgb is None:
+            self._request_keyframe(2)
+        return frame_rgb
+
+    def _request_keyframe(self, frame_type):
+        if frame_type == 3:
+            if self.video_keyframe_requested:
+                return
+            self.video_keyframe_requested = True
+        elif frame_type == 2:
+            if self.tile_keyframe_requested:
+                return
+            self.tile_keyframe_requested = True
+        self._send_command("request_keyframe")
+
+    def _decode_frame(self, frame_data, frame_type=0, timing=None):
         try:
             print(
                 f"RemoteClient: Декодируем кадр размером {len(frame_data)} байт")
-            nparr = np.frombuffer(frame_data, np.uint8)
-            frame = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-
-            if frame is not None:
-                print(f"RemoteClient: Кадр декодирован: {frame.shape}")
-                frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                h, w, ch = frame_rgb.shape
-                bytes_per_line = ch * w
+            if frame_type == 3:
+                self._decode_video(frame_data, timing)
+                return
 
-                qt_image = QImage(frame_rgb.data, w, h,
-                                  bytes_per_line, QImage.Format.Format_RGB888)
-                pixmap = QPixmap.fromImage(qt_image)
+            decode_start = time.perf_counter()
 
-                print("RemoteClient: Отправляем кадр в UI")
-                self.screen_frame_received.emit(pixmap)
+            if frame_type == 2:
+                frame_rgb = self._decode_tiles(frame_data)
+                if frame_rgb is None:
+                    return
+                self.frame_size = (frame_rgb.shape[1], frame_rgb.shape[0])
+            else:
+                self.frame_size = jpeg_size(frame_data) or self.frame_size
+                nparr = np.frombuffer(frame_data, np.uint8)
+                frame = cv2.imdecode(nparr, self._decode_flag(self.frame_size))
+                frame_rgb = None
+                if frame is not None:
+                    frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+
+            if frame_rgb is not None:
+                print(f"RemoteClient: Кадр декодирован: {frame_rgb.shape}")
+                if timing is not None:
+                    timing['decode_s'] = time.perf_counter() - decode_start
+                self._show_frame(frame_rgb, timing)
             else:
                 print("RemoteClient: Не удалось декодировать кадр")
 
@@ -193,23 +418,157 @@ class RemoteClient(QObject):
             print(f"RemoteClient: Ошибка декодирования кадра: {e}")
             self.error_occurred.emit(f"Ошибка декодирования кадра: {e}")
 
+    def _show_video_frame(self, frame_rgb):
+        timing = None
+        if self.video_timings:
+            timing = self.video_timings.popleft()
+            timing['decode_s'] = time.perf_counter() - timing['decode_at']
+        self._show_frame(frame_rgb, timing)
+
+    def _show_frame(self, frame_rgb, timing=None):
+        h, w, ch = frame_rgb.shape
+        bytes_per_line = ch * w
+
+        qt_image = QImage(frame_rgb.data, w, h,
+                          bytes_per_line, QImage.Format.Format_RGB888)
+        print("RemoteClient: Отправляем кадр в UI")
+        pixmap = QPixmap.fromImage(qt_image)
+        self._queue_paint(timing)
+        self.screen_frame_received.emit(pixmap)
+
+    def _update_cursor(self, data):
+        if not self.cursor_overlay:
+            return
+
+        try:
+            cursor = unpack_cursor(data)
+        except Exception as e:
+            print(f"RemoteClient: Ошибка разбора курсора: {e}")
+            return
+
+        if cursor['sprite']:
+            sprite = QImage.fromData(cursor['sprite'], 'PNG')
+            self.cursor_sprites[cursor['shape']] = (sprite, *cursor['hotspot'])
+        self.cursor = cursor
+
+        sprite = self.cursor_sprites.get(cursor['shape'])
+        if not cursor['visible'] or sprite is None or not self.frame_size:
+            self.cursor_changed.emit(None)
+            return
+
+        sprite_image, hot_x, hot_y = sprite
+        self.cursor_changed.emit({
+            'x': cursor['x'],
+            'y': cursor['y'],
+            'sprite': sprite_image,
+            'hotspot': (hot_x, hot_y),
+            'frame_size': self.frame_size
+        })
+
+    def _queue_paint(self, timing):
+        if timing is not None:
+            timing['emitted_at'] = time.perf_counter()
+        self.paint_timings.append(timing)
+
+    def frame_painted(self):
+        try:
+            timing = self.paint_timings.popleft()
+        except IndexError:
+            return
+        if timing is None:
+            return
+
+        now = time.perf_counter()
+        timing['paint_s'] = now - timing['emitted_at']
+        self._send_command("frame_ack", {
+            "seq": timing['seq'],
+            "captured_us": timing['captured_us'],
+            "receive_us": int(timing['receive_s'] * 1000000),
+            "decode_us": int(timing.get('decode_s', 0.0) * 1000000),
+            "paint_us": int(timing['paint_s'] * 1000000),
+            "hold_us": int((now - timing['complete_at']) * 1000000)
+        })
+        self.latency.add(timing)
+
+    def get_latency_stats(self):
+        return self.latency.get_stats()
+
+    def _decode_flag(self, frame_size):
+        if not self.reduced_decode or not self.viewport or not frame_size:
+            return cv2.IMREAD_COLOR
+
+        view_width, view_height = self.viewport
+        width, height = frame_size
+        for factor, flag in REDUCED_DECODE_FLAGS:
+            if width // factor >= view_width and height // factor >= view_height:
+                return flag
+        return cv2.IMREAD_COLOR
+
     def send_mouse_click(self, x, y, button="left"):
-        if self.connected:
-            self._send_command("mouse_click", {
-                "x": x, "y": y, "button": button
-            })
+        self.send_mouse_button(x, y, button, True)
+        self.send_mouse_button(x, y, button, False)
+
+    def send_mouse_button(self, x, y, button="left", pressed=True):
+        self.pending_move = None
+        self._send_input(MOUSE_DOWN if pressed else MOUSE_UP, x, y,
+                         BUTTONS.get(button, 1))
 
     def send_mouse_move(self, x, y):
-        if self.connected:
-            self._send_command("mouse_move", {
-                "x": x, "y": y
-            })
+        if not self.connected:
+            return
+
+        if self.move_timer.isActive():
+            if self.pending_move is not None:
+                self.moves_coalesced += 1
+            self.pending_move = (x, y)
+            return
+
+        self._send_input(MOUSE_MOVE, x, y)
+        self.move_timer.start(max(1, int(self.move_interval * 1000)))
+
+    def _flush_mouse_move(self):
+        if self.pending_move is None:
+            return
+
+        x, y = self.pending_move
+        self.pending_move = None
+        self._send_input(MOUSE_MOVE, x, y)
+        self.move_timer.start(max(1, int(self.move_interval * 1000)))
+
+    def send_mouse_wheel(self, x, y, delta):
+        self._send_input(MOUSE_WHEEL, x, y, code=delta)
+
+    def send_key(self, code, pressed=True):
+        self._send_input(KEY_DOWN if pressed else KEY_UP, code=code)
 
     def send_key_press(self, key):
-        if self.connected:
-            self._send_command("key_press", {
-                "key": key
-            })
+        code = ord(key.upper()) if isinstance(key, str) and len(key) == 1 else int(key)
+        self.send_key(code, True)
+        self.send_key(code, False)
+
+    def _handle_input_ack(self, data):
+        try:
+            time_us, queue_us, inject_us = INPUT_ACK.unpack_from(data)
+        except Exception as e:
+            print(f"RemoteClient: Ошибка разбора подтверждения ввода: {e}")
+            return
+
+        latency_us = (monotonic_us() - time_us) & 0xFFFFFFFF
+        self.input_acks += 1
+        self.input_latency_ms.append(latency_us / 1000)
+        self.input_server_ms.append((queue_us + inject_us) / 1000)
+
+    def get_input_stats(self):
+        latency = sorted(self.input_latency_ms)
+        server = list(self.input_server_ms)
+        return {
+            'events': self.input_events,
+            'moves_coalesced': self.moves_coalesced,
+            'acks': self.input_acks,
+            'latency_p50_ms': latency[len(latency) // 2] if latency else 0.0,
+            'latency_p99_ms': latency[int(len(latency) * 0.99)] if latency else 0.0,
+            'server_ms': sum(server) / len(server) if server else 0.0
+        }
 
     def get_connection_status(self):
         return {
@@ -0,0 +1,269 @@
+import struct
+import sys
+import threading
+import time
+from collections import deque
+
+
+INPUT_MESSAGE = 8
+INPUT_EVENT = struct.Struct('>BBhhIL')
+INPUT_ACK = struct.Struct('>LLL')
+
+MOUSE_MOVE = 1
+MOUSE_DOWN = 2
+MOUSE_UP = 3
+MOUSE_WHEEL = 4
+KEY_DOWN = 5
+KEY_UP = 6
+
+BUTTONS = {'left': 1, 'right': 2, 'middle': 3}
+
+WINDOWS_BUTTON_FLAGS = {
+    1: (0x0002, 0x0004),
+    2: (0x0008, 0x0010),
+    3: (0x0020, 0x0040)
+}
+WINDOWS_WHEEL_FLAG = 0x0800
+WINDOWS_KEYUP_FLAG = 0x0002
+
+QT_VIRTUAL_KEYS = {
+    0x01000000: 0x1B,
+    0x01000001: 0x09,
+    0x01000003: 0x08,
+    0x01000004: 0x0D,
+    0x01000005: 0x0D,
+    0x01000006: 0x2D,
+    0x01000007: 0x2E,
+    0x01000010: 0x24,
+    0x01000011: 0x23,
+    0x01000012: 0x25,
+    0x01000013: 0x26,
+    0x01000014: 0x27,
+    0x01000015: 0x28,
+    0x01000016: 0x21,
+    0x01000017: 0x22,
+    0x01000020: 0x10,
+    0x01000021: 0x11,
+    0x01000023: 0x12,
+    0x20: 0x20
+}
+
+
+def pack_event(kind, x=0, y=0, button=0, code=0, time_us=0):
+    x = max(-32768, min(32767, int(x)))
+    y = max(-32768, min(32767, int(y)))
+    return INPUT_EVENT.pack(kind, button, x, y,
+                            code & 0xFFFFFFFF, time_us & 0xFFFFFFFF)
+
+
+def unpack_event(data):
+    kind, button, x, y, code, time_us = INPUT_EVENT.unpack_from(data)
+    return {
+        'kind': kind,
+        'button': button,
+        'x': x,
+        'y': y,
+        'code': code,
+        'time_us': time_us
+    }
+
+
+def command_event(command):
+    name = command.get('command')
+    data = command.get('data') or {}
+    try:
+        if name == 'mouse_move':
+            return [{'kind': MOUSE_MOVE, 'button': 0, 'x': int(data['x']),
+                     'y': int(data['y']), 'code': 0, 'time_us': 0}]
+
+        if name == 'mouse_click':
+            button = BUTTONS.get(data.get('button'), 1)
+            return [{'kind': kind, 'button': button, 'x': int(data['x']),
+                     'y': int(data['y']), 'code': 0, 'time_us': 0}
+                    for kind in (MOUSE_MOVE, MOUSE_DOWN, MOUSE_UP)]
+
+        if name == 'key_press':
+            key = data['key']
+            code = ord(key.upper()) if isinstance(key, str) and len(key) == 1 else int(key)
+            return [{'kind': kind, 'button': 0, 'x': 0, 'y': 0,
+                     'code': code, 'time_us': 0}
+                    for kind in (KEY_DOWN, KEY_UP)]
+    except (KeyError, TypeError, ValueError):
+        return []
+    return None
+
+
+def qt_cursor_mover():
+    from PyQt6.QtCore import QObject, pyqtSignal, pyqtSlot
+    from PyQt6.QtGui import QCursor, QGuiApplication
+
+    class CursorMover(QObject):
+        move_requested = pyqtSignal(int, int)
+
+        @pyqtSlot(int, int)
+        def move(self, x, y):
+            QCursor.setPos(x, y)
+
+    app = QGuiApplication.instance()
+    if app is None:
+        return None
+
+    mover = CursorMover()
+    mover.moveToThread(app.thread())
+    mover.move_requested.connect(mover.move)
+    return mover
+
+
+class SystemInputBackend:
+    def __init__(self):
+        self.windows = sys.platform == 'win32'
+        self.warned = False
+        self.cursor_mover = None
+
+    def _user32(self):
+        import ctypes
+
+        return ctypes.windll.user32
+
+    def _unsupported(self):
+        if not self.warned:
+            print('Внедрение нажатий не поддерживается на этой платформе')
+            self.warned = True
+
+    def move(self, x, y):
+        if self.windows:
+            self._user32().SetCursorPos(x, y)
+            return
+
+        try:
+            if self.cursor_mover is None:
+                self.cursor_mover = qt_cursor_mover()
+            if self.cursor_mover is not None:
+                self.cursor_mover.move_requested.emit(x, y)
+                return
+        except:
+            pass
+        self._unsupported()
+
+    def button(self, button, pressed):
+        flags = WINDOWS_BUTTON_FLAGS.get(button)
+        if not self.windows or flags is None:
+            self._unsupported()
+            return
+        self._user32().mouse_event(flags[0] if pressed else flags[1], 0, 0, 0, 0)
+
+    def wheel(self, delta):
+        if not self.windows:
+            self._unsupported()
+            return
+        self._user32().mouse_event(WINDOWS_WHEEL_FLAG, 0, 0, delta, 0)
+
+    def key(self, code, pressed):
+        if not self.windows:
+            self._unsupported()
+            return
+        vk = QT_VIRTUAL_KEYS.get(code, code if code < 0x100 else 0)
+        if vk:
+            self._user32().keybd_event(
+                vk, 0, 0 if pressed else WINDOWS_KEYUP_FLAG, 0)
+
+
+class InputInjector:
+    def __init__(self, backend=None):
+        self.backend = backend or SystemInputBackend()
+        self.condition = threading.Condition()
+        self.queue = deque()
+        self.running = False
+        self.thread = None
+
+        self.injected = 0
+        self.coalesced = 0
+        self.queue_s = 0.0
+        self.inject_s = 0.0
+
+    def start(self):
+        with self.condition:
+            if self.running:
+                return
+            self.running = True
+
+        self.thread = threading.Thread(target=self._worker)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def stop(self):
+        with self.condition:
+            self.running = False
+            self.queue.clear()
+            self.condition.notify_all()
+
+        if self.thread:
+            self.thread.join(timeout=1.0)
+            self.thread = None
+
+    def submit(self, event, callback=None):
+        with self.condition:
+            if not self.running:
+                return
+
+            item = (event, callback, time.perf_counter())
+            if (event['kind'] == MOUSE_MOVE and self.queue
+                    and self.queue[-1][0]['kind'] == MOUSE_MOVE):
+                self.queue[-1] = item
+                self.coalesced += 1
+            else:
+                self.queue.append(item)
+            self.condition.notify()
+
+    def _inject(self, event):
+        kind = event['kind']
+        if kind == MOUSE_MOVE:
+            self.backend.move(event['x'], event['y'])
+        elif kind in (MOUSE_DOWN, MOUSE_UP):
+            self.backend.move(event['x'], event['y'])
+            self.backend.button(event['button'], kind == MOUSE_DOWN)
+        elif kind == MOUSE_WHEEL:
+            self.backend.wheel(event['code'] - (1 << 32) if event['code'] >= 1 << 31
+                               else event['code'])
+        elif kind in (KEY_DOWN, KEY_UP):
+            self.backend.key(event['code'], kind == KEY_DOWN)
+
+    def _worker(self):
+        while True:
+            with self.condition:
+                while self.running and not self.queue:
+                    self.condition.wait()
+                if not self.running:
+                    return
+                event, callback, queued_at = self.queue.popleft()
+
+            inject_start = time.perf_counter()
+            try:
+                self._inject(event)
+            except Exception as e:
+                print(f'Ошибка внедрения ввода: {e}')
+            inject_end = time.perf_counter()
+
+            queue_s = inject_start - queued_at
+            inject_s = inject_end - inject_start
+            with self.condition:
+                self.injected += 1
+                self.queue_s += queue_s
+                self.inject_s += inject_s
+
+            if callback:
+                try:
+                    callback(event, queue_s, inject_s)
+                except Exception as e:
+                    print(f'Ошибка подтверждения ввода: {e}')
+
+    def get_stats(self):
+        with self.condition:
+            injected = self.injected or 1
+            return {
+                'injected': self.injected,
+                'coalesced': self.coalesced,
+                'pending': len(self.queue),
+                'avg_queue_ms': self.queue_s * 1000 / injected,
+                'avg_inject_ms': self.inject_s * 1000 / injected
+            }
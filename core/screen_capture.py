@@ -6,8 +6,9 @@ import time
 import os
 
 from datetime import datetime
-from PIL import ImageGrab, PngImagePlugin
+from PIL import PngImagePlugin
 from .audio_capture import AudioCapture
+from .sources import RatePacer, ScreenSource
 from .video_processor import VideoProcessor
 
 
@@ -20,6 +21,7 @@ class ScreenRecorder:
 
         self.quality = 'high'
         self.fps = 30
+        self.screen_source = ScreenSource()
 
         self.audio_recorder = AudioCapture()
         self.audio_enabled = False
@@ -66,7 +68,7 @@ class ScreenRecorder:
 
     def _record_screen(self, save_path):
         try:
-            screen_size = ImageGrab.grab().size
+            screen_size = self.screen_source.grab().size
 
             if self.quality == 'low':
                 codec = 'XVID'
@@ -88,11 +90,14 @@ class ScreenRecorder:
             out = cv2.VideoWriter(filename, fourcc, self.fps, screen_size)
 
             frame_count = 0
+            pacer = RatePacer(self.fps)
 
             while self.recording:
                 try:
+                    pacer.wait()
+
                     try:
-                        img = ImageGrab.grab()
+                        img = self.screen_source.grab()
                     except Exception as grab_error:
                         print(f'Ошибка захвата экрана: {grab_error}')
                         time.sleep(1 / self.fps)
@@ -104,8 +109,6 @@ class ScreenRecorder:
                     out.write(frame)
                     frame_count += 1
 
-                    time.sleep(1 / self.fps)
-
                 except Exception as e:
                     print(f'Ошибка при записи кадра: {e}')
                     time.sleep(1 / self.fps)
@@ -133,7 +136,7 @@ class ScreenRecorder:
             if not os.path.exists(save_path):
                 os.makedirs(save_path)
 
-            img = ImageGrab.grab()
+            img = self.screen_source.grab()
 
             if quality == 'low':
                 img = img.resize((img.size[0] // 2, img.size[1] // 2))
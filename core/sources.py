@@ -0,0 +1,314 @@
+import math
+import threading
+import time
+
+import numpy as np
+
+from .cursor import system_cursor
+
+
+STAMP_BITS = 32
+STAMP_BLOCK = 16
+
+
+def monotonic_us():
+    return time.monotonic_ns() // 1000
+
+
+def write_stamp(frame, value):
+    for bit in range(STAMP_BITS):
+        x = bit * STAMP_BLOCK
+        frame[:STAMP_BLOCK, x:x + STAMP_BLOCK] = 255 if (value >> bit) & 1 else 0
+    return frame
+
+
+def read_stamp(frame, scale=1):
+    value = 0
+    block = STAMP_BLOCK / scale
+    center = int(block / 2)
+    for bit in range(STAMP_BITS):
+        pixel = frame[center, int(bit * block + block / 2)]
+        if int(pixel[1]) > 127:
+            value |= 1 << bit
+    return value
+
+
+class RatePacer:
+    def __init__(self, rate):
+        self.period = 1.0 / rate if rate else 0.0
+        self.next_tick = None
+
+    def wait(self):
+        if not self.period:
+            return
+
+        now = time.perf_counter()
+        if self.next_tick is None:
+            self.next_tick = now
+        elif self.next_tick > now:
+            time.sleep(self.next_tick - now)
+        elif now - self.next_tick > self.period * 4:
+            self.next_tick = now
+
+        self.next_tick += self.period
+
+
+class ScreenSource:
+    def grab(self):
+        from PIL import ImageGrab
+
+        return ImageGrab.grab()
+
+    def cursor(self):
+        return system_cursor()
+
+    def close(self):
+        pass
+
+
+class SyntheticScreenSource(ScreenSource):
+    def __init__(self, width=1280, height=720, change_rate=0.1, fps=None,
+                 stamp=False, seed=0, scroll_rate=0):
+        self.width = width
+        self.height = height
+        self.change_rate = max(0.0, min(1.0, change_rate))
+        self.scroll_rate = scroll_rate
+        self.stamp = stamp
+        self.pacer = RatePacer(fps)
+        self.random = np.random.default_rng(seed)
+        self.frame_index = 0
+
+        self.windows = []
+        self.frame = self._render_desktop()
+        self.pointer = None
+        self.pointer_moved_at = 0.0
+        self.input_events = 0
+
+        self.document = None
+        if self.scroll_rate:
+            x, y, w, h = self.windows[-1]
+            self.document = np.empty((h * 4, w, 3), np.uint8)
+            self.document[:] = 245
+            self._render_text(self.document, 0, 0, w, h * 4)
+
+        area = self.change_rate * width * height
+        region_height = max(1, min(height, int(area / width) or 1))
+        region_width = max(1, min(width, int(area / region_height))) if area else 0
+        self.region = (width - region_width, height - region_height,
+                       region_width, region_height)
+
+    def _render_desktop(self):
+        frame = np.empty((self.height, self.width, 3), np.uint8)
+        frame[:] = (32, 96, 160)
+
+        window_count = 3
+        for index in range(window_count):
+            x = int(self.width * (0.05 + 0.2 * index))
+            y = int(self.height * (0.08 + 0.15 * index))
+            w = int(self.width * 0.45)
+            h = int(self.height * 0.5)
+            frame[y:y + h, x:x + w] = 245
+            frame[y:y + 24, x:x + w] = (60, 60, 70)
+            self._render_text(frame, x, y + 24, w, h - 24)
+            self.windows.append((x, y + 24, w, h - 24))
+
+        return frame
+
+    def _render_text(self, frame, x, y, w, h):
+        for line_y in range(y + 12, y + h - 12, 18):
+            words = self.random.integers(3, 12)
+            cursor_x = x + 12
+            for _ in range(words):
+                word_width = int(self.random.integers(12, 60))
+                if cursor_x + word_width > x + w - 12:
+                    break
+                frame[line_y:line_y + 9, cursor_x:cursor_x + word_width] = 20
+                cursor_x += word_width + 8
+
+    def _update_scroll(self):
+        x, y, w, h = self.windows[-1]
+        limit = len(self.document) - h
+        offset = (self.frame_index * self.scroll_rate) % (2 * limit)
+        if offset > limit:
+            offset = 2 * limit - offset
+        self.frame[y:y + h, x:x + w] = self.document[offset:offset + h]
+
+    def _update_region(self):
+        x, y, w, h = self.region
+        if not w or not h:
+            return
+
+        phase = self.frame_index * 7
+        columns = (np.arange(w, dtype=np.uint16) + phase) % 256
+        rows = (np.arange(h, dtype=np.uint16)[:, None] * 2 + phase) % 256
+        self.frame[y:y + h, x:x + w, 0] = columns[None, :].astype(np.uint8)
+        self.frame[y:y + h, x:x + w, 1] = rows.astype(np.uint8)
+        self.frame[y:y + h, x:x + w, 2] = ((columns[None, :] + rows) // 2).astype(np.uint8)
+
+    def grab_array(self):
+        self.pacer.wait()
+        if self.document is not None:
+            self._update_scroll()
+        self._update_region()
+        self.frame_index += 1
+
+        frame = self.frame.copy()
+        if self.stamp:
+            write_stamp(frame, monotonic_us() & 0xFFFFFFFF)
+        return frame
+
+    def grab(self):
+        from PIL import Image
+
+        return Image.fromarray(self.grab_array())
+
+    def move(self, x, y):
+        self.pointer = (x, y)
+        self.pointer_moved_at = time.perf_counter()
+        self.input_events += 1
+
+    def button(self, button, pressed):
+        self.input_events += 1
+
+    def wheel(self, delta):
+        self.input_events += 1
+
+    def key(self, code, pressed):
+        self.input_events += 1
+
+    def cursor(self):
+        if self.pointer and time.perf_counter() - self.pointer_moved_at < 1.0:
+            x, y = self.pointer
+            return x, y, 'arrow'
+
+        angle = time.perf_counter() * math.pi / 2
+        x = int(self.width / 2 + self.width / 3 * math.cos(angle))
+        y = int(self.height / 2 + self.height / 3 * math.sin(angle))
+
+        shape = 'arrow'
+        for wx, wy, w, h in self.windows:
+            if wx <= x < wx + w and wy <= y < wy + h:
+                shape = 'ibeam'
+        return x, y, shape
+
+
+class SyntheticCamera:
+    def __init__(self, index=0, width=640, height=480, fps=30.0):
+        import cv2
+
+        self.index = index
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.pacer = RatePacer(fps)
+        self.opened = True
+        self.frame_index = 0
+        self.properties = {
+            cv2.CAP_PROP_FRAME_WIDTH: width,
+            cv2.CAP_PROP_FRAME_HEIGHT: height,
+            cv2.CAP_PROP_FPS: fps
+        }
+
+        bars = np.array([(255, 255, 255), (0, 255, 255), (255, 255, 0),
+                         (0, 255, 0), (255, 0, 255), (0, 0, 255),
+                         (255, 0, 0), (0, 0, 0)], np.uint8)
+        columns = np.arange(width) * len(bars) // width
+        self.pattern = np.repeat(bars[columns][None, :, :], height, axis=0)
+
+    def isOpened(self):
+        return self.opened
+
+    def get(self, prop):
+        return float(self.properties.get(prop, 0))
+
+    def set(self, prop, value):
+        self.properties[prop] = value
+        return True
+
+    def read(self):
+        if not self.opened:
+            return False, None
+
+        self.pacer.wait()
+        frame = self.pattern.copy()
+        bar_y = (self.frame_index * 4) % self.height
+        frame[bar_y:bar_y + 8] = 128
+        write_stamp(frame, self.frame_index & 0xFFFFFFFF)
+        self.frame_index += 1
+        return True, frame
+
+    def release(self):
+        self.opened = False
+
+
+def synthetic_camera_factory(width=640, height=480, fps=30.0):
+    def factory(index):
+        return SyntheticCamera(index, width, height, fps)
+    return factory
+
+
+class SyntheticAudioStream:
+    def __init__(self, callback, samplerate=44100, channels=2,
+                 blocksize=1024, kind='tone', frequency=440.0,
+                 amplitude=0.3, seed=0, **kwargs):
+        self.callback = callback
+        self.samplerate = samplerate
+        self.channels = channels
+        self.blocksize = blocksize
+        self.kind = kind
+        self.frequency = frequency
+        self.amplitude = amplitude
+        self.random = np.random.default_rng(seed)
+        self.sample_index = 0
+        self.running = False
+        self.thread = None
+
+    def _next_block(self):
+        if self.kind == 'noise':
+            block = self.random.uniform(
+                -self.amplitude, self.amplitude,
+                (self.blocksize, self.channels))
+        else:
+            t = (self.sample_index + np.arange(self.blocksize)) / self.samplerate
+            wave = self.amplitude * np.sin(2 * np.pi * self.frequency * t)
+            block = np.repeat(wave[:, None], self.channels, axis=1)
+
+        self.sample_index += self.blocksize
+        return block.astype(np.float32)
+
+    def _run(self):
+        pacer = RatePacer(self.samplerate / self.blocksize)
+        while self.running:
+            pacer.wait()
+            self.callback(self._next_block(), self.blocksize, None, None)
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self._run)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        if self.thread:
+            self.thread.join(timeout=1.0)
+
+    def close(self):
+        self.stop()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+        return False
+
+
+def synthetic_audio_factory(kind='tone', frequency=440.0, blocksize=1024,
+                            amplitude=0.3, seed=0):
+    def factory(device=None, channels=2, samplerate=44100, callback=None,
+                **kwargs):
+        return SyntheticAudioStream(callback, samplerate, channels, blocksize,
+                                    kind, frequency, amplitude, seed)
+    return factory
@@ -0,0 +1,184 @@
+import socket
+import struct
+import threading
+import time
+from collections import deque
+
+from .transport import MESSAGE_HEADER, message_parts, send_parts
+
+
+CHUNK_HEADER = struct.Struct('>BB')
+CHUNK_TYPE = 6
+FLAG_LAST_CHUNK = 1
+MIN_CHUNK_SIZE = 1024
+
+PRIORITY_CONTROL = 0
+PRIORITY_REALTIME = 1
+PRIORITY_VIDEO = 2
+PRIORITY_NAMES = ('control', 'realtime', 'video')
+
+
+class ChunkAssembler:
+    def __init__(self):
+        self.parts = {}
+
+    def feed(self, payload):
+        data_type, flags = CHUNK_HEADER.unpack_from(payload)
+        parts = self.parts.setdefault(data_type, [])
+        parts.append(payload[CHUNK_HEADER.size:])
+        if not flags & FLAG_LAST_CHUNK:
+            return None
+
+        del self.parts[data_type]
+        return data_type, b''.join(parts)
+
+    def reset(self):
+        self.parts.clear()
+
+
+class StreamMultiplexer:
+    def __init__(self, sock, chunk_size=16384, on_sent=None, on_error=None):
+        self.sock = sock
+        self.chunk_size = chunk_size
+        self.min_chunk = min(MIN_CHUNK_SIZE, chunk_size)
+        self.on_sent = on_sent
+        self.on_error = on_error
+
+        self.condition = threading.Condition()
+        self.queues = [deque() for _ in PRIORITY_NAMES]
+        self.offsets = [0 for _ in PRIORITY_NAMES]
+        self.closed = False
+        self.thread = None
+
+        self.chunks = 0
+        self.writes = 0
+
+        lowat = getattr(socket, 'TCP_NOTSENT_LOWAT', None)
+        if lowat is not None:
+            try:
+                sock.setsockopt(socket.IPPROTO_TCP, lowat, chunk_size * 2)
+            except OSError:
+                pass
+
+    def start(self):
+        self.thread = threading.Thread(target=self._writer)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def close(self):
+        with self.condition:
+            self.closed = True
+            for queue in self.queues:
+                queue.clear()
+            self.condition.notify_all()
+
+        if self.thread and self.thread is not threading.current_thread():
+            self.thread.join(timeout=1.0)
+
+    def send(self, data_type, payload, priority=PRIORITY_CONTROL, on_sent=None):
+        with self.condition:
+            if self.closed:
+                return False
+            self.queues[priority].append(
+                (data_type, payload, time.perf_counter(), on_sent))
+            self.condition.notify_all()
+        return True
+
+    def pending(self, priority):
+        with self.condition:
+            return len(self.queues[priority])
+
+    def wait_idle(self, priority, timeout=None):
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        with self.condition:
+            while self.queues[priority] and not self.closed:
+                remaining = None if deadline is None else deadline - time.perf_counter()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self.condition.wait(remaining)
+        return not self.closed
+
+    def _take(self, priority, budget):
+        data_type, payload, queued_at, on_sent = self.queues[priority][0]
+        offset = self.offsets[priority]
+        sent = (data_type, len(payload), queued_at, on_sent)
+
+        if offset == 0 and len(payload) <= self.chunk_size:
+            self.queues[priority].popleft()
+            return message_parts(data_type, payload), sent
+
+        if budget < min(self.min_chunk, len(payload) - offset):
+            return None, None
+
+        end = min(len(payload), offset + budget)
+        last = end == len(payload)
+        parts = [MESSAGE_HEADER.pack(CHUNK_TYPE, CHUNK_HEADER.size + end - offset),
+                 CHUNK_HEADER.pack(data_type, FLAG_LAST_CHUNK if last else 0),
+                 memoryview(payload)[offset:end]]
+        self.chunks += 1
+
+        if last:
+            self.queues[priority].popleft()
+            self.offsets[priority] = 0
+            return parts, sent
+
+        self.offsets[priority] = end
+        return parts, None
+
+    def _next_write(self):
+        parts, done, size = [], [], 0
+        for priority, queue in enumerate(self.queues):
+            while queue and size < self.chunk_size:
+                message, sent = self._take(priority, self.chunk_size - size)
+                if message is None:
+                    break
+                parts.extend(message)
+                size += sum(len(part) for part in message)
+                if sent:
+                    done.append(sent)
+                if not sent and queue:
+                    break
+            if size >= self.chunk_size:
+                break
+        return parts, done
+
+    def _writer(self):
+        while True:
+            with self.condition:
+                while not self.closed and not any(self.queues):
+                    self.condition.wait()
+                if self.closed:
+                    return
+                parts, done = self._next_write()
+
+            try:
+                send_parts(self.sock, parts)
+            except Exception as e:
+                with self.condition:
+                    self.closed = True
+                    for queue in self.queues:
+                        queue.clear()
+                    self.condition.notify_all()
+                if self.on_error:
+                    self.on_error(e)
+                return
+
+            now = time.perf_counter()
+            with self.condition:
+                self.writes += 1
+                self.condition.notify_all()
+
+            for data_type, size, queued_at, on_sent in done:
+                if self.on_sent:
+                    self.on_sent(data_type, size, now - queued_at)
+                if on_sent:
+                    on_sent(now - queued_at)
+
+    def get_stats(self):
+        with self.condition:
+            return {
+                'queued': {name: len(queue)
+                           for name, queue in zip(PRIORITY_NAMES, self.queues)},
+                'chunks': self.chunks,
+                'writes': self.writes
+            }
@@ -0,0 +1,209 @@
+import os
+import threading
+import time
+from datetime import datetime
+
+from .video_processor import VideoProcessor
+
+
+class StreamRecorder:
+    def __init__(self, prefix='remote_session'):
+        self.prefix = prefix
+        self.recording = False
+        self.lock = threading.Lock()
+
+        self.sample_rate = 44100
+        self.channels = 2
+
+        self.video_processor = VideoProcessor()
+        self.mux_enabled = True
+        self.mux_thread = None
+
+        self._reset()
+
+    def _reset(self):
+        self.base_path = None
+        self.video_file = None
+        self.audio_file = None
+        self.index_file = None
+        self.started_at = None
+        self.frame_count = 0
+        self.video_bytes = 0
+        self.audio_bytes = 0
+        self.first_frame_us = None
+        self.last_frame_us = None
+
+    def start_recording(self, save_path, sample_rate=44100, channels=2):
+        with self.lock:
+            if self.recording:
+                return False
+
+            try:
+                os.makedirs(save_path, exist_ok=True)
+
+                self._reset()
+                timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+                self.base_path = os.path.join(
+                    save_path, f'{self.prefix}_{timestamp}')
+                self.sample_rate = sample_rate
+                self.channels = channels
+
+                self.video_file = open(self.base_path + '.mjpeg', 'wb')
+                self.audio_file = open(self.base_path + '.pcm', 'wb')
+                self.index_file = open(self.base_path + '.index', 'w',
+                                       encoding='utf-8')
+                self.index_file.write(
+                    f'# sample_rate={sample_rate} channels={channels}\n'
+                    '# kind time_us offset size\n')
+
+                self.started_at = time.perf_counter()
+                self.recording = True
+                return True
+
+            except Exception as e:
+                print(f'Ошибка запуска записи сеанса: {e}')
+                self._close_files()
+                return False
+
+    def _close_files(self):
+        for f in (self.video_file, self.audio_file, self.index_file):
+            if f:
+                try:
+                    f.close()
+                except:
+                    pass
+
+    def _timestamp_us(self, timestamp):
+        if timestamp is None:
+            timestamp = time.perf_counter()
+        return int((timestamp - self.started_at) * 1000000)
+
+    def write_frame(self, data, timestamp=None):
+        with self.lock:
+            if not self.recording:
+                return
+
+            time_us = self._timestamp_us(timestamp)
+            self.index_file.write(
+                f'video {time_us} {self.video_bytes} {len(data)}\n')
+            self.video_file.write(data)
+
+            self.video_bytes += len(data)
+            self.frame_count += 1
+            if self.first_frame_us is None:
+                self.first_frame_us = time_us
+            self.last_frame_us = time_us
+
+    def write_audio(self, data, timestamp=None):
+        with self.lock:
+            if not self.recording:
+                return
+
+            time_us = self._timestamp_us(timestamp)
+            self.index_file.write(
+                f'audio {time_us} {self.audio_bytes} {len(data)}\n')
+            self.audio_file.write(data)
+            self.audio_bytes += len(data)
+
+    def _average_fps(self):
+        if self.frame_count < 2 or self.last_frame_us == self.first_frame_us:
+            return 1.0
+        return (self.frame_count - 1) * 1000000 / (
+            self.last_frame_us - self.first_frame_us)
+
+    def stop_recording(self, on_saved=None):
+        with self.lock:
+            if not self.recording:
+                return None
+
+            self.recording = False
+            self._close_files()
+
+            result = {
+                'video_path': self.base_path + '.mjpeg',
+                'audio_path': self.base_path + '.pcm' if self.audio_bytes else None,
+                'index_path': self.base_path + '.index',
+                'frames': self.frame_count,
+                'video_bytes': self.video_bytes,
+                'audio_bytes': self.audio_bytes,
+                'fps': self._average_fps(),
+                'sample_rate': self.sample_rate,
+                'channels': self.channels,
+                'output_file': None,
+                'muxing': False
+            }
+
+        if not self.audio_bytes and os.path.exists(self.base_path + '.pcm'):
+            os.remove(self.base_path + '.pcm')
+
+        if not self.mux_enabled or not result['frames']:
+            if on_saved:
+                on_saved(result)
+            return result
+
+        result['muxing'] = True
+        self.mux_thread = threading.Thread(
+            target=self._mux, args=(dict(result), self.base_path + '.mkv', on_saved))
+        self.mux_thread.daemon = True
+        self.mux_thread.start()
+        return result
+
+    def _read_index(self, result):
+        frames = []
+        audio_start_us = None
+        bytes_per_second = result['sample_rate'] * result['channels'] * 2
+
+        with open(result['index_path'], encoding='utf-8') as f:
+            for line in f:
+                if line.startswith('#'):
+                    continue
+                kind, time_us, offset, size = line.split()
+                if kind == 'video':
+                    frames.append((int(time_us), int(offset), int(size)))
+                elif kind == 'audio' and audio_start_us is None:
+                    audio_start_us = int(time_us) - int(size) * 1000000 // bytes_per_second
+
+        audio_offset = 0.0
+        if frames and audio_start_us is not None:
+            audio_offset = (audio_start_us - frames[0][0]) / 1000000
+        return frames, audio_offset
+
+    def _mux(self, result, output_path, on_saved):
+        try:
+            frames, audio_offset = self._read_index(result)
+            mux_result = self.video_processor.mux_mjpeg_stream(
+                result['video_path'], output_path, frames,
+                result['audio_path'], result['sample_rate'], result['channels'],
+                audio_offset)
+        except Exception as e:
+            mux_result = {'success': False, 'error': str(e)}
+
+        result['muxing'] = False
+        if mux_result['success']:
+            result['output_file'] = output_path
+            print(f'Запись сеанса сохранена: {output_path}')
+        else:
+            print(f"Не удалось собрать запись сеанса: {mux_result['error']}")
+
+        if on_saved:
+            try:
+                on_saved(result)
+            except Exception as e:
+                print(f'Ошибка уведомления о записи сеанса: {e}')
+
+    def wait_for_mux(self, timeout=None):
+        thread = self.mux_thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout)
+        return thread is None or not thread.is_alive()
+
+    def get_recording_status(self):
+        with self.lock:
+            return {
+                'recording': self.recording,
+                'frames': self.frame_count,
+                'video_bytes': self.video_bytes,
+                'audio_bytes': self.audio_bytes,
+                'duration_s': time.perf_counter() - self.started_at if self.recording else 0.0,
+                'base_path': self.base_path
+            }
@@ -0,0 +1,613 @@
+import hashlib
+import struct
+import zlib
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+
+TILE_SOLID = 0
+TILE_PALETTE = 1
+TILE_PNG = 2
+TILE_JPEG = 3
+TILE_CACHED = 4
+TILE_SKIPPED = 255
+
+CACHEABLE_CODECS = (TILE_PALETTE, TILE_PNG, TILE_JPEG)
+
+TILE_CODEC_NAMES = {
+    TILE_SOLID: 'solid',
+    TILE_PALETTE: 'palette',
+    TILE_PNG: 'png',
+    TILE_JPEG: 'jpeg'
+}
+
+FLAG_KEYFRAME = 1
+FLAG_CACHE_RESET = 2
+
+FRAME_HEADER = struct.Struct('>HHHBHHH')
+COPY_HEADER = struct.Struct('>HHHHHH')
+TILE_HEADER = struct.Struct('>HHB')
+SIZE_HEADER = struct.Struct('>L')
+HASH_HEADER = struct.Struct('>Q')
+
+FLAGS_OFFSET = 6
+
+
+def pack_rgb(array):
+    rgba = cv2.cvtColor(np.ascontiguousarray(array), cv2.COLOR_RGB2RGBA)
+    return rgba.view(np.uint32)[..., 0]
+
+
+def unpack_rgb(packed):
+    return np.ascontiguousarray(packed).view(np.uint8).reshape(-1, 4)[:, :3]
+
+
+def frame_flags(data):
+    return data[FLAGS_OFFSET] if len(data) > FLAGS_OFFSET else 0
+
+
+def is_keyframe(data):
+    return bool(frame_flags(data) & FLAG_KEYFRAME)
+
+
+def apply_copies(canvas, copies):
+    if not copies:
+        return canvas
+
+    source = canvas.copy()
+    for src_x, src_y, width, height, dst_x, dst_y in copies:
+        canvas[dst_y:dst_y + height, dst_x:dst_x + width] = \
+            source[src_y:src_y + height, src_x:src_x + width]
+    return canvas
+
+
+def tile_hash(packed_tile):
+    height, width = packed_tile.shape
+    digest = hashlib.blake2b(np.ascontiguousarray(packed_tile).tobytes(),
+                             digest_size=8, salt=struct.pack('>HH', width, height))
+    return int.from_bytes(digest.digest(), 'big')
+
+
+class TileCache:
+    def __init__(self, capacity=0):
+        self.capacity = max(0, int(capacity))
+        self.entries = OrderedDict()
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key):
+        if key not in self.entries:
+            return None
+        self.entries.move_to_end(key)
+        return self.entries[key]
+
+    def put(self, key, value=None):
+        if not self.capacity:
+            return
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.capacity:
+            self.entries.popitem(last=False)
+
+    def clear(self):
+        self.entries.clear()
+
+
+class TileRefiner:
+    def __init__(self, delay=1.0, max_tiles=32):
+        self.delay = delay
+        self.max_tiles = max_tiles
+        self.lossy_since = None
+
+    def reset(self):
+        self.lossy_since = None
+
+    def prepare(self, plan, tile_size, now):
+        shape = plan['codecs'].shape
+        if (plan['keyframe'] or self.lossy_since is None
+                or self.lossy_since.shape != shape):
+            self.lossy_since = np.full(shape, np.inf)
+            return
+
+        lossy = np.isfinite(self.lossy_since)
+        if not plan['copies'] or not lossy.any():
+            return
+
+        mask = np.repeat(np.repeat(lossy, tile_size, axis=0), tile_size, axis=1)
+        moved = apply_copies(mask, plan['copies'])
+        rows, columns = shape
+        moved_lossy = moved.reshape(rows, tile_size, columns, tile_size).any(axis=(1, 3))
+
+        for src_x, src_y, width, height, dst_x, dst_y in plan['copies']:
+            tiles = (slice(dst_y // tile_size, (dst_y + height - 1) // tile_size + 1),
+                     slice(dst_x // tile_size, (dst_x + width - 1) // tile_size + 1))
+            self.lossy_since[tiles] = np.where(moved_lossy[tiles], now, np.inf)
+
+    def mark(self, column, row, lossy, now):
+        self.lossy_since[row, column] = now if lossy else np.inf
+
+    def due(self, now):
+        rows, columns = np.nonzero(self.lossy_since <= now - self.delay)
+        order = np.argsort(self.lossy_since[rows, columns], kind='stable')
+        return [(int(columns[index]), int(rows[index]))
+                for index in order[:self.max_tiles]]
+
+
+class TileEncoder:
+    def __init__(self, tile_size=64, jpeg_quality=70, palette_colors=256,
+                 text_edge_ratio=0.06, edge_threshold=48, png_compression=3,
+                 zlib_level=6, copy_min_rows=32, copy_window=16):
+        self.tile_size = tile_size
+        self.jpeg_quality = jpeg_quality
+        self.palette_colors = palette_colors
+        self.text_edge_ratio = text_edge_ratio
+        self.edge_threshold = edge_threshold
+        self.png_compression = png_compression
+        self.zlib_level = zlib_level
+        self.copy_min_rows = copy_min_rows
+        self.copy_window = copy_window
+        self.hash_weights = np.random.default_rng(0x5EC0).integers(
+            1, 1 << 63, tile_size, dtype=np.uint64) | np.uint64(1)
+        self.last_packed = (None, None)
+
+    def grid(self, width, height):
+        return ((width + self.tile_size - 1) // self.tile_size,
+                (height + self.tile_size - 1) // self.tile_size)
+
+    def _padded(self, array):
+        height, width = array.shape[:2]
+        columns, rows = self.grid(width, height)
+        pad_y = rows * self.tile_size - height
+        pad_x = columns * self.tile_size - width
+        if pad_x or pad_y:
+            array = cv2.copyMakeBorder(np.ascontiguousarray(array), 0, pad_y,
+                                       0, pad_x, cv2.BORDER_REPLICATE)
+        return array, columns, rows
+
+    def _tiles(self, plane, columns, rows, selected=None):
+        size = self.tile_size
+        grid = plane.reshape(rows, size, columns, size)
+        if selected is None:
+            selected = np.arange(rows * columns)
+        tile_rows, tile_columns = np.divmod(selected, columns)
+        return grid[tile_rows, :, tile_columns, :].reshape(len(selected), size * size)
+
+    def _packed(self, array):
+        cached_array, packed = self.last_packed
+        if cached_array is array:
+            return packed
+
+        packed = pack_rgb(array)
+        self.last_packed = (array, packed)
+        return packed
+
+    def analyze(self, array, selected=None):
+        packed = self._packed(array)
+        padded, columns, rows = self._padded(packed.view(np.int32))
+        packed = padded.view(np.uint32)
+        size = self.tile_size
+
+        tiles = self._tiles(packed, columns, rows, selected)
+        green = ((tiles >> 8) & 0xFF).reshape(-1, size, size).astype(np.int16)
+
+        tiles = np.sort(tiles, axis=1)
+        changes = np.diff(tiles, axis=1) != 0
+        colors = 1 + np.count_nonzero(changes, axis=1)
+
+        edges = np.count_nonzero(
+            np.abs(np.diff(green, axis=2)) > self.edge_threshold, axis=(1, 2))
+        edges += np.count_nonzero(
+            np.abs(np.diff(green, axis=1)) > self.edge_threshold, axis=(1, 2))
+
+        return {
+            'packed': packed,
+            'sorted': tiles,
+            'changes': changes,
+            'columns': columns,
+            'rows': rows,
+            'colors': colors,
+            'edge_ratio': edges / (size * size)
+        }
+
+    def classify(self, array, stats=None):
+        if stats is None:
+            stats = self.analyze(array)
+        colors = stats['colors']
+        codecs = np.full(colors.shape, TILE_JPEG, dtype=np.uint8)
+        codecs[stats['edge_ratio'] >= self.text_edge_ratio] = TILE_PNG
+        codecs[colors <= self.palette_colors] = TILE_PALETTE
+        codecs[colors == 1] = TILE_SOLID
+        return codecs
+
+    def tile_bounds(self, column, row, width, height):
+        x = column * self.tile_size
+        y = row * self.tile_size
+        return x, y, min(x + self.tile_size, width), min(y + self.tile_size, height)
+
+    def _row_hashes(self, plane):
+        width = plane.shape[1]
+        return (plane.astype(np.uint64) * self.hash_weights[:width]).sum(axis=1)
+
+    def _window_hashes(self, hashes):
+        count = len(hashes) - self.copy_window + 1
+        windows = hashes[:count].copy()
+        for offset in range(1, self.copy_window):
+            windows *= np.uint64(0x100000001B3)
+            windows ^= hashes[offset:offset + count]
+        return windows
+
+    def _longest_run(self, mask):
+        if not mask.any():
+            return 0, 0
+
+        edges = np.diff(np.concatenate(([0], mask.astype(np.int8), [0])))
+        starts = np.flatnonzero(edges == 1)
+        ends = np.flatnonzero(edges == -1)
+        index = int(np.argmax(ends - starts))
+        return int(starts[index]), int(ends[index] - starts[index])
+
+    def _detect_shift(self, current, base, changed):
+        height, width = current.shape
+        size = self.tile_size
+
+        copies = []
+        for x in range(0, width, size):
+            right = min(x + size, width)
+            rows = np.flatnonzero(changed[:, x:right].any(axis=1))
+            if len(rows) < self.copy_min_rows:
+                continue
+
+            current_hashes = self._row_hashes(current[:, x:right])
+            base_hashes = self._row_hashes(base[:, x:right])
+
+            base_windows = self._window_hashes(base_hashes)
+            current_windows = self._window_hashes(current_hashes)
+            count = len(base_windows)
+            rows = rows[rows < count]
+
+            order = np.argsort(base_windows, kind='stable')
+            sorted_hashes = base_windows[order]
+            wanted = current_windows[rows]
+            positions = np.minimum(np.searchsorted(sorted_hashes, wanted), count - 1)
+            following = np.minimum(positions + 1, count - 1)
+            unique = ((sorted_hashes[positions] == wanted)
+                      & ((positions == count - 1)
+                         | (sorted_hashes[following] != wanted)))
+
+            offsets = order[positions[unique]] - rows[unique]
+            offsets = offsets[offsets != 0]
+            if len(offsets) < self.copy_min_rows // 4:
+                continue
+
+            values, counts = np.unique(offsets, return_counts=True)
+            shift = int(values[np.argmax(counts)])
+
+            first = max(0, -shift)
+            last = min(height, height - shift)
+            matches = current_hashes[first:last] == base_hashes[first + shift:last + shift]
+            start, length = self._longest_run(matches)
+            if length < self.copy_min_rows:
+                continue
+
+            dst_y = first + start
+            copy = [x, dst_y + shift, right - x, length, x, dst_y]
+            previous = copies[-1] if copies else None
+            if (previous and previous[0] + previous[2] == x
+                    and previous[1] == copy[1] and previous[3] == length
+                    and previous[5] == dst_y):
+                previous[2] += right - x
+            else:
+                copies.append(copy)
+
+        return [tuple(copy) for copy in copies]
+
+    def detect_copies(self, current, base):
+        changed = current != base
+        changed_rows = np.count_nonzero(changed.any(axis=1))
+        changed_columns = np.count_nonzero(changed.any(axis=0))
+        if min(changed_rows, changed_columns) < self.copy_min_rows:
+            return []
+
+        def area(copies):
+            return sum(copy[2] * copy[3] for copy in copies)
+
+        vertical = self._detect_shift(current, base, changed)
+        if area(vertical) * 2 >= changed_rows * changed_columns:
+            return vertical
+
+        horizontal = [(src_x, src_y, width, height, dst_x, dst_y)
+                      for src_y, src_x, height, width, dst_y, dst_x
+                      in self._detect_shift(current.T, base.T, changed.T)]
+        return vertical if area(vertical) >= area(horizontal) else horizontal
+
+    def plan(self, image, base=None):
+        array = np.asarray(image)
+        height, width = array.shape[:2]
+        columns, rows = self.grid(width, height)
+        keyframe = base is None or base.shape != array.shape
+
+        copies = []
+        if keyframe:
+            selected = np.arange(rows * columns)
+        else:
+            base_packed = self._packed(base).copy()
+            current_packed = self._packed(array)
+            copies = self.detect_copies(current_packed, base_packed)
+            predicted = apply_copies(base_packed, copies)
+
+            changed, _, _ = self._padded(
+                (current_packed != predicted).view(np.uint8))
+            selected = np.flatnonzero(changed.reshape(
+                rows, self.tile_size, columns, self.tile_size).any(axis=(1, 3)))
+
+        codecs = np.full(rows * columns, TILE_SKIPPED, dtype=np.uint8)
+        tiles = []
+        if len(selected):
+            stats = self.analyze(array, selected)
+            codecs[selected] = self.classify(array, stats)
+            packed = stats['packed']
+
+            for position, index in enumerate(selected):
+                row, column = divmod(int(index), columns)
+                codec = int(codecs[index])
+                x, y, right, bottom = self.tile_bounds(column, row, width, height)
+                tile = array[y:bottom, x:right]
+                packed_tile = packed[y:bottom, x:right]
+
+                key = tile_hash(packed_tile) if codec in CACHEABLE_CODECS else None
+                if codec == TILE_JPEG:
+                    payload = tile
+                else:
+                    payload = self._encode_tile(tile, codec, packed_tile,
+                                                self._palette(stats, position))
+                tiles.append((column, row, codec, key, payload))
+
+        return {
+            'width': width,
+            'height': height,
+            'keyframe': keyframe,
+            'copies': copies,
+            'codecs': codecs.reshape(rows, columns),
+            'tiles': tiles,
+            'array': array,
+            'atlases': {},
+            'refined': {}
+        }
+
+    def _refined_tile(self, plan, column, row):
+        refined = plan['refined'].get((column, row))
+        if refined is None:
+            x, y, right, bottom = self.tile_bounds(
+                column, row, plan['width'], plan['height'])
+            tile = plan['array'][y:bottom, x:right]
+            refined = (tile_hash(pack_rgb(tile)),
+                       self._encode_tile(tile, TILE_PNG, None, None))
+            plan['refined'][(column, row)] = refined
+        return refined
+
+    def assemble(self, plan, cache=None, reset_cache=False, refiner=None, now=None):
+        if refiner is not None:
+            refiner.prepare(plan, self.tile_size, now)
+
+        records = []
+        atlas_indices = []
+        hits = 0
+        for index, (column, row, codec, key, payload) in enumerate(plan['tiles']):
+            if key is None:
+                records.append(TILE_HEADER.pack(column, row, codec)
+                               + SIZE_HEADER.pack(len(payload)) + payload)
+                if refiner is not None:
+                    refiner.mark(column, row, False, now)
+                continue
+
+            if cache is not None and key in cache:
+                lossy = bool(cache.get(key))
+                records.append(TILE_HEADER.pack(column, row, TILE_CACHED)
+                               + HASH_HEADER.pack(key))
+                if refiner is not None:
+                    refiner.mark(column, row, lossy, now)
+                hits += 1
+                continue
+
+            if cache is not None:
+                cache.put(key, codec == TILE_JPEG)
+            if refiner is not None:
+                refiner.mark(column, row, codec == TILE_JPEG, now)
+
+            record = TILE_HEADER.pack(column, row, codec) + HASH_HEADER.pack(key)
+            if codec == TILE_JPEG:
+                atlas_indices.append(index)
+            else:
+                record += SIZE_HEADER.pack(len(payload)) + payload
+            records.append(record)
+
+        atlas_key = tuple(atlas_indices)
+        atlas_columns, atlas = plan['atlases'].get(atlas_key) or (0, b'')
+        if atlas_indices and not atlas:
+            atlas_columns, atlas = self._encode_atlas(
+                [plan['tiles'][index][4] for index in atlas_indices])
+            plan['atlases'][atlas_key] = (atlas_columns, atlas)
+
+        refined = 0
+        if refiner is not None:
+            for column, row in refiner.due(now):
+                key, payload = self._refined_tile(plan, column, row)
+                records.append(TILE_HEADER.pack(column, row, TILE_PNG)
+                               + HASH_HEADER.pack(key)
+                               + SIZE_HEADER.pack(len(payload)) + payload)
+                if cache is not None:
+                    cache.put(key, False)
+                refiner.mark(column, row, False, now)
+                refined += 1
+
+        flags = FLAG_KEYFRAME if plan['keyframe'] else 0
+        if reset_cache:
+            flags |= FLAG_CACHE_RESET
+
+        data = b''.join([
+            FRAME_HEADER.pack(plan['width'], plan['height'], self.tile_size, flags,
+                              len(plan['copies']), len(records), atlas_columns)
+        ] + [COPY_HEADER.pack(*copy) for copy in plan['copies']] + [
+            SIZE_HEADER.pack(len(atlas)),
+            atlas
+        ] + records)
+
+        return data, {
+            'keyframe': plan['keyframe'],
+            'copies': plan['copies'],
+            'codecs': plan['codecs'],
+            'cache_hits': hits,
+            'refined': refined
+        }
+
+    def encode(self, image, base=None, cache=None):
+        return self.assemble(self.plan(image, base), cache)
+
+    def _palette(self, stats, index):
+        tile = stats['sorted'][index]
+        return tile[np.concatenate(([True], stats['changes'][index]))]
+
+    def _encode_tile(self, tile, codec, packed, palette):
+        if codec == TILE_SOLID:
+            return tile[0, 0].astype(np.uint8).tobytes()
+
+        if codec == TILE_PALETTE:
+            indices = np.searchsorted(palette, packed)
+            return (struct.pack('>H', len(palette)) + unpack_rgb(palette).tobytes()
+                    + zlib.compress(indices.astype(np.uint8).tobytes(), self.zlib_level))
+
+        ok, encoded = cv2.imencode(
+            '.png', cv2.cvtColor(tile, cv2.COLOR_RGB2BGR),
+            [cv2.IMWRITE_PNG_COMPRESSION, self.png_compression])
+        return encoded.tobytes() if ok else b''
+
+    def _encode_atlas(self, tiles):
+        if not tiles:
+            return 0, b''
+
+        size = self.tile_size
+        atlas_columns = min(len(tiles), 16)
+        atlas_rows = (len(tiles) + atlas_columns - 1) // atlas_columns
+        atlas = np.zeros((atlas_rows * size, atlas_columns * size, 3), dtype=np.uint8)
+
+        for index, tile in enumerate(tiles):
+            y = (index // atlas_columns) * size
+            x = (index % atlas_columns) * size
+            height, width = tile.shape[:2]
+            if height != size or width != size:
+                tile = cv2.copyMakeBorder(np.ascontiguousarray(tile), 0, size - height,
+                                          0, size - width, cv2.BORDER_REPLICATE)
+            atlas[y:y + size, x:x + size] = tile
+
+        ok, encoded = cv2.imencode(
+            '.jpg', cv2.cvtColor(atlas, cv2.COLOR_RGB2BGR),
+            [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality])
+        return atlas_columns, encoded.tobytes() if ok else b''
+
+
+class TileDecoder:
+    def __init__(self, cache_tiles=0):
+        self.canvas = None
+        self.cache = TileCache(cache_tiles)
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def reset(self, cache_tiles=None):
+        self.canvas = None
+        if cache_tiles is not None:
+            self.cache = TileCache(cache_tiles)
+
+    def decode(self, data):
+        (width, height, tile_size, flags, copy_count, count,
+         atlas_columns) = FRAME_HEADER.unpack_from(data)
+        offset = FRAME_HEADER.size
+
+        if flags & FLAG_CACHE_RESET:
+            self.cache.clear()
+
+        if flags & FLAG_KEYFRAME:
+            if self.canvas is None or self.canvas.shape[:2] != (height, width):
+                self.canvas = np.zeros((height, width, 3), dtype=np.uint8)
+        elif self.canvas is None or self.canvas.shape[:2] != (height, width):
+            return None
+        canvas = self.canvas
+
+        copies = []
+        for _ in range(copy_count):
+            copies.append(COPY_HEADER.unpack_from(data, offset))
+            offset += COPY_HEADER.size
+        apply_copies(canvas, copies)
+
+        atlas_size, = SIZE_HEADER.unpack_from(data, offset)
+        offset += SIZE_HEADER.size
+
+        atlas = None
+        if atlas_size:
+            encoded = np.frombuffer(data, np.uint8, atlas_size, offset)
+            atlas = cv2.cvtColor(cv2.imdecode(encoded, cv2.IMREAD_COLOR),
+                                 cv2.COLOR_BGR2RGB)
+            offset += atlas_size
+
+        atlas_index = 0
+        for _ in range(count):
+            column, row, codec = TILE_HEADER.unpack_from(data, offset)
+            offset += TILE_HEADER.size
+
+            x = column * tile_size
+            y = row * tile_size
+            right = min(x + tile_size, width)
+            bottom = min(y + tile_size, height)
+
+            key = None
+            if codec == TILE_CACHED or codec in CACHEABLE_CODECS:
+                key, = HASH_HEADER.unpack_from(data, offset)
+                offset += HASH_HEADER.size
+
+            if codec == TILE_CACHED:
+                tile = self.cache.get(key)
+                if tile is None:
+                    self.cache_misses += 1
+                    self.canvas = None
+                    return None
+                self.cache_hits += 1
+                canvas[y:bottom, x:right] = tile
+                continue
+
+            if codec == TILE_JPEG:
+                atlas_y = (atlas_index // atlas_columns) * tile_size
+                atlas_x = (atlas_index % atlas_columns) * tile_size
+                canvas[y:bottom, x:right] = atlas[atlas_y:atlas_y + bottom - y,
+                                                  atlas_x:atlas_x + right - x]
+                atlas_index += 1
+            else:
+                size, = SIZE_HEADER.unpack_from(data, offset)
+                offset += SIZE_HEADER.size
+                payload = data[offset:offset + size]
+                offset += size
+
+                canvas[y:bottom, x:right] = self._decode_tile(
+                    payload, codec, right - x, bottom - y)
+
+            if key is not None:
+                self.cache.put(key, canvas[y:bottom, x:right].copy())
+
+        return canvas
+
+    def _decode_tile(self, payload, codec, width, height):
+        if codec == TILE_SOLID:
+            return np.frombuffer(payload, np.uint8, 3)
+
+        if codec == TILE_PALETTE:
+            colors, = struct.unpack_from('>H', payload)
+            palette = np.frombuffer(payload, np.uint8, colors * 3, 2).reshape(colors, 3)
+            indices = np.frombuffer(zlib.decompress(payload[2 + colors * 3:]), np.uint8)
+            return palette[indices].reshape(height, width, 3)
+
+        tile = cv2.imdecode(np.frombuffer(payload, np.uint8), cv2.IMREAD_COLOR)
+        return cv2.cvtColor(tile, cv2.COLOR_BGR2RGB)
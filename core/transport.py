@@ -0,0 +1,152 @@
+import json
+import socket
+import struct
+
+
+MESSAGE_HEADER = struct.Struct('>BL')
+JSON_MESSAGE = 255
+MAX_MESSAGE_SIZE = 256 * 1024 * 1024
+MAX_SEND_PARTS = 512
+
+
+def tune_socket(sock, nodelay=True, keepalive=True, send_buffer=None,
+                recv_buffer=None):
+    options = []
+    if nodelay:
+        options.append((socket.IPPROTO_TCP, socket.TCP_NODELAY, 1))
+    if keepalive:
+        options.append((socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1))
+    if send_buffer:
+        options.append((socket.SOL_SOCKET, socket.SO_SNDBUF, send_buffer))
+    if recv_buffer:
+        options.append((socket.SOL_SOCKET, socket.SO_RCVBUF, recv_buffer))
+
+    for level, option, value in options:
+        try:
+            sock.setsockopt(level, option, value)
+        except OSError:
+            pass
+    return sock
+
+
+def message_parts(data_type, payload):
+    return [MESSAGE_HEADER.pack(data_type, len(payload)), payload]
+
+
+def pack_message(data_type, payload):
+    return MESSAGE_HEADER.pack(data_type, len(payload)) + payload
+
+
+def send_parts(sock, parts):
+    if not hasattr(sock, 'sendmsg'):
+        sock.sendall(b''.join(parts))
+        return
+
+    views = [memoryview(part).cast('B') for part in parts if len(part)]
+    while views:
+        sent = sock.sendmsg(views[:MAX_SEND_PARTS])
+        while views and sent >= len(views[0]):
+            sent -= len(views[0])
+            views.pop(0)
+        if views and sent:
+            views[0] = views[0][sent:]
+
+
+def send_message(sock, data_type, payload):
+    send_parts(sock, message_parts(data_type, payload))
+
+
+def send_json(sock, data):
+    send_message(sock, JSON_MESSAGE, json.dumps(data).encode('utf-8'))
+
+
+def decode_json(payload):
+    try:
+        message = json.loads(bytes(payload).decode('utf-8'))
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        return None
+    return message if isinstance(message, dict) else None
+
+
+def read_exact(sock, size):
+    data = bytearray(size)
+    view = memoryview(data)
+    received = 0
+    while received < size:
+        count = sock.recv_into(view[received:])
+        if not count:
+            raise ConnectionError('Соединение закрыто')
+        received += count
+    return bytes(data)
+
+
+class MessageReader:
+    def __init__(self, sock, buffer_size=65536):
+        self.sock = sock
+        self.buffer = bytearray(buffer_size)
+        self.start = 0
+        self.end = 0
+
+    def _fill(self, needed):
+        if self.start + needed > len(self.buffer):
+            available = self.end - self.start
+            self.buffer[:available] = self.buffer[self.start:self.end]
+            self.start, self.end = 0, available
+
+        view = memoryview(self.buffer)
+        while self.end - self.start < needed:
+            count = self.sock.recv_into(view[self.end:])
+            if not count:
+                return False
+            self.end += count
+        return True
+
+    def read_message(self):
+        if not self._fill(MESSAGE_HEADER.size):
+            return None
+
+        data_type, size = MESSAGE_HEADER.unpack_from(self.buffer, self.start)
+        if size > MAX_MESSAGE_SIZE:
+            raise ValueError(f'Слишком большое сообщение: {size} байт')
+
+        if MESSAGE_HEADER.size + size <= len(self.buffer):
+            if not self._fill(MESSAGE_HEADER.size + size):
+                return None
+            offset = self.start + MESSAGE_HEADER.size
+            payload = bytes(memoryview(self.buffer)[offset:offset + size])
+            self.start = offset + size
+            return data_type, payload
+
+        self.start += MESSAGE_HEADER.size
+        payload = bytearray(size)
+        buffered = self.end - self.start
+        payload[:buffered] = self.buffer[self.start:self.end]
+        self.start = self.end = 0
+
+        view = memoryview(payload)
+        while buffered < size:
+            count = self.sock.recv_into(view[buffered:])
+            if not count:
+                return None
+            buffered += count
+        return data_type, bytes(payload)
+
+
+class MessageParser:
+    def __init__(self):
+        self.buffer = bytearray()
+
+    def feed(self, data):
+        self.buffer += data
+        messages = []
+        offset = 0
+        while len(self.buffer) - offset >= MESSAGE_HEADER.size:
+            data_type, size = MESSAGE_HEADER.unpack_from(self.buffer, offset)
+            end = offset + MESSAGE_HEADER.size + size
+            if end > len(self.buffer):
+                break
+            messages.append((data_type, bytes(self.buffer[offset + MESSAGE_HEADER.size:end])))
+            offset = end
+
+        del self.buffer[:offset]
+        return messages
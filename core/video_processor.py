@@ -2,7 +2,7 @@ import os
 import subprocess
 import shutil
 from datetime import datetime
-from typing import Optional, Dict, List
+from typing import Optional, Dict, List, Tuple
 
 
 class VideoProcessor:
@@ -212,6 +212,98 @@ class VideoProcessor:
                 'output_file': None
             }
 
+    def mux_mjpeg_stream(self, video_path: str, output_path: str,
+                         frames: List[Tuple[int, int, int]],
+                         audio_path: Optional[str] = None,
+                         sample_rate: int = 44100, channels: int = 2,
+                         audio_offset: float = 0.0) -> Dict:
+        if not self.enabled:
+            return {
+                'success': False,
+                'error': 'FFmpeg недоступен',
+                'output_file': None
+            }
+
+        try:
+            if not os.path.exists(video_path):
+                return {
+                    'success': False,
+                    'error': f'Видео файл не найден: {video_path}',
+                    'output_file': None
+                }
+
+            concat_path = os.path.splitext(output_path)[0] + '.ffconcat'
+            source = os.path.abspath(video_path).replace("'", "'\\''")
+            last_duration = 0.1
+            if len(frames) > 1:
+                last_duration = (frames[-1][0] - frames[0][0]) / (len(frames) - 1) / 1000000
+
+            with open(concat_path, 'w', encoding='utf-8') as f:
+                f.write('ffconcat version 1.0\n')
+                for i, (time_us, offset, size) in enumerate(frames):
+                    duration = last_duration
+                    if i + 1 < len(frames):
+                        duration = (frames[i + 1][0] - time_us) / 1000000
+                    f.write(f"file 'subfile,,start,{offset},end,{offset + size},,:{source}'\n"
+                            'option framerate 1000\n'
+                            f'duration {max(duration, 0.001):.6f}\n')
+
+            cmd = [
+                self.ffmpeg_path,
+                '-f', 'concat',
+                '-safe', '0',
+                '-protocol_whitelist', 'file,subfile',
+                '-i', concat_path
+            ]
+
+            if audio_path and os.path.exists(audio_path) and os.path.getsize(audio_path):
+                cmd += [
+                    '-itsoffset', f'{audio_offset:.6f}',
+                    '-f', 's16le',
+                    '-ar', str(sample_rate),
+                    '-ac', str(channels),
+                    '-i', audio_path
+                ]
+
+            cmd += ['-c', 'copy', '-y', output_path]
+
+            try:
+                result = subprocess.run(
+                    cmd,
+                    capture_output=True,
+                    text=True,
+                    timeout=300
+                )
+            finally:
+                os.remove(concat_path)
+
+            if result.returncode == 0 and os.path.exists(output_path):
+                return {
+                    'success': True,
+                    'error': None,
+                    'output_file': output_path,
+                    'file_size': os.path.getsize(output_path)
+                }
+            else:
+                return {
+                    'success': False,
+                    'error': f'Ошибка FFmpeg: {result.stderr}',
+                    'output_file': None
+                }
+
+        except subprocess.TimeoutExpired:
+            return {
+                'success': False,
+                'error': 'Превышено время ожидания FFmpeg',
+                'output_file': None
+            }
+        except Exception as e:
+            return {
+                'success': False,
+                'error': f'Исключение: {str(e)}',
+                'output_file': None
+            }
+
     def get_video_info(self, video_path: str) -> Dict:
         if not self.enabled:
             return {'error': 'FFmpeg недоступен'}
@@ -0,0 +1,298 @@
+import queue
+import struct
+import subprocess
+import threading
+
+import numpy as np
+
+from .video_processor import VideoProcessor
+
+
+PACKET_HEADER = struct.Struct('>BHH')
+FLAG_KEYFRAME = 1
+
+START_CODE = b'\x00\x00\x00\x01'
+ACCESS_UNIT_DELIMITER = START_CODE + b'\x09\xf0'
+
+FLV_HEADER_SIZE = 13
+FLV_TAG_HEADER_SIZE = 11
+FLV_VIDEO_TAG = 9
+AVC_SEQUENCE_HEADER = 0
+
+
+def is_keyframe(data):
+    return len(data) >= PACKET_HEADER.size and bool(data[0] & FLAG_KEYFRAME)
+
+
+def avcc_to_annexb(data):
+    nals = []
+    i = 0
+    while i + 4 <= len(data):
+        size = int.from_bytes(data[i:i + 4], 'big')
+        nals.append(START_CODE + data[i + 4:i + 4 + size])
+        i += 4 + size
+    return b''.join(nals)
+
+
+def avc_config_to_annexb(config):
+    nals = []
+    i = 6
+    for _ in range(config[5] & 0x1F):
+        size = int.from_bytes(config[i:i + 2], 'big')
+        nals.append(START_CODE + config[i + 2:i + 2 + size])
+        i += 2 + size
+
+    count = config[i]
+    i += 1
+    for _ in range(count):
+        size = int.from_bytes(config[i:i + 2], 'big')
+        nals.append(START_CODE + config[i + 2:i + 2 + size])
+        i += 2 + size
+    return b''.join(nals)
+
+
+def read_exact(stream, size):
+    data = bytearray()
+    while len(data) < size:
+        chunk = stream.read(size - len(data))
+        if not chunk:
+            return None
+        data += chunk
+    return bytes(data)
+
+
+class H264Encoder:
+    KEYFRAME_INTERVAL = 2.0
+
+    def __init__(self, fps=10, crf=23, gop=None, preset='ultrafast',
+                 ffmpeg_path=None):
+        self.fps = fps
+        self.crf = crf
+        self.gop = gop or max(1, round(fps * self.KEYFRAME_INTERVAL))
+        self.preset = preset
+        self.ffmpeg_path = ffmpeg_path or VideoProcessor().ffmpeg_path
+        self.timeout = 2.0
+
+        self.process = None
+        self.reader = None
+        self.packets = queue.Queue()
+        self.size = None
+        self.config = b''
+
+    def is_available(self):
+        return self.ffmpeg_path is not None
+
+    def _start(self, width, height):
+        self.close()
+        self.size = (width, height)
+        self.config = b''
+        self.packets = queue.Queue()
+
+        self.process = subprocess.Popen(
+            [self.ffmpeg_path, '-hide_banner', '-loglevel', 'error',
+             '-f', 'rawvideo', '-pix_fmt', 'rgb24',
+             '-s', f'{width}x{height}', '-framerate', str(self.fps),
+             '-i', 'pipe:0',
+             '-c:v', 'libx264', '-preset', self.preset, '-tune', 'zerolatency',
+             '-bf', '0', '-g', str(self.gop), '-crf', str(self.crf),
+             '-pix_fmt', 'yuv420p', '-fps_mode', 'passthrough',
+             '-flush_packets', '1', '-f', 'flv', 'pipe:1'],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL)
+
+        self.reader = threading.Thread(
+            target=self._read_packets, args=(self.process, self.packets))
+        self.reader.daemon = True
+        self.reader.start()
+
+    def _read_packets(self, process, packets):
+        try:
+            if read_exact(process.stdout, FLV_HEADER_SIZE) is None:
+                return
+
+            while True:
+                header = read_exact(process.stdout, FLV_TAG_HEADER_SIZE)
+                if header is None:
+                    return
+
+                size = int.from_bytes(header[1:4], 'big')
+                body = read_exact(process.stdout, size + 4)
+                if body is None:
+                    return
+                if header[0] != FLV_VIDEO_TAG or size < 5:
+                    continue
+
+                if body[1] == AVC_SEQUENCE_HEADER:
+                    self.config = avc_config_to_annexb(body[5:size])
+                    continue
+
+                packets.put(((body[0] >> 4) == 1,
+                             avcc_to_annexb(body[5:size])))
+        except Exception as e:
+            print(f'Ошибка чтения потока H.264: {e}')
+        finally:
+            packets.put(None)
+
+    def encode(self, array):
+        if not self.is_available():
+            return None
+
+        height, width = array.shape[0] & ~1, array.shape[1] & ~1
+        if (self.process is None or self.process.poll() is not None
+                or self.size != (width, height)):
+            self._start(width, height)
+
+        try:
+            self.process.stdin.write(
+                np.ascontiguousarray(array[:height, :width]).tobytes())
+            self.process.stdin.flush()
+            packet = self.packets.get(timeout=self.timeout)
+        except Exception as e:
+            print(f'Ошибка кодирования H.264: {e}')
+            packet = None
+
+        if packet is None:
+            self.close()
+            return None
+
+        keyframe, data = packet
+        if keyframe:
+            data = self.config + data
+        return keyframe, data + ACCESS_UNIT_DELIMITER
+
+    def close(self):
+        process, self.process = self.process, None
+        if process is None:
+            return
+
+        try:
+            process.stdin.close()
+        except:
+            pass
+        try:
+            process.wait(timeout=1.0)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+class H264Stream:
+    def __init__(self, fps=10):
+        self.encoder = H264Encoder(fps)
+        self.packets = []
+        self.next_number = 0
+
+    def is_available(self):
+        return self.encoder.is_available()
+
+    def keyframe_number(self):
+        return self.packets[0][0] if self.packets else self.next_number
+
+    def encode(self, array):
+        result = self.encoder.encode(array)
+        if result is None:
+            return None
+
+        keyframe, data = result
+        if keyframe:
+            self.packets = []
+        elif not self.packets:
+            return None
+
+        width, height = self.encoder.size
+        self.packets.append((self.next_number, keyframe, data, width, height))
+        self.next_number += 1
+        return self.next_number - 1
+
+    def packets_since(self, number):
+        if not self.packets or number > self.packets[-1][0]:
+            return None, number
+
+        first = self.packets[0][0]
+        packets = self.packets[max(0, number - first):]
+        flags = FLAG_KEYFRAME if packets[0][1] else 0
+        width, height = packets[-1][3], packets[-1][4]
+        data = b''.join(packet[2] for packet in packets)
+        return PACKET_HEADER.pack(flags, width, height) + data, packets[-1][0] + 1
+
+    def close(self):
+        self.encoder.close()
+        self.packets = []
+
+
+class H264Decoder:
+    def __init__(self, on_frame, ffmpeg_path=None):
+        self.on_frame = on_frame
+        self.ffmpeg_path = ffmpeg_path or VideoProcessor().ffmpeg_path
+        self.process = None
+        self.size = None
+        self.lock = threading.Lock()
+
+    def is_available(self):
+        return self.ffmpeg_path is not None
+
+    def _start(self, width, height):
+        self.close()
+        self.size = (width, height)
+        self.process = subprocess.Popen(
+            [self.ffmpeg_path, '-hide_banner', '-loglevel', 'error',
+             '-threads', '1', '-flags', 'low_delay', '-probesize', '32',
+             '-f', 'h264', '-i', 'pipe:0',
+             '-f', 'rawvideo', '-pix_fmt', 'rgb24', 'pipe:1'],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL, bufsize=0)
+
+        reader = threading.Thread(
+            target=self._read_frames, args=(self.process, width, height))
+        reader.daemon = True
+        reader.start()
+
+    def _read_frames(self, process, width, height):
+        frame_size = width * height * 3
+        try:
+            while True:
+                data = read_exact(process.stdout, frame_size)
+                if data is None:
+                    return
+                self.on_frame(np.frombuffer(data, np.uint8).reshape(height, width, 3))
+        except Exception as e:
+            print(f'Ошибка вывода кадра H.264: {e}')
+
+    def decode(self, data):
+        if len(data) < PACKET_HEADER.size or not self.is_available():
+            return False
+
+        flags, width, height = PACKET_HEADER.unpack_from(data)
+        with self.lock:
+            if flags & FLAG_KEYFRAME:
+                if (self.process is None or self.process.poll() is not None
+                        or self.size != (width, height)):
+                    self._start(width, height)
+            elif self.process is None or self.size != (width, height):
+                return False
+
+            try:
+                self.process.stdin.write(data[PACKET_HEADER.size:])
+                return True
+            except Exception as e:
+                print(f'Ошибка декодирования H.264: {e}')
+                self.close()
+                return False
+
+    def reset(self):
+        with self.lock:
+            self.close()
+
+    def close(self):
+        process, self.process = self.process, None
+        self.size = None
+        if process is None:
+            return
+
+        try:
+            process.stdin.close()
+        except:
+            pass
+        try:
+            process.wait(timeout=1.0)
+        except subprocess.TimeoutExpired:
+            process.kill()
@@ -0,0 +1,86 @@
+import socket
+import unittest
+
+from core.chat_server import ChatServer
+from core.transport import JSON_MESSAGE, MessageReader, decode_json, send_json
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+class ChatTestClient:
+    def __init__(self, port, username):
+        self.socket = socket.create_connection(('127.0.0.1', port))
+        self.socket.settimeout(2.0)
+        self.reader = MessageReader(self.socket)
+        send_json(self.socket, {'type': 'hello', 'username': username})
+
+    def send(self, data):
+        send_json(self.socket, data)
+
+    def receive(self, message_type):
+        while True:
+            received = self.reader.read_message()
+            if received is None:
+                return None
+            data_type, payload = received
+            message = decode_json(payload) if data_type == JSON_MESSAGE else None
+            if message and message.get('type') == message_type:
+                return message
+
+    def close(self):
+        self.socket.close()
+
+
+class UsernameTest(unittest.TestCase):
+    def setUp(self):
+        self.server = ChatServer()
+        self.port = free_port()
+        self.assertTrue(self.server.start_server(self.port))
+        self.clients = []
+
+    def tearDown(self):
+        for client in self.clients:
+            client.close()
+        self.server.stop_server()
+
+    def connect(self, username):
+        client = ChatTestClient(self.port, username)
+        self.clients.append(client)
+        return client
+
+    def test_duplicate_hello_is_rejected(self):
+        alice = self.connect('alice')
+        alice.receive('user_list')
+
+        impostor = self.connect('alice')
+        error = impostor.receive('error')
+        self.assertEqual(error['code'], 'username_taken')
+        self.assertIsNone(impostor.receive('message'))
+
+        self.server.send_message('bob', 'секрет', recipient='alice')
+        self.assertEqual(alice.receive('message')['message'], 'секрет')
+        self.assertEqual(self.server.get_server_status()['users'], ['alice'])
+
+    def test_rename_to_connected_name_is_rejected(self):
+        alice = self.connect('alice')
+        alice.receive('user_list')
+        bob = self.connect('bob')
+        bob.receive('user_list')
+
+        bob.send({'type': 'rename', 'username': 'alice'})
+        error = bob.receive('error')
+        self.assertEqual(error['code'], 'username_taken')
+        self.assertEqual(error['username'], 'bob')
+
+        self.server.send_message('carol', 'только для alice', recipient='alice')
+        self.assertEqual(alice.receive('message')['message'], 'только для alice')
+        self.assertEqual(sorted(self.server.get_server_status()['users']),
+                         ['alice', 'bob'])
+
+
+if __name__ == '__main__':
+    unittest.main()
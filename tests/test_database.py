@@ -0,0 +1,105 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+from unittest import mock
+
+from core.database import DatabaseManager
+
+
+class SearchBackfillTest(unittest.TestCase):
+    def setUp(self):
+        self.db_dir = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.db_dir, 'securestream.db')
+
+        conn = sqlite3.connect(self.db_path)
+        conn.execute('''
+            CREATE TABLE chat_messages (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                username TEXT NOT NULL,
+                message TEXT NOT NULL,
+                message_type TEXT DEFAULT 'text',
+                timestamp DATETIME NOT NULL
+            )
+        ''')
+        conn.executemany(
+            "INSERT INTO chat_messages (username, message, timestamp) "
+            "VALUES (?, ?, datetime('now', '-60 days'))",
+            [('user', f'старое сообщение {i}') for i in range(50)])
+        conn.commit()
+        conn.close()
+
+        with mock.patch.object(DatabaseManager, 'start_search_backfill'):
+            self.db = DatabaseManager(self.db_path)
+
+    def tearDown(self):
+        shutil.rmtree(self.db_dir, ignore_errors=True)
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path)
+
+    def _backfill_state(self):
+        conn = self._connect()
+        row = conn.execute(
+            "SELECT value FROM app_settings "
+            "WHERE category = 'fts_backfill' AND key = 'chat_messages'").fetchone()
+        conn.close()
+        return row
+
+    def _search_count(self, text):
+        conn = self._connect()
+        count = conn.execute(
+            'SELECT COUNT(*) FROM chat_messages_fts WHERE chat_messages_fts MATCH ?',
+            (text,)).fetchone()[0]
+        conn.close()
+        return count
+
+    def test_update_and_delete_before_backfill(self):
+        self.assertIsNotNone(self._backfill_state())
+
+        conn = self._connect()
+        conn.execute("UPDATE chat_messages SET message = 'правка' WHERE id = 5")
+        conn.execute('DELETE FROM chat_messages WHERE id = 6')
+        conn.commit()
+        conn.close()
+
+        self.db.backfill_search_index()
+
+        self.assertIsNone(self._backfill_state())
+        self.assertEqual(self._search_count('правка'), 1)
+        self.assertEqual(self._search_count('старое'), 48)
+
+    def test_update_and_delete_during_backfill(self):
+        conn = self._connect()
+        conn.execute(
+            "INSERT INTO chat_messages_fts (rowid, username, message) "
+            "SELECT id, username, message FROM chat_messages WHERE id <= 20")
+        conn.execute(
+            "UPDATE app_settings SET value = '{\"last_id\": 20, \"max_id\": 50}' "
+            "WHERE category = 'fts_backfill' AND key = 'chat_messages'")
+        conn.commit()
+
+        conn.execute("UPDATE chat_messages SET message = 'правка' WHERE id IN (10, 30)")
+        conn.execute('DELETE FROM chat_messages WHERE id IN (11, 31)')
+        conn.commit()
+        conn.close()
+
+        self.db.backfill_search_index(chunk_size=20)
+
+        self.assertEqual(self._search_count('правка'), 2)
+        self.assertEqual(self._search_count('старое'), 46)
+        conn = self._connect()
+        conn.execute(
+            "INSERT INTO chat_messages_fts (chat_messages_fts) VALUES ('integrity-check')")
+        conn.close()
+
+    def test_cleanup_before_backfill(self):
+        self.db.cleanup_old_data(days_old=-1)
+        self.db.backfill_search_index()
+
+        self.assertEqual(self._search_count('старое'), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,427 @@
+import argparse
+import json
+import random
+import selectors
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+from core.transport import JSON_MESSAGE, MessageParser, decode_json, send_json, tune_socket
+from tools.net_proxy import add_impairment_arguments, start_impairment, stop_impairment
+from tools.stats import ProcessSampler, latency_summary
+
+
+PROBE_PREFIX = 'lt|'
+
+
+class SimulatedClient:
+    def __init__(self, index, host, port):
+        self.index = index
+        self.host = host
+        self.port = port
+        self.username = f'load_{index}'
+        self.socket = None
+        self.parser = MessageParser()
+        self.connected = False
+        self.server_epoch = None
+        self.last_seen_id = 0
+        self.send_lock = threading.Lock()
+
+    def connect(self):
+        self.socket = tune_socket(socket.create_connection((self.host, self.port)))
+        self.parser = MessageParser()
+        self._send({
+            'type': 'hello',
+            'username': self.username,
+            'last_seen_id': self.last_seen_id,
+            'server_epoch': self.server_epoch
+        })
+        self.connected = True
+
+    def close(self):
+        self.connected = False
+        if self.socket:
+            try:
+                self.socket.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            self.socket.close()
+
+    def _send(self, data):
+        with self.send_lock:
+            send_json(self.socket, data)
+
+    def send_chat(self, text):
+        self._send({'type': 'message', 'message': text})
+
+    def rename(self, username):
+        self._send({'type': 'rename', 'username': username})
+        self.username = username
+
+    def feed(self, data):
+        messages = []
+        for data_type, payload in self.parser.feed(data):
+            message = decode_json(payload) if data_type == JSON_MESSAGE else None
+            if message is None:
+                continue
+
+            if message.get('server_epoch'):
+                self.server_epoch = message['server_epoch']
+            if message.get('type') == 'message':
+                self.last_seen_id = max(self.last_seen_id,
+                                        message.get('id', 0))
+            messages.append(message)
+
+        return messages
+
+
+class ChatLoadTest:
+    def __init__(self, host, port, clients=50, message_rate=1.0,
+                 duration=10.0, join_rate=100.0, rename_rate=0.0,
+                 churn_rate=0.0, seed=None):
+        self.host = host
+        self.port = port
+        self.client_count = clients
+        self.message_rate = message_rate
+        self.duration = duration
+        self.join_rate = join_rate
+        self.rename_rate = rename_rate
+        self.churn_rate = churn_rate
+        self.random = random.Random(seed)
+
+        self.clients = []
+        self.selector = selectors.DefaultSelector()
+        self.lock = threading.Lock()
+        self.running = False
+        self.reader_thread = None
+
+        self.sent = 0
+        self.expected_deliveries = 0
+        self.delivered = 0
+        self.latencies_ms = []
+        self.joins = 0
+        self.renames = 0
+        self.reconnects = 0
+        self.errors = 0
+        self.measuring = False
+
+    def _register(self, client):
+        self.selector.register(client.socket, selectors.EVENT_READ, client)
+
+    def _unregister(self, client):
+        try:
+            self.selector.unregister(client.socket)
+        except (KeyError, ValueError):
+            pass
+
+    def _read_loop(self):
+        while self.running:
+            try:
+                events = self.selector.select(timeout=0.1)
+            except (OSError, ValueError):
+                continue
+
+            for key, _ in events:
+                client = key.data
+                try:
+                    data = client.socket.recv(65536)
+                except OSError:
+                    data = b''
+
+                if not data:
+                    self._unregister(client)
+                    client.connected = False
+                    continue
+
+                received_at = time.perf_counter_ns()
+                for message in client.feed(data):
+                    self._on_message(message, received_at)
+
+    def _on_message(self, message, received_at):
+        if message.get('type') != 'message':
+            return
+
+        text = message.get('message', '')
+        if not text.startswith(PROBE_PREFIX):
+            return
+
+        try:
+            sent_at = int(text.rsplit('|', 1)[1])
+        except (IndexError, ValueError):
+            return
+
+        with self.lock:
+            if self.measuring:
+                self.delivered += 1
+                self.latencies_ms.append((received_at - sent_at) / 1e6)
+
+    def _connected_clients(self):
+        return [client for client in self.clients if client.connected]
+
+    def _join(self, client):
+        client.connect()
+        self._register(client)
+        self.joins += 1
+
+    def _ramp_up(self):
+        interval = 1.0 / self.join_rate if self.join_rate > 0 else 0.0
+        for index in range(self.client_count):
+            client = SimulatedClient(index, self.host, self.port)
+            self.clients.append(client)
+            self._join(client)
+            if interval:
+                time.sleep(interval)
+
+    def _send_probe(self, client, sequence):
+        recipients = len(self._connected_clients())
+        text = f'{PROBE_PREFIX}{client.index}|{sequence}|{time.perf_counter_ns()}'
+        try:
+            client.send_chat(text)
+        except OSError:
+            self.errors += 1
+            return
+
+        with self.lock:
+            self.sent += 1
+            self.expected_deliveries += recipients
+
+    def _churn(self, client):
+        self._unregister(client)
+        client.close()
+        try:
+            self._join(client)
+            self.reconnects += 1
+        except OSError:
+            self.errors += 1
+
+    def run(self, sampler=None):
+        self.running = True
+        self.reader_thread = threading.Thread(target=self._read_loop)
+        self.reader_thread.daemon = True
+        self.reader_thread.start()
+
+        self._ramp_up()
+        time.sleep(0.5)
+
+        if sampler:
+            sampler.start()
+
+        with self.lock:
+            self.measuring = True
+
+        started = time.perf_counter()
+        last_tick = started
+        message_credit = 0.0
+        sequence = 0
+        next_sample = started
+
+        while True:
+            now = time.perf_counter()
+            if now - started >= self.duration:
+                break
+
+            dt = now - last_tick
+            last_tick = now
+            connected = self._connected_clients()
+
+            if connected:
+                message_credit += self.message_rate * len(connected) * dt
+                while message_credit >= 1.0:
+                    message_credit -= 1.0
+                    sequence += 1
+                    self._send_probe(self.random.choice(connected), sequence)
+
+                for client in connected:
+                    if self.rename_rate and self.random.random() < self.rename_rate * dt:
+                        try:
+                            client.rename(f'load_{client.index}_{sequence}')
+                            self.renames += 1
+                        except OSError:
+                            self.errors += 1
+                    if self.churn_rate and self.random.random() < self.churn_rate * dt:
+                        self._churn(client)
+
+            if sampler and now >= next_sample:
+                sampler.sample()
+                next_sample = now + 0.5
+
+            time.sleep(0.005)
+
+        elapsed = time.perf_counter() - started
+        time.sleep(1.0)
+
+        with self.lock:
+            self.measuring = False
+
+        server_stats = sampler.result() if sampler else {'available': False}
+
+        self.running = False
+        for client in self.clients:
+            client.close()
+        if self.reader_thread:
+            self.reader_thread.join(timeout=2.0)
+
+        return self._report(elapsed, server_stats)
+
+    def _report(self, elapsed, server_stats):
+        with self.lock:
+            dropped = max(0, self.expected_deliveries - self.delivered)
+            return {
+                'clients': self.client_count,
+                'duration_s': elapsed,
+                'messages_sent': self.sent,
+                'send_rate_per_s': self.sent / elapsed if elapsed else 0.0,
+                'deliveries': self.delivered,
+                'delivery_rate_per_s': self.delivered / elapsed if elapsed else 0.0,
+                'expected_deliveries': self.expected_deliveries,
+                'dropped': dropped,
+                'drop_rate': dropped / self.expected_deliveries if self.expected_deliveries else 0.0,
+                'latency': latency_summary(self.latencies_ms),
+                'joins': self.joins,
+                'renames': self.renames,
+                'reconnects': self.reconnects,
+                'errors': self.errors,
+                'server': server_stats
+            }
+
+
+def serve(port):
+    from core.chat_server import ChatServer
+
+    server = ChatServer()
+    if not server.start_server(port):
+        sys.exit(1)
+
+    try:
+        while True:
+            time.sleep(1.0)
+    except KeyboardInterrupt:
+        server.stop_server()
+
+
+def wait_for_port(host, port, timeout=15.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with socket.create_connection((host, port), timeout=0.5):
+                return True
+        except OSError:
+            time.sleep(0.1)
+    return False
+
+
+def print_report(report):
+    latency = report['latency']
+    print(f"Клиентов: {report['clients']}, длительность: {report['duration_s']:.1f} с")
+    print(f"Отправлено: {report['messages_sent']} ({report['send_rate_per_s']:.1f}/с)")
+    print(f"Доставлено: {report['deliveries']} ({report['delivery_rate_per_s']:.1f}/с), "
+          f"потеряно: {report['dropped']} ({report['drop_rate'] * 100:.2f}%)")
+    print(f"Задержка, мс: p50={latency['p50_ms']:.2f} p99={latency['p99_ms']:.2f} "
+          f"p999={latency['p999_ms']:.2f} max={latency['max_ms']:.2f}")
+    print(f"Подключений: {report['joins']}, переименований: {report['renames']}, "
+          f"переподключений: {report['reconnects']}, ошибок: {report['errors']}")
+
+    network = report.get('network')
+    if network:
+        print(f"Сеть: профиль {network['profile']}, "
+              f"повторных передач: {network['retransmits']}")
+
+    server = report['server']
+    if server.get('available'):
+        print(f"Сервер: CPU {server['cpu_percent']:.1f}%, "
+              f"RSS {server['peak_rss_bytes'] / 1024 / 1024:.1f} МБ")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Нагрузочное тестирование чат-сервера SecureStream')
+    subparsers = parser.add_subparsers(dest='command')
+
+    serve_parser = subparsers.add_parser('serve', help='Запустить чат-сервер')
+    serve_parser.add_argument('--port', type=int, default=8081)
+
+    run_parser = subparsers.add_parser('run', help='Запустить нагрузку')
+    run_parser.add_argument('--host', default=None,
+                            help='Адрес уже запущенного сервера; без него сервер запускается локально')
+    run_parser.add_argument('--port', type=int, default=18081)
+    run_parser.add_argument('--clients', type=int, default=50)
+    run_parser.add_argument('--rate', type=float, default=1.0,
+                            help='Сообщений в секунду на клиента')
+    run_parser.add_argument('--duration', type=float, default=10.0)
+    run_parser.add_argument('--join-rate', type=float, default=100.0,
+                            help='Подключений в секунду при разгоне')
+    run_parser.add_argument('--rename-rate', type=float, default=0.0,
+                            help='Переименований в секунду на клиента')
+    run_parser.add_argument('--churn-rate', type=float, default=0.0,
+                            help='Переподключений в секунду на клиента')
+    run_parser.add_argument('--seed', type=int, default=None)
+    run_parser.add_argument('--json', dest='json_path', default=None)
+    run_parser.add_argument('--max-p99-ms', type=float, default=None)
+    run_parser.add_argument('--max-drop-rate', type=float, default=None)
+    add_impairment_arguments(run_parser)
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'serve':
+        serve(args.port)
+        return 0
+
+    if args.command != 'run':
+        parser.print_help()
+        return 2
+
+    server_process = None
+    host = args.host
+    if host is None:
+        host = '127.0.0.1'
+        server_process = subprocess.Popen(
+            [sys.executable, '-m', 'tools.chat_load_test', 'serve',
+             '--port', str(args.port)],
+            stdout=subprocess.DEVNULL)
+
+    proxy, scenario = None, None
+    try:
+        if not wait_for_port(host, args.port):
+            print(f'Чат-сервер недоступен: {host}:{args.port}')
+            return 1
+
+        client_host, client_port = host, args.port
+        proxy, scenario = start_impairment(args, args.port + 1, host, args.port,
+                                           args.seed)
+        if proxy:
+            client_host, client_port = '127.0.0.1', args.port + 1
+
+        sampler = ProcessSampler(server_process.pid) if server_process else None
+        test = ChatLoadTest(client_host, client_port, args.clients, args.rate,
+                            args.duration, args.join_rate, args.rename_rate,
+                            args.churn_rate, args.seed)
+        report = test.run(sampler)
+        if proxy:
+            report['network'] = proxy.get_stats()
+    finally:
+        stop_impairment(proxy, scenario)
+        if server_process:
+            server_process.terminate()
+            server_process.wait(timeout=5)
+
+    print_report(report)
+
+    if args.json_path:
+        with open(args.json_path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=4, ensure_ascii=False)
+
+    failed = False
+    if args.max_p99_ms is not None and report['latency']['p99_ms'] > args.max_p99_ms:
+        print(f"p99 превышает порог {args.max_p99_ms} мс")
+        failed = True
+    if args.max_drop_rate is not None and report['drop_rate'] > args.max_drop_rate:
+        print(f"Доля потерь превышает порог {args.max_drop_rate}")
+        failed = True
+
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
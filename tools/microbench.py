@@ -0,0 +1,279 @@
+import argparse
+import io
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+
+from tools.stats import latency_summary
+
+
+DEFAULT_RESOLUTIONS = '1280x720,1920x1080,2560x1440'
+DB_ROWS = 200
+
+
+def parse_resolution(value):
+    width, height = value.lower().split('x')
+    return int(width), int(height)
+
+
+def measure(fn, min_time=0.5, min_runs=5, max_runs=2000):
+    fn()
+
+    samples_ms = []
+    started = time.perf_counter()
+    while len(samples_ms) < max_runs:
+        call_start = time.perf_counter()
+        fn()
+        samples_ms.append((time.perf_counter() - call_start) * 1000)
+
+        if len(samples_ms) >= min_runs and time.perf_counter() - started >= min_time:
+            break
+
+    return samples_ms
+
+
+def screen_image(width, height):
+    from core.sources import SyntheticScreenSource
+
+    return SyntheticScreenSource(width, height, change_rate=0.1).grab()
+
+
+def encode_jpeg(img, quality=70):
+    buffer = io.BytesIO()
+    img.save(buffer, format='JPEG', quality=quality)
+    return buffer.getvalue()
+
+
+def bench_capture_convert(width, height):
+    import cv2
+    import numpy as np
+
+    img = screen_image(width, height)
+
+    def run():
+        frame = np.array(img)
+        cv2.cvtColor(frame, cv2.COLOR_RGB2BGR)
+
+    return run
+
+
+def bench_jpeg_encode(width, height):
+    img = screen_image(width, height)
+    return lambda: encode_jpeg(img)
+
+
+def bench_decode_qimage(width, height):
+    import cv2
+    import numpy as np
+    from PyQt6.QtGui import QImage
+
+    data = encode_jpeg(screen_image(width, height))
+
+    def run():
+        frame = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+        frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        h, w, ch = frame_rgb.shape
+        QImage(frame_rgb.data, w, h, ch * w, QImage.Format.Format_RGB888)
+
+    return run
+
+
+FRAME_BENCHMARKS = {
+    'capture_convert': bench_capture_convert,
+    'jpeg_encode': bench_jpeg_encode,
+    'decode_qimage': bench_decode_qimage
+}
+
+
+def chat_rows(count):
+    return [{'username': f'user_{i % 10}', 'message': f'Сообщение номер {i}',
+             'room': 'general'} for i in range(count)]
+
+
+def bench_db_insert_rows(db):
+    rows = chat_rows(DB_ROWS)
+
+    def run():
+        for row in rows:
+            db.save_chat_message(row['username'], row['message'],
+                                 room=row['room'])
+
+    return run
+
+
+def bench_db_insert_batch(db):
+    rows = chat_rows(DB_ROWS)
+    return lambda: db.save_chat_messages(rows)
+
+
+def bench_db_log_event(db):
+    return lambda: db._log_system_event('INFO', 'microbench', 'Тестовое событие')
+
+
+DB_BENCHMARKS = {
+    f'db_insert_rows_{DB_ROWS}': bench_db_insert_rows,
+    f'db_insert_batch_{DB_ROWS}': bench_db_insert_batch,
+    'db_log_event': bench_db_log_event
+}
+
+
+def collect_meta():
+    meta = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'cpu_count': os.cpu_count(),
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S')
+    }
+
+    for module in ('numpy', 'cv2', 'PIL', 'sqlite3'):
+        try:
+            imported = __import__(module)
+            meta[f'{module}_version'] = getattr(
+                imported, 'sqlite_version', getattr(imported, '__version__', None))
+        except ImportError:
+            meta[f'{module}_version'] = None
+
+    return meta
+
+
+def run_suite(resolutions, only=None, min_time=0.5):
+    results = {}
+
+    def selected(name):
+        return not only or any(pattern in name for pattern in only)
+
+    def record(name, fn):
+        try:
+            samples = measure(fn, min_time)
+            results[name] = latency_summary(samples)
+        except Exception as e:
+            results[name] = {'error': str(e)}
+        print_line(name, results[name])
+
+    for bench_name, factory in FRAME_BENCHMARKS.items():
+        for width, height in resolutions:
+            name = f'{bench_name}@{width}x{height}'
+            if not selected(name):
+                continue
+            try:
+                fn = factory(width, height)
+            except Exception as e:
+                results[name] = {'error': str(e)}
+                print_line(name, results[name])
+                continue
+            record(name, fn)
+
+    from core.database import DatabaseManager
+
+    db_dir = tempfile.mkdtemp()
+    try:
+        db = DatabaseManager(os.path.join(db_dir, 'microbench.db'))
+        for name, factory in DB_BENCHMARKS.items():
+            if selected(name):
+                record(name, factory(db))
+    finally:
+        shutil.rmtree(db_dir, ignore_errors=True)
+
+    return {'meta': collect_meta(), 'results': results}
+
+
+def print_line(name, summary):
+    if 'error' in summary:
+        print(f"{name:<34} ошибка: {summary['error']}")
+        return
+
+    print(f"{name:<34} p50={summary['p50_ms']:>9.3f} мс  "
+          f"p99={summary['p99_ms']:>9.3f} мс  n={summary['count']}")
+
+
+def compare(current, baseline, threshold):
+    regressions = []
+    missing = []
+    rows = []
+
+    for name, summary in current['results'].items():
+        reference = baseline.get('results', {}).get(name)
+        if 'p50_ms' not in summary:
+            continue
+        if not reference or not reference.get('p50_ms'):
+            missing.append(name)
+            continue
+
+        ratio = summary['p50_ms'] / reference['p50_ms']
+        rows.append((name, reference['p50_ms'], summary['p50_ms'], ratio))
+        if ratio > 1 + threshold:
+            regressions.append(name)
+
+    print(f"\n{'тест':<34} {'база p50':>10} {'сейчас p50':>11} {'изм.':>8}")
+    for name, before, after, ratio in rows:
+        mark = '  РЕГРЕССИЯ' if name in regressions else ''
+        print(f"{name:<34} {before:>10.3f} {after:>11.3f} {(ratio - 1) * 100:>+7.1f}%{mark}")
+
+    if missing:
+        print(f"\nНет в базе: {', '.join(missing)}")
+
+    return regressions, missing
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Микробенчмарки горячих путей: захват, JPEG, декодирование, БД')
+    parser.add_argument('--resolutions', default=DEFAULT_RESOLUTIONS)
+    parser.add_argument('--only', default=None,
+                        help='Запустить только тесты, имена которых содержат эти подстроки (через запятую)')
+    parser.add_argument('--min-time', type=float, default=0.5,
+                        help='Минимальное время замера одного теста, с')
+    parser.add_argument('--json', dest='json_path', default=None,
+                        help='Сохранить результаты в JSON')
+    parser.add_argument('--baseline', default=None,
+                        help='JSON с базовыми результатами для сравнения')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='Допустимое замедление p50 относительно базы (0.2 = 20%%)')
+    parser.add_argument('--save-baseline', action='store_true',
+                        help='Записать результаты в файл --baseline')
+
+    args = parser.parse_args(argv)
+    if args.save_baseline and not args.baseline:
+        parser.error('--save-baseline требует --baseline')
+
+    resolutions = [parse_resolution(v) for v in args.resolutions.split(',')]
+    only = args.only.split(',') if args.only else None
+
+    report = run_suite(resolutions, only, args.min_time)
+
+    if args.json_path:
+        with open(args.json_path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=4, ensure_ascii=False)
+
+    if not args.baseline:
+        return 0
+
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=4, ensure_ascii=False)
+        print(f'Базовые результаты сохранены: {args.baseline}')
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f'Файл базы не найден: {args.baseline} '
+              '(для записи новой базы используйте --save-baseline)')
+        return 2
+
+    with open(args.baseline, encoding='utf-8') as f:
+        baseline = json.load(f)
+
+    regressions, _ = compare(report, baseline, args.threshold)
+    if regressions:
+        print(f"\nЗамедление больше {args.threshold * 100:.0f}%: {', '.join(regressions)}")
+        return 1
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
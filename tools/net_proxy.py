@@ -0,0 +1,325 @@
+import argparse
+import json
+import queue
+import random
+import socket
+import sys
+import threading
+import time
+
+
+CHUNK_SIZE = 16384
+QUEUE_CHUNKS = 32
+
+PROFILES = {
+    'none': {},
+    'lan': {'delay_ms': 1, 'jitter_ms': 0.5},
+    'wifi': {'delay_ms': 15, 'jitter_ms': 10, 'bandwidth_kbps': 20000,
+             'loss_rate': 0.002},
+    'dsl': {'delay_ms': 30, 'jitter_ms': 5, 'bandwidth_kbps': 4000},
+    '3g': {'delay_ms': 120, 'jitter_ms': 60, 'bandwidth_kbps': 1500,
+           'loss_rate': 0.01},
+    'flaky': {'delay_ms': 50, 'jitter_ms': 30, 'bandwidth_kbps': 8000,
+              'loss_rate': 0.02, 'stall_interval_s': 5, 'stall_ms': 800}
+}
+
+PROFILE_KEYS = ('delay_ms', 'jitter_ms', 'bandwidth_kbps', 'loss_rate',
+                'rto_ms', 'stall_interval_s', 'stall_ms')
+
+
+def resolve_profile(profile):
+    if isinstance(profile, str):
+        if profile not in PROFILES:
+            raise ValueError(f'Неизвестный профиль сети: {profile}')
+        return dict(PROFILES[profile])
+    return dict(profile or {})
+
+
+def load_scenario(path):
+    with open(path, encoding='utf-8') as f:
+        steps = json.load(f)
+
+    return sorted(({'at': float(step.get('at', 0)),
+                    'profile': resolve_profile(step.get('profile'))}
+                   for step in steps), key=lambda step: step['at'])
+
+
+class _Pipe:
+    def __init__(self, proxy, source, destination, direction):
+        self.proxy = proxy
+        self.source = source
+        self.destination = destination
+        self.direction = direction
+        self.queue = queue.Queue(maxsize=QUEUE_CHUNKS)
+        self.last_release = 0.0
+        self.link_free_at = 0.0
+
+    def start(self):
+        for target in (self._read_loop, self._write_loop):
+            thread = threading.Thread(target=target)
+            thread.daemon = True
+            thread.start()
+
+    def _release_time(self, now, profile):
+        delay = profile.get('delay_ms', 0) / 1000
+        jitter = profile.get('jitter_ms', 0) / 1000
+        if jitter:
+            delay = max(0.0, delay + self.proxy.random.uniform(-jitter, jitter))
+
+        loss_rate = profile.get('loss_rate', 0)
+        if loss_rate and self.proxy.random.random() < loss_rate:
+            delay += profile.get('rto_ms', 200) / 1000
+            self.proxy.count('retransmits')
+
+        self.last_release = max(self.last_release, now + delay)
+        return self.last_release
+
+    def _read_loop(self):
+        try:
+            while self.proxy.running:
+                data = self.source.recv(CHUNK_SIZE)
+                if not data:
+                    break
+
+                now = time.perf_counter()
+                self.queue.put((self._release_time(now, self.proxy.profile), data))
+        except OSError:
+            pass
+
+        self.queue.put(None)
+
+    def _wait_until(self, deadline):
+        delay = deadline - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+
+    def _write_loop(self):
+        try:
+            while True:
+                item = self.queue.get()
+                if item is None:
+                    break
+
+                release_at, data = item
+                self._wait_until(release_at)
+                self._wait_until(self.proxy.stall_end(time.perf_counter()))
+
+                bandwidth = self.proxy.profile.get('bandwidth_kbps', 0)
+                if bandwidth:
+                    transfer = len(data) * 8 / (bandwidth * 1000)
+                    send_at = max(time.perf_counter(), self.link_free_at)
+                    self.link_free_at = send_at + transfer
+                    self._wait_until(self.link_free_at)
+
+                self.destination.sendall(data)
+                self.proxy.count(self.direction, len(data))
+
+            self.destination.shutdown(socket.SHUT_WR)
+        except OSError:
+            for sock in (self.source, self.destination):
+                try:
+                    sock.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+
+
+class ImpairmentProxy:
+    def __init__(self, listen_port, target_host, target_port, profile=None,
+                 listen_host='127.0.0.1', seed=None):
+        self.listen_host = listen_host
+        self.listen_port = listen_port
+        self.target_host = target_host
+        self.target_port = target_port
+        self.profile = resolve_profile(profile)
+        self.random = random.Random(seed)
+        self.running = False
+        self.server_socket = None
+        self.connections = []
+        self.lock = threading.Lock()
+        self.started_at = time.perf_counter()
+        self.stats = {}
+        self.reset_stats()
+
+    def reset_stats(self):
+        with self.lock:
+            self.stats = {
+                'connections': 0,
+                'upstream_bytes': 0,
+                'downstream_bytes': 0,
+                'retransmits': 0
+            }
+
+    def count(self, key, value=1):
+        with self.lock:
+            self.stats[key] += value
+
+    def get_stats(self):
+        with self.lock:
+            return dict(self.stats, profile=dict(self.profile))
+
+    def set_profile(self, profile):
+        self.profile = resolve_profile(profile)
+        self.started_at = time.perf_counter()
+
+    def stall_end(self, now):
+        interval = self.profile.get('stall_interval_s', 0)
+        duration = self.profile.get('stall_ms', 0) / 1000
+        if not interval or not duration:
+            return now
+
+        phase = (now - self.started_at) % interval
+        stall_start = interval - duration
+        if phase < stall_start:
+            return now
+        return now + (interval - phase)
+
+    def start(self):
+        self.server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.server_socket.bind((self.listen_host, self.listen_port))
+        self.server_socket.listen(128)
+        self.running = True
+
+        thread = threading.Thread(target=self._accept_loop)
+        thread.daemon = True
+        thread.start()
+        return self
+
+    def stop(self):
+        self.running = False
+        if self.server_socket:
+            try:
+                self.server_socket.close()
+            except OSError:
+                pass
+
+        with self.lock:
+            connections = list(self.connections)
+            self.connections = []
+
+        for sock in connections:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            sock.close()
+
+    def _accept_loop(self):
+        while self.running:
+            try:
+                client, _ = self.server_socket.accept()
+            except OSError:
+                break
+
+            try:
+                upstream = socket.create_connection(
+                    (self.target_host, self.target_port), timeout=5.0)
+                upstream.settimeout(None)
+            except OSError as e:
+                print(f'Прокси: не удалось подключиться к {self.target_host}:{self.target_port}: {e}')
+                client.close()
+                continue
+
+            for sock in (client, upstream):
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+            with self.lock:
+                self.connections.extend((client, upstream))
+            self.count('connections')
+
+            _Pipe(self, client, upstream, 'upstream_bytes').start()
+            _Pipe(self, upstream, client, 'downstream_bytes').start()
+
+
+class ScenarioRunner(threading.Thread):
+    def __init__(self, proxy, steps):
+        super().__init__()
+        self.daemon = True
+        self.proxy = proxy
+        self.steps = steps
+        self.stopped = threading.Event()
+
+    def run(self):
+        started = time.perf_counter()
+        for step in self.steps:
+            delay = step['at'] - (time.perf_counter() - started)
+            if delay > 0 and self.stopped.wait(delay):
+                return
+            self.proxy.set_profile(step['profile'])
+            print(f"Прокси: профиль сети на {step['at']:.1f} с: {step['profile']}")
+
+    def stop(self):
+        self.stopped.set()
+
+
+def add_impairment_arguments(parser):
+    parser.add_argument('--profile', default=None, choices=sorted(PROFILES),
+                        help='Профиль ухудшения сети для прокси')
+    parser.add_argument('--scenario', default=None,
+                        help='JSON-файл со сценарием смены профилей сети')
+
+
+def start_impairment(args, listen_port, target_host, target_port, seed=None):
+    if not args.profile and not args.scenario:
+        return None, None
+
+    proxy = ImpairmentProxy(listen_port, target_host, target_port,
+                            args.profile, seed=seed).start()
+    runner = None
+    if args.scenario:
+        runner = ScenarioRunner(proxy, load_scenario(args.scenario))
+        runner.start()
+    return proxy, runner
+
+
+def stop_impairment(proxy, runner):
+    if runner:
+        runner.stop()
+    if proxy:
+        proxy.stop()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='TCP-прокси с ухудшением сети: задержка, джиттер, полоса, потери и зависания')
+    parser.add_argument('--listen-host', default='127.0.0.1')
+    parser.add_argument('--listen-port', type=int, required=True)
+    parser.add_argument('--target', required=True, help='Адрес сервера host:port')
+    parser.add_argument('--profile', default='none', choices=sorted(PROFILES))
+    parser.add_argument('--scenario', default=None)
+    parser.add_argument('--seed', type=int, default=None)
+    for key in PROFILE_KEYS:
+        parser.add_argument('--' + key.replace('_', '-'), type=float, default=None)
+
+    args = parser.parse_args(argv)
+
+    target_host, target_port = args.target.rsplit(':', 1)
+    profile = resolve_profile(args.profile)
+    for key in PROFILE_KEYS:
+        value = getattr(args, key)
+        if value is not None:
+            profile[key] = value
+
+    proxy = ImpairmentProxy(args.listen_port, target_host, int(target_port),
+                            profile, args.listen_host, args.seed).start()
+    runner = None
+    if args.scenario:
+        runner = ScenarioRunner(proxy, load_scenario(args.scenario))
+        runner.start()
+
+    print(f'Прокси {args.listen_host}:{args.listen_port} -> {args.target}, профиль: {proxy.profile}')
+
+    try:
+        while True:
+            time.sleep(5.0)
+            print(f'Прокси: {proxy.get_stats()}')
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop_impairment(proxy, runner)
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
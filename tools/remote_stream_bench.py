@@ -0,0 +1,460 @@
+import argparse
+import io
+import itertools
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from core.frame_timing import FRAME_INFO_TYPE, unpack_frame_info
+from core.remote_input import INPUT_ACK, INPUT_MESSAGE, MOUSE_MOVE, pack_event
+from core.sources import monotonic_us, read_stamp
+from core.stream_mux import ChunkAssembler, CHUNK_TYPE
+from core.tile_codec import TileDecoder
+from core.transport import MessageReader, send_json, send_message, tune_socket
+from core.video_stream import H264Decoder
+from tools.net_proxy import add_impairment_arguments, start_impairment, stop_impairment
+from tools.stats import ProcessSampler, latency_summary
+
+
+def decode_jpeg(data):
+    try:
+        import cv2
+        import numpy as np
+
+        return cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+    except ImportError:
+        import numpy as np
+        from PIL import Image
+
+        return np.asarray(Image.open(io.BytesIO(data)).convert('RGB'))
+
+
+class StreamViewer(threading.Thread):
+    def __init__(self, host, port, viewport=None, source_width=None,
+                 codec='jpeg', input_rate=0):
+        super().__init__()
+        self.daemon = True
+        self.host = host
+        self.port = port
+        self.viewport = viewport
+        self.source_width = source_width
+        self.codec = codec
+        self.input_rate = input_rate
+        self.chunks = ChunkAssembler()
+        self.tile_decoder = TileDecoder()
+        self.video_decoder = H264Decoder(self._on_video_frame)
+        self.video_fed_at = None
+        self.running = False
+        self.measuring = False
+        self.frames = 0
+        self.bytes = 0
+        self.decode_ms = []
+        self.latency_ms = []
+        self.input_ms = []
+        self.audio_gap_ms = []
+        self.audio_at = None
+        self.frame_info = None
+        self.send_lock = threading.Lock()
+        self.error = None
+
+    def run(self):
+        self.running = True
+        try:
+            sock = tune_socket(socket.create_connection((self.host, self.port)))
+            commands = [('get_info', {}), ('set_codec', {'codec': self.codec}),
+                        ('start_stream', {})]
+            if self.viewport:
+                commands.append(('set_viewport', {'width': self.viewport[0],
+                                                  'height': self.viewport[1]}))
+            for command, data in commands:
+                send_json(sock, {'command': command, 'data': data,
+                                 'timestamp': time.time()})
+
+            if self.input_rate:
+                sender = threading.Thread(target=self._send_input, args=(sock,))
+                sender.daemon = True
+                sender.start()
+
+            reader = MessageReader(sock)
+            while self.running:
+                message = reader.read_message()
+                if message is None:
+                    break
+                data_type, payload = message
+                size = len(payload)
+                if data_type == CHUNK_TYPE:
+                    message = self.chunks.feed(payload)
+                    if message is None:
+                        continue
+                    data_type, payload = message
+                    size = len(payload)
+
+                if data_type == FRAME_INFO_TYPE:
+                    self.frame_info = unpack_frame_info(payload)
+                    self.frame_info['received_at'] = time.perf_counter()
+                    continue
+                if data_type == 1:
+                    now = time.perf_counter()
+                    if self.measuring and self.audio_at is not None:
+                        self.audio_gap_ms.append((now - self.audio_at) * 1000)
+                    self.audio_at = now
+                    continue
+                if data_type == 5:
+                    time_us, _, _ = INPUT_ACK.unpack_from(payload)
+                    if self.measuring:
+                        self.input_ms.append(
+                            ((monotonic_us() - time_us) & 0xFFFFFFFF) / 1000)
+                    continue
+                if data_type == 3:
+                    self.video_fed_at = time.perf_counter()
+                    self.video_decoder.decode(payload)
+                    if self.measuring:
+                        self.bytes += size
+                    continue
+                if data_type not in (0, 2):
+                    continue
+                if data_type == 0 and not self.measuring:
+                    continue
+
+                decode_start = time.perf_counter()
+                if data_type == 2:
+                    frame = self.tile_decoder.decode(payload)
+                else:
+                    frame = decode_jpeg(payload)
+                decode_end = time.perf_counter()
+                if frame is not None:
+                    self._ack_frame(sock, decode_start, decode_end)
+                if frame is None or not self.measuring:
+                    continue
+
+                self.bytes += size
+                self._count_frame(frame, decode_end - decode_start)
+
+            sock.close()
+        except Exception as e:
+            if self.running:
+                self.error = str(e)
+        finally:
+            self.video_decoder.reset()
+
+    def _send_input(self, sock):
+        for step in itertools.count():
+            if not self.running:
+                return
+            x = 100 + step % 400
+            try:
+                with self.send_lock:
+                    send_message(sock, INPUT_MESSAGE,
+                                 pack_event(MOUSE_MOVE, x, x // 2,
+                                            time_us=monotonic_us()))
+            except OSError:
+                return
+            time.sleep(1.0 / self.input_rate)
+
+    def _ack_frame(self, sock, decode_start, decode_end):
+        info, self.frame_info = self.frame_info, None
+        if info is None:
+            return
+
+        ack = {'command': 'frame_ack', 'data': {
+            'seq': info['seq'],
+            'captured_us': info['captured_us'],
+            'receive_us': int((decode_start - info['received_at']) * 1000000),
+            'decode_us': int((decode_end - decode_start) * 1000000),
+            'paint_us': 0,
+            'hold_us': int((time.perf_counter() - decode_start) * 1000000)
+        }}
+        with self.send_lock:
+            send_json(sock, ack)
+
+    def _on_video_frame(self, frame):
+        if self.measuring:
+            self._count_frame(frame, time.perf_counter() - self.video_fed_at)
+
+    def _count_frame(self, frame, decode_s):
+        scale = self.source_width / frame.shape[1] if self.source_width else 1
+        latency_us = (monotonic_us() - read_stamp(frame, scale)) & 0xFFFFFFFF
+        self.frames += 1
+        self.decode_ms.append(decode_s * 1000)
+        self.latency_ms.append(latency_us / 1000)
+
+
+def serve(port, width, height, quality, interval, change_rate, stats_path,
+          scroll_rate=0, refine_delay=1.0, audio=False):
+    from core.network_server import RemoteAccessServer
+    from core.sources import SyntheticScreenSource, synthetic_audio_factory
+
+    server = RemoteAccessServer()
+    server.screen_source = SyntheticScreenSource(width, height, change_rate,
+                                                 stamp=True,
+                                                 scroll_rate=scroll_rate)
+    server.input_backend = server.screen_source
+    server.jpeg_quality = quality
+    server.frame_interval = interval
+    server.refine_delay = refine_delay
+    server.audio_recorder.stream_factory = synthetic_audio_factory()
+
+    if not server.start_server(port, audio_enabled=audio, input_enabled=True):
+        sys.exit(1)
+
+    def shutdown(signum, frame):
+        server.running = False
+
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+
+    while server.running:
+        time.sleep(0.1)
+
+    stats = server.get_stream_stats()
+    server.stop_server()
+
+    if stats_path:
+        with open(stats_path, 'w', encoding='utf-8') as f:
+            json.dump(stats, f)
+
+
+def wait_for_port(host, port, timeout=20.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with socket.create_connection((host, port), timeout=0.5):
+                return True
+        except OSError:
+            time.sleep(0.1)
+    return False
+
+
+def run_case(port, width, height, quality, viewers, duration, interval,
+             change_rate, impairment=None, viewport=None, warmup=1.0,
+             codec='jpeg', scroll_rate=0, refine_delay=1.0, input_rate=0,
+             audio=False):
+    stats_fd, stats_path = tempfile.mkstemp(suffix='.json')
+    os.close(stats_fd)
+
+    server_process = subprocess.Popen(
+        [sys.executable, '-m', 'tools.remote_stream_bench', 'serve',
+         '--port', str(port), '--width', str(width), '--height', str(height),
+         '--quality', str(quality), '--interval', str(interval),
+         '--change-rate', str(change_rate), '--scroll-rate', str(scroll_rate),
+         '--refine-delay', str(refine_delay),
+         '--stats-path', stats_path] + (['--audio'] if audio else []),
+        stdout=subprocess.DEVNULL)
+
+    clients = []
+    proxy, scenario = None, None
+    try:
+        if not wait_for_port('127.0.0.1', port):
+            raise RuntimeError(f'Сервер не запустился на порту {port}')
+
+        viewer_port = port
+        if impairment is not None:
+            proxy, scenario = start_impairment(impairment, port + 1,
+                                               '127.0.0.1', port)
+            if proxy:
+                viewer_port = port + 1
+
+        clients = [StreamViewer('127.0.0.1', viewer_port, viewport, width, codec,
+                                input_rate)
+                   for _ in range(viewers)]
+        for client in clients:
+            client.start()
+        time.sleep(warmup)
+
+        sampler = ProcessSampler(server_process.pid)
+        sampler.start()
+        for client in clients:
+            client.measuring = True
+
+        started = time.perf_counter()
+        while time.perf_counter() - started < duration:
+            sampler.sample()
+            time.sleep(0.25)
+        elapsed = time.perf_counter() - started
+
+        for client in clients:
+            client.measuring = False
+        server_usage = sampler.result()
+        network = proxy.get_stats() if proxy else None
+    finally:
+        for client in clients:
+            client.running = False
+        stop_impairment(proxy, scenario)
+        server_process.send_signal(signal.SIGTERM)
+        try:
+            server_process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            server_process.kill()
+
+    server_stats = {}
+    try:
+        with open(stats_path, encoding='utf-8') as f:
+            server_stats = json.load(f)
+    except (OSError, ValueError):
+        pass
+    finally:
+        os.remove(stats_path)
+
+    frames = sum(client.frames for client in clients)
+    total_bytes = sum(client.bytes for client in clients)
+    decode_ms = [value for client in clients for value in client.decode_ms]
+    latency_ms = [value for client in clients for value in client.latency_ms]
+    input_ms = [value for client in clients for value in client.input_ms]
+    audio_gap_ms = [value for client in clients for value in client.audio_gap_ms]
+    cpu_percent = server_usage.get('cpu_percent', 0.0)
+
+    return {
+        'resolution': f'{width}x{height}',
+        'codec': codec,
+        'quality': quality,
+        'viewers': viewers,
+        'duration_s': elapsed,
+        'fps_per_viewer': frames / elapsed / viewers if elapsed else 0.0,
+        'avg_frame_bytes': total_bytes / frames if frames else 0.0,
+        'server_encode_ms': server_stats.get('avg_encode_ms', 0.0),
+        'server_capture_ms': server_stats.get('avg_capture_ms', 0.0),
+        'server_send_ms': server_stats.get('avg_send_ms', 0.0),
+        'server_encodes': server_stats.get('encodes', 0),
+        'server_rendition_frames': server_stats.get('rendition_frames', {}),
+        'server_tile_codecs': server_stats.get('tile_codecs', {}),
+        'server_copy_rects': server_stats.get('copy_rects', 0),
+        'server_refined_tiles': server_stats.get('refined_tiles', 0),
+        'server_video_keyframes': server_stats.get('video_keyframes', 0),
+        'server_cursor_updates': server_stats.get('cursor_updates', 0),
+        'decode': latency_summary(decode_ms),
+        'latency': latency_summary(latency_ms),
+        'input_latency': latency_summary(input_ms),
+        'audio_gap': latency_summary(audio_gap_ms),
+        'server_input': server_stats.get('input', {}),
+        'server_channels': server_stats.get('channels', {}),
+        'server_latency': server_stats.get('latency', {}),
+        'server_cpu_percent': cpu_percent,
+        'server_cpu_percent_per_viewer': cpu_percent / viewers,
+        'server_peak_rss_bytes': server_usage.get('peak_rss_bytes', 0),
+        'network': network,
+        'errors': [client.error for client in clients if client.error]
+    }
+
+
+def parse_resolution(value):
+    width, height = value.lower().split('x')
+    return int(width), int(height)
+
+
+def print_results(results):
+    print(f"{'разрешение':>11} {'кодек':>6} {'кач.':>4} {'зрит.':>5} {'fps':>6} {'КБ/кадр':>8} "
+          f"{'enc мс':>7} {'dec мс':>7} {'lat p50':>8} {'lat p99':>8} {'CPU/зр.%':>8}")
+    for result in results:
+        print(f"{result['resolution']:>11} {result['codec']:>6} {result['quality']:>4} {result['viewers']:>5} "
+              f"{result['fps_per_viewer']:>6.1f} {result['avg_frame_bytes'] / 1024:>8.1f} "
+              f"{result['server_encode_ms']:>7.1f} {result['decode']['p50_ms']:>7.1f} "
+              f"{result['latency']['p50_ms']:>8.1f} {result['latency']['p99_ms']:>8.1f} "
+              f"{result['server_cpu_percent_per_viewer']:>8.1f}")
+        if result['input_latency']['count']:
+            print(f"    ввод: {result['input_latency']['count']} событий, "
+                  f"p50 {result['input_latency']['p50_ms']:.1f} мс, "
+                  f"p99 {result['input_latency']['p99_ms']:.1f} мс")
+        latency = result['server_latency']
+        if latency.get('frames'):
+            print(f"    этапы, мс: захват {latency['capture_ms']:.1f}, "
+                  f"кодирование {latency['encode_ms']:.1f}, отправка {latency['send_ms']:.1f}, "
+                  f"RTT {latency['rtt_ms']:.1f}, прием {latency['receive_ms']:.1f}, "
+                  f"декодирование {latency['decode_ms']:.1f}; "
+                  f"от захвата до кадра {latency['glass_ms']:.1f}")
+        if result['audio_gap']['count']:
+            print(f"    аудио: {result['audio_gap']['count']} блоков, "
+                  f"интервал p50 {result['audio_gap']['p50_ms']:.1f} мс, "
+                  f"p99 {result['audio_gap']['p99_ms']:.1f} мс, "
+                  f"макс {result['audio_gap']['max_ms']:.1f} мс")
+        for error in result['errors']:
+            print(f"    ошибка: {error}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Сквозной бенчмарк потока удаленного рабочего стола')
+    subparsers = parser.add_subparsers(dest='command')
+
+    serve_parser = subparsers.add_parser('serve')
+    serve_parser.add_argument('--port', type=int, default=18080)
+    serve_parser.add_argument('--width', type=int, default=1280)
+    serve_parser.add_argument('--height', type=int, default=720)
+    serve_parser.add_argument('--quality', type=int, default=70)
+    serve_parser.add_argument('--interval', type=float, default=0.1)
+    serve_parser.add_argument('--change-rate', type=float, default=0.1)
+    serve_parser.add_argument('--scroll-rate', type=int, default=0)
+    serve_parser.add_argument('--refine-delay', type=float, default=1.0)
+    serve_parser.add_argument('--stats-path', default=None)
+    serve_parser.add_argument('--audio', action='store_true')
+
+    run_parser = subparsers.add_parser('run')
+    run_parser.add_argument('--port', type=int, default=18080)
+    run_parser.add_argument('--resolutions', default='1280x720,1920x1080')
+    run_parser.add_argument('--qualities', default='70')
+    run_parser.add_argument('--codecs', default='jpeg',
+                            help='Кодеки кадров через запятую: jpeg, tiles, h264')
+    run_parser.add_argument('--viewers', default='1')
+    run_parser.add_argument('--duration', type=float, default=5.0)
+    run_parser.add_argument('--interval', type=float, default=0.1,
+                            help='Пауза сервера между кадрами, с')
+    run_parser.add_argument('--change-rate', type=float, default=0.1,
+                            help='Доля площади экрана, меняющаяся каждый кадр')
+    run_parser.add_argument('--scroll-rate', type=int, default=0,
+                            help='Прокрутка документа в окне, пикселей за кадр')
+    run_parser.add_argument('--refine-delay', type=float, default=1.0,
+                            help='Пауза до уточняющего кадра без потерь, с (0 - выключить)')
+    run_parser.add_argument('--input-rate', type=float, default=0,
+                            help='Частота движений мыши от каждого зрителя, событий/с')
+    run_parser.add_argument('--audio', action='store_true',
+                            help='Передавать синтетический звук вместе с видео')
+    run_parser.add_argument('--json', dest='json_path', default=None)
+    run_parser.add_argument('--viewport', default=None,
+                            help='Размер окна зрителя WxH для выбора рендишена')
+    add_impairment_arguments(run_parser)
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'serve':
+        serve(args.port, args.width, args.height, args.quality,
+              args.interval, args.change_rate, args.stats_path,
+              args.scroll_rate, args.refine_delay, args.audio)
+        return 0
+
+    if args.command != 'run':
+        parser.print_help()
+        return 2
+
+    resolutions = [parse_resolution(v) for v in args.resolutions.split(',')]
+    qualities = [int(v) for v in args.qualities.split(',')]
+    viewer_counts = [int(v) for v in args.viewers.split(',')]
+    codecs = args.codecs.split(',')
+    viewport = parse_resolution(args.viewport) if args.viewport else None
+
+    results = []
+    for (width, height), codec, quality, viewers in itertools.product(
+            resolutions, codecs, qualities, viewer_counts):
+        results.append(run_case(args.port, width, height, quality, viewers,
+                                args.duration, args.interval,
+                                args.change_rate, args, viewport,
+                                codec=codec, scroll_rate=args.scroll_rate,
+                                refine_delay=args.refine_delay,
+                                input_rate=args.input_rate,
+                                audio=args.audio))
+
+    print_results(results)
+
+    if args.json_path:
+        with open(args.json_path, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=4, ensure_ascii=False)
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
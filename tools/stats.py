@@ -0,0 +1,90 @@
+import math
+import os
+import time
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+
+    index = min(len(sorted_values) - 1,
+                max(0, math.ceil(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def latency_summary(samples_ms):
+    values = sorted(samples_ms)
+    return {
+        'count': len(values),
+        'min_ms': values[0] if values else 0.0,
+        'p50_ms': percentile(values, 0.50),
+        'p99_ms': percentile(values, 0.99),
+        'p999_ms': percentile(values, 0.999),
+        'max_ms': values[-1] if values else 0.0,
+        'mean_ms': sum(values) / len(values) if values else 0.0
+    }
+
+
+class ProcessSampler:
+    def __init__(self, pid):
+        self.pid = pid
+        self.clock_ticks = os.sysconf('SC_CLK_TCK') if hasattr(
+            os, 'sysconf') else 100
+        self.started_at = None
+        self.start_cpu = None
+        self.peak_rss = 0
+
+        try:
+            import psutil
+            self.process = psutil.Process(pid)
+        except Exception:
+            self.process = None
+
+    def _cpu_seconds(self):
+        if self.process is not None:
+            times = self.process.cpu_times()
+            return times.user + times.system
+
+        with open(f'/proc/{self.pid}/stat') as f:
+            fields = f.read().rsplit(')', 1)[1].split()
+        return (int(fields[11]) + int(fields[12])) / self.clock_ticks
+
+    def _rss_bytes(self):
+        if self.process is not None:
+            return self.process.memory_info().rss
+
+        with open(f'/proc/{self.pid}/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) * 1024
+        return 0
+
+    def start(self):
+        try:
+            self.started_at = time.perf_counter()
+            self.start_cpu = self._cpu_seconds()
+        except Exception:
+            self.started_at = None
+
+    def sample(self):
+        try:
+            self.peak_rss = max(self.peak_rss, self._rss_bytes())
+        except Exception:
+            pass
+
+    def result(self):
+        if self.started_at is None:
+            return {'available': False}
+
+        try:
+            elapsed = time.perf_counter() - self.started_at
+            cpu = self._cpu_seconds() - self.start_cpu
+            self.sample()
+            return {
+                'available': True,
+                'cpu_seconds': cpu,
+                'cpu_percent': 100.0 * cpu / elapsed if elapsed > 0 else 0.0,
+                'peak_rss_bytes': self.peak_rss
+            }
+        except Exception:
+            return {'available': False}
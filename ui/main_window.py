@@ -11,6 +11,7 @@ from ui.tabs.screen_tab import ScreenTab
 from ui.tabs.camera_tab import CameraTab
 from ui.tabs.remote_tab import RemoteTab
 from ui.tabs.remote_client_tab import RemoteClientTab
+from ui.tabs.monitor_wall_tab import MonitorWallTab
 from ui.tabs.chat_tab import ChatTab
 from ui.tabs.settings_tab import SettingsTab
 
@@ -47,6 +48,7 @@ class MainWindow(QMainWindow):
         self.camera_tab = CameraTab(self)
         self.remote_tab = RemoteTab(self)
         self.remote_client_tab = RemoteClientTab(self)
+        self.monitor_wall_tab = MonitorWallTab(self)
         self.chat_tab = ChatTab(self)
         self.settings_tab = SettingsTab(self)
 
@@ -54,6 +56,7 @@ class MainWindow(QMainWindow):
         tabs.addTab(self.camera_tab, "📷 Веб-камера")
         tabs.addTab(self.remote_tab, "🌐 Удаленный доступ")
         tabs.addTab(self.remote_client_tab, "🖥️ Клиент доступа")
+        tabs.addTab(self.monitor_wall_tab, "🧱 Стена мониторов")
         tabs.addTab(self.chat_tab, "💬 Чат")
         tabs.addTab(self.settings_tab, "⚙️ Настройки")
 
@@ -79,6 +82,8 @@ class MainWindow(QMainWindow):
     def setup_connections(self):
         self.chat_server.message_received.connect(
             self.chat_tab.display_chat_message)
+        self.chat_server.room_message_received.connect(
+            self.chat_tab.display_room_message)
         self.chat_server.user_list_updated.connect(
             self.chat_tab.update_user_list)
         self.chat_server.connection_status_changed.connect(
@@ -86,8 +91,16 @@ class MainWindow(QMainWindow):
 
         self.chat_client.message_received.connect(
             self.chat_tab.display_chat_message)
+        self.chat_client.room_message_received.connect(
+            self.chat_tab.display_room_message)
+        self.chat_client.rooms_updated.connect(
+            self.chat_tab.update_rooms)
+        self.chat_client.history_received.connect(
+            self.chat_tab.display_chat_history)
         self.chat_client.user_list_updated.connect(
             self.chat_tab.update_user_list)
+        self.chat_client.user_event_received.connect(
+            self.chat_tab.apply_user_event)
         self.chat_client.connection_status_changed.connect(
             self.update_chat_status)
         self.chat_client.error_occurred.connect(
@@ -127,6 +140,8 @@ class MainWindow(QMainWindow):
         server_status = self.remote_server.get_server_status()
         self.server_status.setText(
             f"🌐: {'Вкл' if server_status['running'] else 'Выкл'}")
+        self.remote_tab.update_server_status()
+        self.remote_client_tab.update_latency_stats()
 
         stats = self.database.get_statistics()
         stats_text = f"Сессии: {stats['sessions']['count']} | "
@@ -187,6 +202,11 @@ class MainWindow(QMainWindow):
         if self.remote_client.connected:
             self.remote_client.disconnect_from_server()
 
+        self.monitor_wall_tab.close_all()
+
+        self.remote_server.session_recorder.wait_for_mux()
+        self.remote_client.session_recorder.wait_for_mux()
+
         self.settings_tab.save_settings()
 
         if hasattr(self, 'status_timer'):
@@ -4,6 +4,7 @@ from .remote_tab import RemoteTab
 from .chat_tab import ChatTab
 from .settings_tab import SettingsTab
 from .remote_client_tab import RemoteClientTab
+from .monitor_wall_tab import MonitorWallTab
 
 __all__ = ['ScreenTab', 'CameraTab', 'RemoteTab',
-           'ChatTab', 'SettingsTab', 'RemoteClientTab']
+           'ChatTab', 'SettingsTab', 'RemoteClientTab', 'MonitorWallTab']
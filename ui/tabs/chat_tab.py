@@ -1,15 +1,21 @@
 from PyQt6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QPushButton,
                              QGroupBox, QLabel, QSpinBox, QTextEdit, QLineEdit,
-                             QListWidget, QSplitter, QFrame, QMessageBox)
+                             QListWidget, QSplitter, QFrame, QMessageBox,
+                             QComboBox)
 from PyQt6.QtCore import Qt, pyqtSlot, QTimer
+from PyQt6.QtGui import QTextCursor
 from datetime import datetime
 
 
 class ChatTab(QWidget):
+    HISTORY_PAGE_SIZE = 50
+
     def __init__(self, parent):
         super().__init__()
         self.parent = parent
         self.last_message_id = 0
+        self.history_cursor = None
+        self.history_exhausted = False
         self.new_messages_count = 0
         self.is_server_mode = True
         self.auto_refresh_timer = QTimer()
@@ -115,8 +121,28 @@ class ChatTab(QWidget):
         self.chat_display = QTextEdit()
         self.chat_display.setReadOnly(True)
         self.chat_display.mousePressEvent = self.on_chat_clicked
+        self.chat_display.verticalScrollBar().valueChanged.connect(
+            self.on_chat_scrolled)
+        self.chat_display.verticalScrollBar().rangeChanged.connect(
+            self.on_chat_range_changed)
         chat_layout.addWidget(self.chat_display)
 
+        target_layout = QHBoxLayout()
+        target_layout.addWidget(QLabel("Кому:"))
+        self.target_combo = QComboBox()
+        self.target_combo.addItem("# general", "room:general")
+        target_layout.addWidget(self.target_combo)
+
+        self.room_input = QLineEdit()
+        self.room_input.setPlaceholderText("Название комнаты")
+        target_layout.addWidget(self.room_input)
+
+        self.join_room_btn = QPushButton("➕ Войти в комнату")
+        self.join_room_btn.clicked.connect(self.join_room)
+        target_layout.addWidget(self.join_room_btn)
+        target_layout.addStretch()
+        chat_layout.addLayout(target_layout)
+
         message_layout = QHBoxLayout()
         self.message_input = QLineEdit()
         self.message_input.setPlaceholderText("Введите сообщение...")
@@ -134,6 +160,7 @@ class ChatTab(QWidget):
 
         users_layout.addWidget(QLabel("👥 Подключенные пользователи:"))
         self.users_list = QListWidget()
+        self.users_list.itemDoubleClicked.connect(self.select_direct_target)
         users_layout.addWidget(self.users_list)
 
         splitter.addWidget(chat_frame)
@@ -193,39 +220,137 @@ class ChatTab(QWidget):
                 QMessageBox.warning(
                     self, "Ошибка", "Не удалось остановить чат-сервер!")
 
+    def format_route(self, username, room, recipient):
+        if recipient:
+            return f'<b>{username} → {recipient}:</b>'
+        if room and room != 'general':
+            return f'<i>#{room}</i> <b>{username}:</b>'
+        return f'<b>{username}:</b>'
+
+    def format_history_message(self, message):
+        timestamp = datetime.fromisoformat(
+            message['timestamp']).strftime("%H:%M:%S")
+        route = self.format_route(message['username'], message.get('room'),
+                                  message.get('recipient'))
+        msg_text = message['message']
+
+        if message.get('message_type') == 'system':
+            return f'<span style="color: #ff9800;">[{timestamp}] {route} {msg_text}</span>'
+        return f'[{timestamp}] {route} {msg_text}'
+
     def load_chat_history(self):
-        history = self.parent.database.get_chat_history(limit=50)
+        history = self.parent.database.get_chat_history(
+            limit=self.HISTORY_PAGE_SIZE)
+        self.history_exhausted = len(history) < self.HISTORY_PAGE_SIZE
+        self.history_cursor = None
+
         if history and len(history) > 0:
             self.last_message_id = history[0]['id']
+            self.history_cursor = self.parent.database.page_cursor(history[-1])
 
-        for message in history:
-            timestamp = datetime.fromisoformat(
-                message['timestamp']).strftime("%H:%M:%S")
-            username = message['username']
-            msg_text = message['message']
-
-            if message['message_type'] == 'system':
-                self.chat_display.append(
-                    f'<span style="color: #ff9800;">[{timestamp}] <b>{username}:</b> {msg_text}</span>')
-            else:
-                self.chat_display.append(
-                    f'[{timestamp}] <b>{username}:</b> {msg_text}')
+        for message in reversed(history):
+            self.chat_display.append(self.format_history_message(message))
 
         self.chat_display.verticalScrollBar().setValue(
             self.chat_display.verticalScrollBar().maximum()
         )
+        QTimer.singleShot(0, self.fill_history_view)
+
+    def load_older_history(self):
+        if self.history_exhausted or self.history_cursor is None:
+            return
+
+        page = self.parent.database.get_chat_history(
+            limit=self.HISTORY_PAGE_SIZE, before=self.history_cursor)
+        if len(page) < self.HISTORY_PAGE_SIZE:
+            self.history_exhausted = True
+        if not page:
+            return
+
+        self.history_cursor = self.parent.database.page_cursor(page[-1])
+
+        scrollbar = self.chat_display.verticalScrollBar()
+        old_maximum = scrollbar.maximum()
+
+        cursor = QTextCursor(self.chat_display.document())
+        cursor.movePosition(QTextCursor.MoveOperation.Start)
+        for message in reversed(page):
+            cursor.insertHtml(self.format_history_message(message))
+            cursor.insertBlock()
+
+        scrollbar.setValue(scrollbar.maximum() - old_maximum)
+        QTimer.singleShot(0, self.fill_history_view)
+
+    def fill_history_view(self):
+        if (self.chat_display.isVisible()
+                and self.chat_display.verticalScrollBar().maximum() == 0):
+            self.load_older_history()
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        QTimer.singleShot(0, self.fill_history_view)
+
+    def on_chat_scrolled(self, value):
+        if value == self.chat_display.verticalScrollBar().minimum():
+            self.load_older_history()
+
+    def on_chat_range_changed(self, minimum, maximum):
+        if maximum == 0:
+            QTimer.singleShot(0, self.fill_history_view)
+
+    def current_target(self):
+        kind, name = (self.target_combo.currentData()
+                      or "room:general").split(":", 1)
+        if kind == 'user':
+            return None, name
+        return name, None
+
+    def add_target(self, label, data):
+        index = self.target_combo.findData(data)
+        if index < 0:
+            self.target_combo.addItem(label, data)
+            index = self.target_combo.count() - 1
+        self.target_combo.setCurrentIndex(index)
+
+    def join_room(self):
+        room = self.room_input.text().strip()
+        if not room:
+            return
+
+        if not self.is_server_mode and self.parent.chat_client.connected:
+            self.parent.chat_client.join_room(room)
+
+        self.add_target(f"# {room}", f"room:{room}")
+        self.room_input.clear()
+
+    def select_direct_target(self, item):
+        username = item.text().split(" ", 1)[-1]
+        if username and username != self.parent.chat_client.username:
+            self.add_target(f"@ {username}", f"user:{username}")
+
+    @pyqtSlot(list)
+    def update_rooms(self, rooms):
+        for room in rooms:
+            if self.target_combo.findData(f"room:{room}") < 0:
+                self.target_combo.addItem(f"# {room}", f"room:{room}")
 
     def send_chat_message(self):
         message = self.message_input.text().strip()
         if message:
+            room, recipient = self.current_target()
+            if room == 'general':
+                room = None
+
             if self.is_server_mode and self.parent.chat_server.running:
-                self.parent.chat_server.send_message("Сервер", message)
+                self.parent.chat_server.send_message(
+                    "Сервер", message, room, recipient)
                 self.parent.database.save_chat_message(
-                    "Сервер", message, "text")
+                    "Сервер", message, "text", room=room, recipient=recipient)
             elif not self.is_server_mode and self.parent.chat_client.connected:
-                if self.parent.chat_client.send_message(message):
+                if self.parent.chat_client.send_message(message, room, recipient):
                     self.parent.database.save_chat_message(
-                        self.parent.chat_client.username, message, "text")
+                        self.parent.chat_client.username, message, "text",
+                        room=room, recipient=recipient)
                 else:
                     QMessageBox.warning(
                         self, "Ошибка", "Не удалось отправить сообщение!")
@@ -256,6 +381,40 @@ class ChatTab(QWidget):
         self.parent.database.save_chat_message(username, message,
                                                "system" if username == "Система" else "text")
 
+    @pyqtSlot(str, str, str, str)
+    def display_room_message(self, username, message, room, recipient):
+        timestamp = datetime.now().strftime("%H:%M:%S")
+        route = self.format_route(username, room, recipient)
+        self.chat_display.append(f'[{timestamp}] {route} {message}')
+
+        self.chat_display.verticalScrollBar().setValue(
+            self.chat_display.verticalScrollBar().maximum()
+        )
+
+        self.parent.database.save_chat_message(
+            username, message, "text", room=room or None,
+            recipient=recipient or None)
+
+    @pyqtSlot(list)
+    def display_chat_history(self, messages):
+        for message in messages:
+            self.chat_display.append(self.format_history_message(message))
+
+        self.chat_display.verticalScrollBar().setValue(
+            self.chat_display.verticalScrollBar().maximum()
+        )
+
+        self.parent.database.save_chat_messages([
+            {
+                'username': message['username'],
+                'message': message['message'],
+                'timestamp': datetime.fromisoformat(message['timestamp']),
+                'room': message.get('room'),
+                'recipient': message.get('recipient')
+            }
+            for message in messages
+        ])
+
     @pyqtSlot(list)
     def update_user_list(self, users):
         self.users_list.clear()
@@ -272,6 +431,25 @@ class ChatTab(QWidget):
             total_users += 1
         self.clients_label.setText(str(total_users))
 
+    @pyqtSlot(str, str, str)
+    def apply_user_event(self, event, username, old_username):
+        if event == 'join':
+            if username != "Сервер" and not self.users_list.findItems(
+                    f"👤 {username}", Qt.MatchFlag.MatchExactly):
+                self.users_list.addItem(f"👤 {username}")
+        elif event in ('leave', 'rename'):
+            target = f"👤 {old_username if event == 'rename' else username}"
+            matches = self.users_list.findItems(
+                target, Qt.MatchFlag.MatchExactly)
+            if matches:
+                if event == 'rename':
+                    matches[0].setText(f"👤 {username}")
+                else:
+                    self.users_list.takeItem(self.users_list.row(matches[0]))
+
+        self.clients_label.setText(
+            str(len(self.parent.chat_client.users)))
+
     def check_new_messages(self):
         try:
             new_messages = self.parent.database.get_chat_messages_after_id(
@@ -281,18 +459,8 @@ class ChatTab(QWidget):
                 self.update_new_messages_indicator()
 
                 for message in new_messages:
-                    timestamp = datetime.fromisoformat(
-                        message['timestamp']).strftime("%H:%M:%S")
-                    username = message['username']
-                    msg_text = message['message']
-
-                    if message['message_type'] == 'system':
-                        self.chat_display.append(
-                            f'<span style="color: #ff9800;">[{timestamp}] <b>{username}:</b> {msg_text}</span>')
-                    else:
-                        self.chat_display.append(
-                            f'[{timestamp}] <b>{username}:</b> {msg_text}')
-
+                    self.chat_display.append(
+                        self.format_history_message(message))
                     self.last_message_id = message['id']
 
                 self.chat_display.verticalScrollBar().setValue(
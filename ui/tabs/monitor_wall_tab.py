@@ -0,0 +1,293 @@
+from PyQt6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QPushButton,
+                             QGroupBox, QLabel, QSpinBox, QLineEdit, QSplitter,
+                             QFrame, QMessageBox, QScrollArea, QGridLayout)
+from PyQt6.QtCore import Qt, QTimer, pyqtSignal, pyqtSlot
+from PyQt6.QtGui import QPixmap
+
+from core import RemoteClient, DecodePool
+
+
+class MonitorTile(QFrame):
+    clicked = pyqtSignal(object)
+    frame_displayed = pyqtSignal(object, QPixmap)
+
+    def __init__(self, host, port, decode_pool, parent=None):
+        super().__init__(parent)
+        self.host = host
+        self.port = port
+        self.focused = False
+
+        self.client = RemoteClient()
+        self.client.decode_pool = decode_pool
+        self.client.tile_cache_mb = 16
+        self.client.cursor_overlay = False
+        self.client.screen_frame_received.connect(self.display_frame)
+        self.client.connection_status_changed.connect(self.update_status)
+        self.client.error_occurred.connect(self.show_error)
+
+        self.init_ui()
+        self.set_focused(False)
+
+    def init_ui(self):
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(4, 4, 4, 4)
+
+        header_layout = QHBoxLayout()
+        self.title_label = QLabel(f"{self.host}:{self.port}")
+        self.status_label = QLabel("❌")
+        header_layout.addWidget(self.title_label)
+        header_layout.addStretch()
+        header_layout.addWidget(self.status_label)
+
+        self.image_label = QLabel("Нет сигнала")
+        self.image_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        self.image_label.setMinimumSize(240, 135)
+        self.image_label.setScaledContents(True)
+        self.image_label.setStyleSheet(
+            "background-color: #000000; color: #ffffff;")
+
+        layout.addLayout(header_layout)
+        layout.addWidget(self.image_label)
+
+    def connect_to_server(self, fps):
+        if not self.client.connect_to_server(self.host, self.port):
+            return False
+
+        self.client.start_screen_stream(fps)
+        return True
+
+    def set_stream(self, fps, width, height):
+        self.client.set_viewport(width, height)
+        if self.client.connected:
+            self.client.start_screen_stream(fps)
+
+    def thumbnail_size(self):
+        ratio = self.image_label.devicePixelRatioF()
+        return (int(self.image_label.width() * ratio),
+                int(self.image_label.height() * ratio))
+
+    def set_focused(self, focused):
+        self.focused = focused
+        color = "#2e86de" if focused else "#333333"
+        self.setStyleSheet(
+            f"MonitorTile {{ border: 2px solid {color}; border-radius: 6px; }}")
+
+    def disconnect_from_server(self):
+        if self.client.connected:
+            self.client.disconnect_from_server()
+
+    @pyqtSlot(QPixmap)
+    def display_frame(self, pixmap):
+        self.image_label.setPixmap(pixmap)
+        self.client.frame_painted()
+        self.frame_displayed.emit(self, pixmap)
+
+    def update_status(self, connected):
+        self.status_label.setText("✅" if connected else "❌")
+
+    def show_error(self, error_message):
+        self.status_label.setText("⚠️")
+        self.status_label.setToolTip(error_message)
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        if not self.focused:
+            self.client.set_viewport(*self.thumbnail_size())
+
+    def mousePressEvent(self, event):
+        self.clicked.emit(self)
+        super().mousePressEvent(event)
+
+
+class MonitorWallTab(QWidget):
+    def __init__(self, parent):
+        super().__init__()
+        self.parent = parent
+        self.tiles = []
+        self.focused_tile = None
+        self.decode_pool = DecodePool()
+        self.init_ui()
+
+        self.stats_timer = QTimer()
+        self.stats_timer.timeout.connect(self.update_stats)
+        self.stats_timer.start(1000)
+
+    def init_ui(self):
+        layout = QVBoxLayout()
+
+        control_group = QGroupBox("Стена мониторов")
+        control_layout = QHBoxLayout()
+
+        control_layout.addWidget(QLabel("Сервер:"))
+        self.address_input = QLineEdit()
+        self.address_input.setPlaceholderText("192.168.1.100:8080")
+        self.address_input.returnPressed.connect(self.add_session)
+        control_layout.addWidget(self.address_input)
+
+        add_btn = QPushButton("➕ Добавить")
+        add_btn.clicked.connect(self.add_session)
+        control_layout.addWidget(add_btn)
+
+        remove_btn = QPushButton("➖ Убрать выбранный")
+        remove_btn.clicked.connect(self.remove_focused_session)
+        control_layout.addWidget(remove_btn)
+
+        control_layout.addWidget(QLabel("Колонок:"))
+        self.columns_spin = QSpinBox()
+        self.columns_spin.setRange(1, 8)
+        self.columns_spin.setValue(4)
+        self.columns_spin.valueChanged.connect(self.relayout_tiles)
+        control_layout.addWidget(self.columns_spin)
+
+        control_layout.addWidget(QLabel("FPS фона:"))
+        self.background_fps_spin = QSpinBox()
+        self.background_fps_spin.setRange(1, 10)
+        self.background_fps_spin.setValue(2)
+        self.background_fps_spin.valueChanged.connect(self.apply_stream_settings)
+        control_layout.addWidget(self.background_fps_spin)
+
+        control_layout.addWidget(QLabel("FPS выбранного:"))
+        self.focus_fps_spin = QSpinBox()
+        self.focus_fps_spin.setRange(1, 30)
+        self.focus_fps_spin.setValue(15)
+        self.focus_fps_spin.valueChanged.connect(self.apply_stream_settings)
+        control_layout.addWidget(self.focus_fps_spin)
+
+        control_layout.addStretch()
+        control_group.setLayout(control_layout)
+
+        splitter = QSplitter(Qt.Orientation.Horizontal)
+
+        self.grid_widget = QWidget()
+        self.grid_layout = QGridLayout(self.grid_widget)
+        self.grid_layout.setSpacing(6)
+
+        scroll_area = QScrollArea()
+        scroll_area.setWidgetResizable(True)
+        scroll_area.setWidget(self.grid_widget)
+
+        focus_frame = QFrame()
+        focus_layout = QVBoxLayout(focus_frame)
+        self.focus_title_label = QLabel("Выберите монитор")
+        self.focus_label = QLabel()
+        self.focus_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        self.focus_label.setMinimumSize(320, 180)
+        self.focus_label.setScaledContents(True)
+        self.focus_label.setStyleSheet("background-color: #000000;")
+        focus_layout.addWidget(self.focus_title_label)
+        focus_layout.addWidget(self.focus_label, 1)
+
+        splitter.addWidget(scroll_area)
+        splitter.addWidget(focus_frame)
+        splitter.setSizes([700, 500])
+
+        self.stats_label = QLabel("Сеансов: 0")
+
+        layout.addWidget(control_group)
+        layout.addWidget(splitter, 1)
+        layout.addWidget(self.stats_label)
+        self.setLayout(layout)
+
+    def add_session(self):
+        address = self.address_input.text().strip()
+        host, _, port = address.rpartition(':')
+        if not host:
+            host, port = address, '8080'
+
+        try:
+            port = int(port)
+        except ValueError:
+            QMessageBox.warning(self, "Ошибка", "Неверный адрес сервера!")
+            return
+
+        if not host or not 1000 <= port <= 65535:
+            QMessageBox.warning(self, "Ошибка", "Неверный адрес сервера!")
+            return
+
+        tile = MonitorTile(host, port, self.decode_pool)
+        tile.clicked.connect(self.focus_tile)
+        tile.frame_displayed.connect(self.on_tile_frame)
+
+        if not tile.connect_to_server(self.background_fps_spin.value()):
+            tile.deleteLater()
+            QMessageBox.warning(
+                self, "Ошибка", f"Не удалось подключиться к {host}:{port}!")
+            return
+
+        self.tiles.append(tile)
+        self.relayout_tiles()
+        self.address_input.clear()
+
+    def remove_focused_session(self):
+        tile = self.focused_tile
+        if tile is None:
+            return
+
+        self.focused_tile = None
+        self.focus_label.clear()
+        self.focus_title_label.setText("Выберите монитор")
+
+        tile.disconnect_from_server()
+        self.tiles.remove(tile)
+        self.grid_layout.removeWidget(tile)
+        tile.deleteLater()
+        self.relayout_tiles()
+
+    def relayout_tiles(self):
+        for tile in self.tiles:
+            self.grid_layout.removeWidget(tile)
+
+        columns = self.columns_spin.value()
+        for index, tile in enumerate(self.tiles):
+            self.grid_layout.addWidget(tile, index // columns, index % columns)
+
+    def focus_tile(self, tile):
+        previous = self.focused_tile
+        self.focused_tile = tile
+
+        if previous is not None and previous is not tile:
+            previous.set_focused(False)
+            previous.set_stream(self.background_fps_spin.value(),
+                                *previous.thumbnail_size())
+
+        tile.set_focused(True)
+        self.focus_title_label.setText(f"🖥️ {tile.host}:{tile.port}")
+        self.apply_stream_settings()
+
+    def focus_viewport(self):
+        ratio = self.focus_label.devicePixelRatioF()
+        return (int(self.focus_label.width() * ratio),
+                int(self.focus_label.height() * ratio))
+
+    def apply_stream_settings(self):
+        for tile in self.tiles:
+            if tile is self.focused_tile:
+                tile.set_stream(self.focus_fps_spin.value(),
+                                *self.focus_viewport())
+            else:
+                tile.set_stream(self.background_fps_spin.value(),
+                                *tile.thumbnail_size())
+
+    def on_tile_frame(self, tile, pixmap):
+        if tile is self.focused_tile:
+            self.focus_label.setPixmap(pixmap)
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        if self.focused_tile is not None:
+            self.focused_tile.client.set_viewport(*self.focus_viewport())
+
+    def update_stats(self):
+        stats = self.decode_pool.get_stats()
+        connected = sum(1 for tile in self.tiles if tile.client.connected)
+        self.stats_label.setText(
+            f"Сеансов: {connected}/{len(self.tiles)} | "
+            f"Потоков декодирования: {stats['workers']} | "
+            f"Декодировано: {stats['decoded']} | "
+            f"Пропущено устаревших: {stats['dropped']}")
+
+    def close_all(self):
+        self.stats_timer.stop()
+        for tile in self.tiles:
+            tile.disconnect_from_server()
+        self.decode_pool.shutdown()
@@ -1,7 +1,7 @@
 from PyQt6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QPushButton,
                              QGroupBox, QLabel, QSpinBox, QLineEdit, QSplitter,
                              QFrame, QMessageBox, QScrollArea, QComboBox)
-from PyQt6.QtCore import Qt, pyqtSlot
+from PyQt6.QtCore import Qt, QEvent, pyqtSlot
 from PyQt6.QtGui import QPixmap, QMouseEvent
 import threading
 from ..widgets.video_player import VideoPlayer
@@ -65,6 +65,23 @@ class RemoteClientTab(QWidget):
         self.fps_spin.setEnabled(False)
         status_layout.addWidget(self.fps_spin)
 
+        status_layout.addWidget(QLabel("Кодек:"))
+        self.codec_combo = QComboBox()
+        self.codec_combo.addItem("Плитки", 'tiles')
+        self.codec_combo.addItem("JPEG", 'jpeg')
+        self.codec_combo.addItem("H.264", 'h264')
+        self.codec_combo.setCurrentIndex(
+            max(0, self.codec_combo.findData(self.parent.remote_client.codec)))
+        self.codec_combo.currentIndexChanged.connect(self.on_codec_changed)
+        status_layout.addWidget(self.codec_combo)
+
+        self.record_session_btn = QPushButton("⏺️ Записать сеанс")
+        self.record_session_btn.setToolTip(
+            "Сохранять принятые кадры и звук без перекодирования")
+        self.record_session_btn.setEnabled(False)
+        self.record_session_btn.clicked.connect(self.toggle_session_recording)
+        status_layout.addWidget(self.record_session_btn)
+
         status_layout.addStretch()
 
         control_layout.addLayout(status_layout)
@@ -78,12 +95,21 @@ class RemoteClientTab(QWidget):
         screen_layout.addWidget(QLabel("🖥️ Экран сервера:"))
 
         self.video_player = VideoPlayer(self)
+        self.video_player.video_label.setMouseTracking(True)
+        self.video_player.video_label.setFocusPolicy(Qt.FocusPolicy.ClickFocus)
+        self.video_player.video_label.installEventFilter(self)
         self.video_player.fullscreen_requested.connect(self.toggle_fullscreen)
 
         self.video_player.volume_changed.connect(self.on_volume_changed)
+        self.video_player.viewport_changed.connect(
+            self.parent.remote_client.set_viewport)
 
         self.parent.remote_client.audio_data_received.connect(
             self.on_audio_received)
+        self.parent.remote_client.cursor_changed.connect(
+            self.video_player.set_cursor)
+        self.parent.remote_client.session_recording_saved.connect(
+            self.on_session_recording_saved)
 
         screen_layout.addWidget(self.video_player)
 
@@ -131,10 +157,13 @@ class RemoteClientTab(QWidget):
         self.fps_counter_label = QLabel("FPS: 0")
         self.resolution_label = QLabel("Разрешение: -")
         self.connection_time_label = QLabel("Время подключения: -")
+        self.latency_label = QLabel("Задержка: -")
+        self.latency_label.setWordWrap(True)
 
         stats_layout.addWidget(self.fps_counter_label)
         stats_layout.addWidget(self.resolution_label)
         stats_layout.addWidget(self.connection_time_label)
+        stats_layout.addWidget(self.latency_label)
 
         stats_group.setLayout(stats_layout)
         info_layout.addWidget(stats_group)
@@ -223,6 +252,7 @@ class RemoteClientTab(QWidget):
                     self, "Ошибка", "Не удалось подключиться к серверу!")
         else:
             self._close_audio_stream()
+            self.stop_session_recording()
 
             if self.parent.remote_client.disconnect_from_server():
                 self.connect_btn.setText("🔗 Подключиться")
@@ -247,9 +277,23 @@ class RemoteClientTab(QWidget):
         if hasattr(self, 'video_player') and self.video_player:
             try:
                 self.video_player.display_frame(pixmap)
+                self.parent.remote_client.frame_painted()
             except Exception as e:
                 print(f"Ошибка отображения кадра: {e}")
 
+    def update_latency_stats(self):
+        stats = self.parent.remote_client.get_latency_stats()
+        if not self.parent.remote_client.connected or not stats['frames']:
+            self.latency_label.setText("Задержка: -")
+            return
+
+        self.latency_label.setText(
+            f"Задержка: {stats['glass_ms']:.0f} мс (RTT {stats['rtt_ms']:.0f} мс)<br>"
+            f"захват {stats['capture_ms']:.1f} → кодирование {stats['encode_ms']:.1f} → "
+            f"отправка {stats['send_ms']:.1f} → сеть {stats['network_ms']:.1f} → "
+            f"прием {stats['receive_ms']:.1f} → декодирование {stats['decode_ms']:.1f} → "
+            f"отрисовка {stats['paint_ms']:.1f} мс")
+
     @pyqtSlot(dict)
     def display_server_info(self, info):
         if hasattr(self, 'server_info_label') and self.server_info_label:
@@ -313,6 +357,7 @@ class RemoteClientTab(QWidget):
 
     def disconnect_from_server(self):
         self._close_audio_stream()
+        self.stop_session_recording()
 
         if self.parent.remote_client.disconnect_from_server():
             self.connect_btn_simple.setText("🔗 Подключиться")
@@ -431,6 +476,9 @@ class RemoteClientTab(QWidget):
         if hasattr(self, 'video_player') and self.video_player:
             self.video_player.toggle_play_pause()
 
+    def on_codec_changed(self, index):
+        self.parent.remote_client.set_codec(self.codec_combo.itemData(index))
+
     def on_volume_changed(self, volume):
         print(f"Громкость изменена на: {volume}%")
 
@@ -486,8 +534,40 @@ class RemoteClientTab(QWidget):
         except Exception as e:
             print(f"Ошибка закрытия аудио потока: {e}")
 
+    def toggle_session_recording(self):
+        if self.parent.remote_client.session_recorder.recording:
+            self.stop_session_recording()
+            return
+
+        save_path = self.parent.database.get_setting(
+            'paths', 'remote_client', 'recordings/remote_client') or 'recordings/remote_client'
+
+        if self.parent.remote_client.start_session_recording(save_path):
+            self.record_session_btn.setText("⏹️ Остановить запись")
+        else:
+            QMessageBox.warning(
+                self, "Ошибка", "Не удалось начать запись сеанса!")
+
+    def stop_session_recording(self):
+        self.parent.remote_client.stop_session_recording()
+        self.record_session_btn.setText("⏺️ Записать сеанс")
+
+    def on_session_recording_saved(self, result):
+        output = result['output_file'] or result['video_path']
+        QMessageBox.information(
+            self, "Запись сеанса",
+            f"Запись сохранена: {output}\nКадров: {result['frames']}")
+
     def update_connection_status(self, connected):
         try:
+            if hasattr(self, 'record_session_btn') and self.record_session_btn:
+                try:
+                    self.record_session_btn.setEnabled(connected)
+                    if not connected:
+                        self.record_session_btn.setText("⏺️ Записать сеанс")
+                except RuntimeError:
+                    pass
+
             if hasattr(self, 'video_player') and self.video_player:
                 try:
                     self.video_player.set_connection_status(connected)
@@ -510,28 +590,53 @@ class RemoteClientTab(QWidget):
             if "deleted" not in str(e).lower():
                 print(f"Ошибка обновления статуса подключения: {e}")
 
-    def mousePressEvent(self, event):
-        if (hasattr(self, 'video_player') and self.video_player and
-            hasattr(self.video_player, 'video_label') and
-            self.parent.remote_client.connected and
-            self.video_player.video_label.pixmap() and
-                event.button() == Qt.MouseButton.LeftButton):
-
-            video_label = self.video_player.video_label
-            screen_pos = video_label.mapFromGlobal(
-                event.globalPosition().toPoint())
-
-            if video_label.pixmap():
-                pixmap_size = video_label.pixmap().size()
-                label_size = video_label.size()
-
-                if label_size.width() > 0 and label_size.height() > 0:
-                    scale_x = pixmap_size.width() / label_size.width()
-                    scale_y = pixmap_size.height() / label_size.height()
-
-                    x = int(screen_pos.x() * scale_x)
-                    y = int(screen_pos.y() * scale_y)
-
-                    self.parent.remote_client.send_mouse_click(x, y, "left")
-
-        super().mousePressEvent(event)
+    def _remote_position(self, pos):
+        video_label = self.video_player.video_label
+        frame_size = self.parent.remote_client.frame_size
+        if frame_size:
+            frame_width, frame_height = frame_size
+        else:
+            frame_width = video_label.pixmap().width()
+            frame_height = video_label.pixmap().height()
+        label_size = video_label.size()
+
+        if label_size.width() <= 0 or label_size.height() <= 0:
+            return None
+
+        scale_x = frame_width / label_size.width()
+        scale_y = frame_height / label_size.height()
+        return int(pos.x() * scale_x), int(pos.y() * scale_y)
+
+    def eventFilter(self, obj, event):
+        client = self.parent.remote_client
+        if (obj is not self.video_player.video_label or not client.connected
+                or obj.pixmap() is None or obj.pixmap().isNull()):
+            return super().eventFilter(obj, event)
+
+        event_type = event.type()
+        buttons = {Qt.MouseButton.LeftButton: "left",
+                   Qt.MouseButton.RightButton: "right",
+                   Qt.MouseButton.MiddleButton: "middle"}
+
+        if event_type in (QEvent.Type.MouseMove, QEvent.Type.MouseButtonPress,
+                          QEvent.Type.MouseButtonRelease, QEvent.Type.Wheel):
+            position = self._remote_position(event.position())
+            if position is None:
+                return False
+
+            if event_type == QEvent.Type.MouseMove:
+                client.send_mouse_move(*position)
+            elif event_type == QEvent.Type.Wheel:
+                client.send_mouse_wheel(*position, event.angleDelta().y())
+            elif event.button() in buttons:
+                client.send_mouse_button(
+                    *position, buttons[event.button()],
+                    event_type == QEvent.Type.MouseButtonPress)
+            return False
+
+        if event_type in (QEvent.Type.KeyPress, QEvent.Type.KeyRelease):
+            if not event.isAutoRepeat() or event_type == QEvent.Type.KeyPress:
+                client.send_key(event.key(), event_type == QEvent.Type.KeyPress)
+            return True
+
+        return super().eventFilter(obj, event)
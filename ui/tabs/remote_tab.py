@@ -1,13 +1,16 @@
 from PyQt6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QPushButton,
                              QGroupBox, QLabel, QSpinBox, QTextEdit, QMessageBox,
                              QFrame, QSplitter, QCheckBox, QComboBox)
-from PyQt6.QtCore import Qt
+from PyQt6.QtCore import Qt, pyqtSignal
 
 
 class RemoteTab(QWidget):
+    session_recording_saved = pyqtSignal(dict)
+
     def __init__(self, parent):
         super().__init__()
         self.parent = parent
+        self.session_recording_saved.connect(self.on_session_recording_saved)
         self.init_ui()
 
     def init_ui(self):
@@ -40,6 +43,12 @@ class RemoteTab(QWidget):
         status_layout.addWidget(self.clients_label)
         status_layout.addStretch()
 
+        latency_layout = QHBoxLayout()
+        latency_layout.addWidget(QLabel("Задержка клиентов:"))
+        self.latency_label = QLabel("-")
+        self.latency_label.setWordWrap(True)
+        latency_layout.addWidget(self.latency_label, 1)
+
         port_layout = QHBoxLayout()
         port_layout.addWidget(QLabel("Порт сервера:"))
         self.port_spin = QSpinBox()
@@ -68,11 +77,29 @@ class RemoteTab(QWidget):
         audio_layout.addWidget(self.audio_checkbox)
         audio_layout.addStretch()
 
+        input_layout = QHBoxLayout()
+        self.input_checkbox = QCheckBox(
+            "Разрешить удаленное управление мышью и клавиатурой")
+        self.input_checkbox.stateChanged.connect(self.on_input_toggled)
+        input_layout.addWidget(self.input_checkbox)
+        input_layout.addStretch()
+
+        record_layout = QHBoxLayout()
+        self.record_session_checkbox = QCheckBox(
+            "Записывать сеанс (кадры потока без перекодирования)")
+        self.record_session_checkbox.stateChanged.connect(
+            self.on_record_session_toggled)
+        record_layout.addWidget(self.record_session_checkbox)
+        record_layout.addStretch()
+
         remote_layout.addLayout(server_control_layout)
         remote_layout.addLayout(status_layout)
+        remote_layout.addLayout(latency_layout)
         remote_layout.addLayout(port_layout)
         remote_layout.addLayout(audio_layout)
         remote_layout.addLayout(audio_device_layout)
+        remote_layout.addLayout(input_layout)
+        remote_layout.addLayout(record_layout)
         remote_group.setLayout(remote_layout)
 
         top_layout.addWidget(remote_group)
@@ -103,6 +130,9 @@ class RemoteTab(QWidget):
     def load_settings(self):
         port = self.parent.database.get_setting('remote', 'port', '8080')
         self.port_spin.setValue(int(port))
+        input_enabled = self.parent.database.get_setting(
+            'remote', 'input_enabled', 'false')
+        self.input_checkbox.setChecked(input_enabled == 'true')
 
     def toggle_remote_server(self):
         if not self.parent.remote_server.running:
@@ -113,14 +143,18 @@ class RemoteTab(QWidget):
             if audio_enabled and self.audio_device_combo.currentIndex() >= 0:
                 audio_device = self.audio_device_combo.currentData()
 
-            if self.parent.remote_server.start_server(port, audio_enabled, audio_device):
+            input_enabled = self.input_checkbox.isChecked()
+
+            if self.parent.remote_server.start_server(port, audio_enabled, audio_device,
+                                                      input_enabled):
                 self.remote_btn.setText("⏹️ Остановить сервер")
                 self.status_label.setText("✅ Активно")
                 self.status_label.setProperty("class", "status status-active")
 
                 audio_text = " с аудио" if audio_enabled else ""
+                input_text = ", управление разрешено" if input_enabled else ""
                 self.log_text.append(
-                    f"[{self.get_timestamp()}] 🌐 Сервер запущен на порту {port}{audio_text}")
+                    f"[{self.get_timestamp()}] 🌐 Сервер запущен на порту {port}{audio_text}{input_text}")
 
                 self.parent.database.set_setting('remote', 'port', str(port))
                 self.parent.database.set_setting(
@@ -128,10 +162,14 @@ class RemoteTab(QWidget):
                 self.parent.database.set_setting(
                     'remote', 'audio_device', str(audio_device))
 
+                if self.record_session_checkbox.isChecked():
+                    self.start_session_recording()
+
             else:
                 QMessageBox.warning(
                     self, "Ошибка", "Не удалось запустить сервер! Возможно, порт занят.")
         else:
+            self.stop_session_recording()
             if self.parent.remote_server.stop_server():
                 self.remote_btn.setText("🚀 Запустить сервер")
                 self.status_label.setText("❌ Неактивно")
@@ -153,9 +191,63 @@ class RemoteTab(QWidget):
             status = self.parent.remote_server.get_server_status()
             self.clients_label.setText(str(status['clients_connected']))
 
+            latency = self.parent.remote_server.get_stream_stats()['latency']
+            if latency['frames']:
+                self.latency_label.setText(
+                    f"{latency['glass_ms']:.0f} мс (макс. {latency['max_glass_ms']:.0f}, "
+                    f"RTT {latency['rtt_ms']:.0f}): захват {latency['capture_ms']:.1f}, "
+                    f"кодирование {latency['encode_ms']:.1f}, отправка {latency['send_ms']:.1f}, "
+                    f"сеть {latency['network_ms']:.1f}, прием {latency['receive_ms']:.1f}, "
+                    f"декодирование {latency['decode_ms']:.1f}, отрисовка {latency['paint_ms']:.1f} мс")
+        else:
+            self.latency_label.setText("-")
+
     def on_audio_toggled(self, state):
         pass
 
+    def on_input_toggled(self, state):
+        enabled = self.input_checkbox.isChecked()
+        self.parent.database.set_setting(
+            'remote', 'input_enabled', 'true' if enabled else 'false')
+
+        if not self.parent.remote_server.running:
+            return
+
+        self.parent.remote_server.set_input_enabled(enabled)
+        status = "разрешено" if enabled else "запрещено"
+        self.log_text.append(
+            f"[{self.get_timestamp()}] 🖱️ Удаленное управление {status}")
+
+    def on_record_session_toggled(self, state):
+        if not self.parent.remote_server.running:
+            return
+
+        if self.record_session_checkbox.isChecked():
+            self.start_session_recording()
+        else:
+            self.stop_session_recording()
+
+    def start_session_recording(self):
+        save_path = self.parent.database.get_setting(
+            'paths', 'remote', 'recordings/remote') or 'recordings/remote'
+
+        if self.parent.remote_server.start_session_recording(save_path):
+            self.log_text.append(
+                f"[{self.get_timestamp()}] ⏺️ Запись сеанса начата: {save_path}")
+        else:
+            self.log_text.append(
+                f"[{self.get_timestamp()}] ❌ Не удалось начать запись сеанса")
+
+    def stop_session_recording(self):
+        self.parent.remote_server.stop_session_recording(
+            self.session_recording_saved.emit)
+
+    def on_session_recording_saved(self, result):
+        output = result['output_file'] or result['video_path']
+        self.log_text.append(
+            f"[{self.get_timestamp()}] ⏹️ Запись сеанса сохранена: {output} "
+            f"({result['frames']} кадров)")
+
     def load_audio_devices(self):
         try:
             self.audio_device_combo.clear()
@@ -1,13 +1,50 @@
 import sys
 from PyQt6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QPushButton,
                              QLabel, QSlider, QFrame)
-from PyQt6.QtCore import Qt, pyqtSignal, QEvent
+from PyQt6.QtCore import Qt, pyqtSignal, QEvent, QRect
+from PyQt6.QtGui import QPainter
+
+
+class ScreenLabel(QLabel):
+    def __init__(self, *args):
+        super().__init__(*args)
+        self.remote_cursor = None
+
+    def set_remote_cursor(self, cursor):
+        old_rect = self._cursor_rect()
+        self.remote_cursor = cursor
+        for rect in (old_rect, self._cursor_rect()):
+            if rect is not None:
+                self.update(rect)
+
+    def _cursor_rect(self):
+        cursor = self.remote_cursor
+        pixmap = self.pixmap()
+        if not cursor or pixmap is None or pixmap.isNull():
+            return None
+
+        frame_width, frame_height = cursor['frame_size']
+        hot_x, hot_y = cursor['hotspot']
+        x = int(cursor['x'] * self.width() / frame_width) - hot_x
+        y = int(cursor['y'] * self.height() / frame_height) - hot_y
+        return QRect(x, y, cursor['sprite'].width(), cursor['sprite'].height())
+
+    def paintEvent(self, event):
+        super().paintEvent(event)
+        rect = self._cursor_rect()
+        if rect is None or not rect.intersects(event.rect()):
+            return
+
+        painter = QPainter(self)
+        painter.drawImage(rect.topLeft(), self.remote_cursor['sprite'])
+        painter.end()
 
 
 class VideoPlayer(QWidget):
     fullscreen_requested = pyqtSignal()
     play_pause_requested = pyqtSignal()
     volume_changed = pyqtSignal(int)
+    viewport_changed = pyqtSignal(int, int)
 
     def __init__(self, parent=None):
         super().__init__(parent)
@@ -20,6 +57,7 @@ class VideoPlayer(QWidget):
         self.volume = 50
 
         self.current_frame = None
+        self.remote_cursor = None
 
         self.fullscreen_window = None
         self.fullscreen_label = None
@@ -42,7 +80,7 @@ class VideoPlayer(QWidget):
             }
         """)
 
-        self.video_label = QLabel("Ожидание подключения...")
+        self.video_label = ScreenLabel("Ожидание подключения...")
         self.video_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
         self.video_label.setStyleSheet("""
             QLabel {
@@ -197,6 +235,12 @@ class VideoPlayer(QWidget):
             if not self.is_playing:
                 self.set_playing_status(True)
 
+    def set_cursor(self, cursor):
+        self.remote_cursor = cursor
+        self.video_label.set_remote_cursor(cursor)
+        if self.fullscreen_label:
+            self.fullscreen_label.set_remote_cursor(cursor)
+
     def set_playing_status(self, playing):
         self.is_playing = playing
 
@@ -272,13 +316,14 @@ class VideoPlayer(QWidget):
         fullscreen_layout = QVBoxLayout(self.fullscreen_window)
         fullscreen_layout.setContentsMargins(0, 0, 0, 0)
 
-        fullscreen_label = QLabel(self.fullscreen_window)
+        fullscreen_label = ScreenLabel(self.fullscreen_window)
         fullscreen_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
         fullscreen_label.setScaledContents(True)
         fullscreen_label.setStyleSheet("background-color: #000000;")
 
         if self.current_frame and not self.current_frame.isNull():
             fullscreen_label.setPixmap(self.current_frame)
+        fullscreen_label.set_remote_cursor(self.remote_cursor)
 
         fullscreen_layout.addWidget(fullscreen_label)
 
@@ -302,6 +347,8 @@ class VideoPlayer(QWidget):
         if self.current_frame and not self.current_frame.isNull():
             self.video_label.setPixmap(self.current_frame)
 
+        self.emit_viewport()
+
     def on_volume_changed(self, value):
         self.volume = value
         self.volume_changed.emit(value)
@@ -316,6 +363,7 @@ class VideoPlayer(QWidget):
     def clear_display(self):
         self.video_label.setText("Ожидание подключения...")
         self.current_frame = None
+        self.set_cursor(None)
         self.set_connection_status(False)
 
     def resizeEvent(self, event):
@@ -324,6 +372,14 @@ class VideoPlayer(QWidget):
         if self.current_frame and not self.is_fullscreen:
             self.video_label.setPixmap(self.current_frame)
 
+        self.emit_viewport()
+
+    def emit_viewport(self):
+        label = self.fullscreen_label if self.fullscreen_label else self.video_label
+        ratio = label.devicePixelRatioF()
+        self.viewport_changed.emit(int(label.width() * ratio),
+                                   int(label.height() * ratio))
+
     def keyPressEvent(self, event):
         if event.key() == Qt.Key.Key_F11:
             self.toggle_fullscreen()
@@ -335,6 +391,8 @@ class VideoPlayer(QWidget):
             super().keyPressEvent(event)
 
     def eventFilter(self, obj, event):
+        if obj == self.fullscreen_window and event.type() == QEvent.Type.Resize:
+            self.emit_viewport()
         if obj == self.fullscreen_window and event.type() == QEvent.Type.KeyPress:
             if event.key() == Qt.Key.Key_Escape or event.key() == Qt.Key.Key_F11:
                 self.toggle_fullscreen()